@@ -0,0 +1,218 @@
+"""
+Dashboard Stats Benchmark - Latency of GET /api/trends against the number of posts
+
+Compares, on a temporary database of synthetic posts:
+- posts, 8 requetes : the historical route, eight queries on the posts table
+- rollup, 8 requetes : the same eight queries on the rollups
+- rollups, 4 requetes : the current route (routes/trends.get_dashboard_stats), one
+  pass on company_post_stats, one window of daily_post_stats for the trends
+  and one of daily_collected_post_stats for the last 7 days
+
+Every variant must give the answer of the historical route before it is timed.
+The rows of each rollup table are printed after the timings.
+
+Usage: cd api && python benchmarks/dashboard_stats.py [post counts...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+from sqlalchemy import create_engine, desc, event, func, insert, text
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Base
+from models import Company, CompanyPostStats as Totals, Post
+from routes.trends import CATEGORIES, SENTIMENTS, collected, get_dashboard_stats, published
+from schemas import DashboardStats
+from services.rollups import ROLLUPS
+
+POST_COUNTS = [1_000, 10_000, 100_000]
+COMPANIES = 200
+REPEAT = 15
+DAYS = 30
+COUNTERS = ("total_companies", "active_companies", "total_posts", "posts_last_7_days", "duplicate_posts")
+
+
+def populate(engine, posts: int):
+    """Companies and posts over one year, a few unclassified and duplicates; rollups built after"""
+    rng = random.Random(posts)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Company), [
+            {"id": i, "name": f"Company {i}", "linkedin_url": f"https://linkedin.com/company/{i}",
+             "is_active": i % 5 != 0}
+            for i in range(1, COMPANIES + 1)
+        ])
+        conn.execute(insert(Post), [
+            {
+                "company_id": rng.randint(1, COMPANIES),
+                "posted_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)) if rng.random() > 0.05 else None,
+                "collected_at": now - timedelta(minutes=rng.randint(0, 30 * 24 * 60)),
+                "category": rng.choice(CATEGORIES) if rng.random() > 0.1 else None,
+                "sentiment": rng.choice(SENTIMENTS) if rng.random() > 0.1 else None,
+                "confidence_score": rng.random(),
+                "likes": rng.randint(0, 500),
+                "comments": rng.randint(0, 50),
+                "shares": rng.randint(0, 20),
+                "duplicate_of": 1 if rng.random() < 0.05 else None,
+            }
+            for _ in range(posts)
+        ])
+        for rollup in ROLLUPS:
+            rollup.install(conn)
+            rollup.rebuild(conn)
+
+
+# ============ Reference implementations ============
+
+def eight_queries_posts(db: Session) -> dict:
+    """GET /api/trends before the rollups: eight queries, each scanning posts"""
+    cutoff_date = datetime.utcnow() - timedelta(days=DAYS)
+    last_7_days = datetime.utcnow() - timedelta(days=7)
+    counted = [Post.duplicate_of.is_(None)]
+    engagement = Post.likes + Post.comments + Post.shares
+    return {
+        "total_companies": db.query(Company).count(),
+        "active_companies": db.query(Company).filter(Company.is_active == True).count(),
+        "total_posts": db.query(Post).filter(*counted).count(),
+        "posts_last_7_days": db.query(Post).filter(Post.collected_at >= last_7_days, *counted).count(),
+        "duplicate_posts": db.query(Post).filter(Post.duplicate_of.isnot(None)).count(),
+        "posts_by_category": db.query(Post.category, func.count(Post.id)).filter(
+            Post.category.isnot(None), *counted
+        ).group_by(Post.category).all(),
+        "posts_by_sentiment": db.query(Post.sentiment, func.count(Post.id)).filter(
+            Post.sentiment.isnot(None), *counted
+        ).group_by(Post.sentiment).all(),
+        # Ties broken by id, as in the route (the historical order between them was arbitrary)
+        "top_companies": db.query(
+            Company.id, Company.name, func.count(Post.id).label("post_count"), func.avg(engagement)
+        ).join(Post).filter(*counted).group_by(Company.id).order_by(desc("post_count"), Company.id).limit(10).all(),
+        "recent_trends": db.query(func.date(Post.posted_at), Post.category, func.count(Post.id)).filter(
+            Post.posted_at >= cutoff_date, Post.category.isnot(None), *counted
+        ).group_by(func.date(Post.posted_at), Post.category).all(),
+    }
+
+
+def eight_queries_rollup(db: Session) -> dict:
+    """The same eight queries on the rollups (day windows from routes.trends)"""
+    counted = [Totals.duplicate == False]
+    posts = func.coalesce(func.sum(Totals.count), 0)
+    engagement = Totals.likes + Totals.comments + Totals.shares
+    last_7_days, trends = collected(7), published(DAYS)
+    return {
+        "total_companies": db.query(Company).count(),
+        "active_companies": db.query(Company).filter(Company.is_active == True).count(),
+        "total_posts": db.query(posts).filter(*counted).scalar(),
+        "posts_last_7_days": db.query(func.coalesce(func.sum(last_7_days.c.count), 0)).filter(
+            last_7_days.c.duplicate == False
+        ).scalar(),
+        "duplicate_posts": db.query(posts).filter(Totals.duplicate == True).scalar(),
+        "posts_by_category": db.query(Totals.category, func.sum(Totals.count)).filter(
+            Totals.category != "", *counted
+        ).group_by(Totals.category).all(),
+        "posts_by_sentiment": db.query(Totals.sentiment, func.sum(Totals.count)).filter(
+            Totals.sentiment != "", *counted
+        ).group_by(Totals.sentiment).all(),
+        "top_companies": db.query(
+            Company.id, Company.name, func.sum(Totals.count).label("post_count"),
+            func.sum(engagement) * 1.0 / func.sum(Totals.count)
+        ).join(Totals, Totals.company_id == Company.id).filter(*counted).group_by(Company.id).order_by(
+            desc("post_count"), Company.id
+        ).limit(10).all(),
+        "recent_trends": db.query(trends.c.day, trends.c.category, func.sum(trends.c.count)).filter(
+            trends.c.category != "", trends.c.duplicate == False
+        ).group_by(trends.c.day, trends.c.category).order_by(trends.c.day).all(),
+    }
+
+
+def current_route(db: Session) -> DashboardStats:
+    return get_dashboard_stats(days=DAYS, include_duplicates=False, db=db)
+
+
+VARIANTS = [
+    ("posts, 8 requetes", eight_queries_posts),
+    ("rollup, 8 requetes", eight_queries_rollup),
+    ("rollups, 4 requetes", current_route),
+]
+
+
+def answer(result) -> dict:
+    """A variant's result in one shape: rows for the eight queries, DashboardStats for the route"""
+    if isinstance(result, DashboardStats):
+        result = result.model_dump()
+        return {
+            **{key: result[key] for key in COUNTERS},
+            "posts_by_category": [(c["category"], c["count"]) for c in result["posts_by_category"]],
+            "posts_by_sentiment": [(s["sentiment"], s["count"]) for s in result["posts_by_sentiment"]],
+            "top_companies": [
+                (c["company_id"], c["company_name"], c["post_count"], c["avg_engagement"])
+                for c in result["top_companies"]
+            ],
+            "recent_trends": [(t["date"], t["category"], t["count"]) for t in result["recent_trends"]],
+        }
+    return {
+        **{key: result[key] for key in COUNTERS},
+        "posts_by_category": [tuple(row) for row in result["posts_by_category"]],
+        "posts_by_sentiment": [tuple(row) for row in result["posts_by_sentiment"]],
+        "top_companies": [(*row[:3], round(row[3] or 0, 1)) for row in result["top_companies"]],
+        "recent_trends": [tuple(row) for row in result["recent_trends"]],
+    }
+
+
+# ============ Measure ============
+
+def measure(db: Session, engine, run: Callable[[Session], object]) -> tuple:
+    """Median latency (ms) and statements per call"""
+    statements: List[str] = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    run(db)
+    event.remove(engine, "before_cursor_execute", listener)
+
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        run(db)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(statements)
+
+
+def main(post_counts: List[int]):
+    print(f"{'posts':>8}  " + "  ".join(f"{name:>20}" for name, _ in VARIANTS))
+    for posts in post_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+            Base.metadata.create_all(bind=engine)
+            populate(engine, posts)
+
+            db = sessionmaker(bind=engine)()
+            try:
+                # Same answer as the historical route on the posts table
+                expected = answer(eight_queries_posts(db))
+                for name, run in VARIANTS[1:]:
+                    got = answer(run(db))
+                    for key in expected:
+                        assert got[key] == expected[key], f"{name}: {key} differs from the posts table"
+
+                results = [measure(db, engine, run) for _, run in VARIANTS]
+                rows = {
+                    rollup.target: db.execute(text(f"SELECT count(*) FROM {rollup.target}")).scalar()
+                    for rollup in ROLLUPS if rollup.source == "posts"
+                }
+            finally:
+                db.close()
+                engine.dispose()
+
+        print(f"{posts:>8}  " + "  ".join(
+            f"{f'{latency:.2f} ms ({count} req)':>20}" for latency, count in results
+        ))
+        print(f"{'':>8}  rows: " + ", ".join(f"{target} {count}" for target, count in rows.items()))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or POST_COUNTS)
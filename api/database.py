@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, bindparam
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import json
 import os
 
 # Chemin vers la base de données SQLite
@@ -30,3 +31,155 @@ def init_db():
     """Initialise la base de données (crée les tables)"""
     import models  # Import ici pour éviter circular import
     Base.metadata.create_all(bind=engine)
+    migrate_columns()
+    close_duplicate_active_jobs()
+    remove_duplicate_relevance_scores()
+    migrate_indexes()
+    migrate_json_links()
+    migrate_rollups()
+
+
+def migrate_columns():
+    """
+    Ajoute les colonnes manquantes aux tables existantes.
+    create_all ne modifie pas une table deja creee.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+
+def close_duplicate_active_jobs():
+    """
+    Ne garde que le job actif le plus recent par profil, pour que l'index
+    unique ix_scrape_jobs_active_profile puisse etre cree sur une base existante.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE scrape_jobs
+            SET status = 'failed', error_message = 'Superseded by a newer job'
+            WHERE status IN ('pending', 'running')
+              AND profile_id IS NOT NULL
+              AND id NOT IN (
+                SELECT MAX(id) FROM scrape_jobs
+                WHERE status IN ('pending', 'running') AND profile_id IS NOT NULL
+                GROUP BY profile_id
+              )
+        """))
+
+
+def remove_duplicate_relevance_scores():
+    """
+    Ne garde que le score le plus recent par post et par profil, pour que
+    l'index unique ix_post_relevance_scores_post_profile puisse etre cree.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            DELETE FROM post_relevance_scores
+            WHERE id NOT IN (
+                SELECT MAX(id) FROM post_relevance_scores
+                GROUP BY post_id, profile_id
+            )
+        """))
+
+
+def migrate_indexes():
+    """
+    Cree les index ajoutes aux modeles apres la creation des tables.
+    Un index qui ne peut pas etre cree (doublons existants) est signale
+    sans bloquer le demarrage.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"[Database] Index {index.name} not created: {e}")
+
+
+def _json_ids(raw) -> list:
+    """Ids entiers d'une liste JSON stockee en TEXT (valeurs invalides ignorees)"""
+    try:
+        values = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(values, list):
+        return []
+    return list(dict.fromkeys(v for v in values if isinstance(v, int) and not isinstance(v, bool)))
+
+
+def migrate_json_links():
+    """
+    Deplace les listes JSON extracted_themes.source_post_ids et
+    generated_posts.inspiration_post_ids vers theme_posts et
+    generated_post_sources. Les colonnes migrees sont remises a NULL,
+    donc une ligne n'est migree qu'une fois. Les ids qui ne designent
+    aucun post sont ignores.
+    """
+    with engine.begin() as conn:
+        themes = conn.execute(text(
+            "SELECT id, source_post_ids FROM extracted_themes WHERE source_post_ids IS NOT NULL"
+        )).all()
+        generated = conn.execute(text(
+            "SELECT id, inspiration_post_ids, target_emotion FROM generated_posts "
+            "WHERE inspiration_post_ids IS NOT NULL"
+        )).all()
+        if not themes and not generated:
+            return
+
+        post_ids = {row[0] for row in conn.execute(text("SELECT id FROM posts"))}
+        tracked_post_ids = {row[0] for row in conn.execute(text("SELECT id FROM tracked_posts"))}
+
+        theme_links = [
+            {"theme_id": theme_id, "post_id": post_id}
+            for theme_id, raw in themes
+            for post_id in _json_ids(raw) if post_id in post_ids
+        ]
+        if theme_links:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO theme_posts (theme_id, post_id, added_at) "
+                "VALUES (:theme_id, :post_id, CURRENT_TIMESTAMP)"
+            ), theme_links)
+
+        # Les spins (sans target_emotion) s'inspirent d'un post tracke,
+        # le workflow de generation de posts collectes
+        source_links = []
+        for generated_id, raw, target_emotion in generated:
+            source_type, existing = ("post", post_ids) if target_emotion else ("tracked_post", tracked_post_ids)
+            source_links.extend(
+                {"generated_post_id": generated_id, "source_type": source_type, "source_id": source_id}
+                for source_id in _json_ids(raw) if source_id in existing
+            )
+        if source_links:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO generated_post_sources (generated_post_id, source_type, source_id) "
+                "VALUES (:generated_post_id, :source_type, :source_id)"
+            ), source_links)
+
+        # Seulement les lignes lues : un workflow peut en ecrire d'autres entre-temps
+        if themes:
+            conn.execute(text(
+                "UPDATE extracted_themes SET source_post_ids = NULL WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)), {"ids": [row[0] for row in themes]})
+        if generated:
+            conn.execute(text(
+                "UPDATE generated_posts SET inspiration_post_ids = NULL WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)), {"ids": [row[0] for row in generated]})
+
+    print(f"[Database] Migrated {len(theme_links)} theme links and {len(source_links)} generated post sources")
+
+
+def migrate_rollups():
+    """Triggers des agregats de posts (voir services/rollups.py)"""
+    from services.rollups import install_rollups  # Import ici pour éviter circular import
+    install_rollups()
@@ -13,6 +13,22 @@ from contextlib import asynccontextmanager
 from database import init_db, SessionLocal
 from routes import companies_router, posts_router, trends_router, profile_router, generator_router, tracker_router
 from services.tracker_scheduler import init_scheduler, get_scheduler
+from services.workflow_executor import workflow_executor
+from services.near_duplicates import sync_all as sync_near_duplicates
+from services.originality import originality_checker
+
+
+def catch_up_indexes():
+    """Signatures MinHash et empreintes d'originalite des posts deja en base"""
+    sync_near_duplicates(SessionLocal)
+    db = SessionLocal()
+    try:
+        originality_checker.sync(db)
+    except Exception as e:
+        db.rollback()
+        print(f"[Startup] Originality index update failed: {e}")
+    finally:
+        db.close()
 
 
 @asynccontextmanager
@@ -22,6 +38,9 @@ async def lifespan(app: FastAPI):
     init_db()
     print("Database initialized")
 
+    # Index des posts deja en base, sans bloquer le demarrage
+    workflow_executor.spawn("index catch-up", asyncio.to_thread(catch_up_indexes))
+
     # Initialize and start the tracker scheduler
     scheduler = init_scheduler(SessionLocal)
     scheduler_task = asyncio.create_task(scheduler.start())
@@ -38,6 +57,10 @@ async def lifespan(app: FastAPI):
         pass
     print("Tracker scheduler stopped")
 
+    # Workflows en cours, batches de spin et rattrapage des index
+    await workflow_executor.shutdown()
+    print("Workflows stopped")
+
 
 app = FastAPI(
     title="LinkedIn Posts Dashboard API",
@@ -91,7 +114,7 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "workflows": workflow_executor.stats()}
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -34,7 +34,7 @@ class Post(Base):
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
     linkedin_post_id = Column(String(255), unique=True, nullable=True)
     content = Column(Text, nullable=True)
-    posted_at = Column(DateTime, nullable=True)
+    posted_at = Column(DateTime, nullable=True, index=True)
 
     # Classification
     category = Column(String(50), nullable=True)  # recruitment, promotional, etc.
@@ -50,10 +50,15 @@ class Post(Base):
     # Métadonnées
     media_type = Column(String(50), nullable=True)
     url = Column(String(500), nullable=True)
-    collected_at = Column(DateTime, default=datetime.utcnow)
+    collected_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Quasi-doublons (voir services/near_duplicates.py)
+    minhash = Column(LargeBinary, nullable=True)  # Signature MinHash, b"" si pas de texte
+    duplicate_of = Column(Integer, nullable=True, index=True)  # Premier post du cluster, NULL si canonique
 
     # Relation avec l'entreprise
     company = relationship("Company", back_populates="posts")
+    theme_links = relationship("ThemePost", back_populates="post", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Post {self.id} - {self.category}>"
@@ -75,6 +80,82 @@ class CollectionLog(Base):
         return f"<CollectionLog {self.id} - {self.status}>"
 
 
+class DailyPostStats(Base):
+    """
+    Agregats journaliers des posts par date de publication, tenus a jour par
+    des triggers SQLite (voir services/rollups.py) : les routes de tendances
+    ne lisent plus posts.
+    """
+    __tablename__ = "daily_post_stats"
+
+    day = Column(String(10), primary_key=True)  # Date de publication, '' si inconnue
+    company_id = Column(Integer, primary_key=True)
+    category = Column(String(50), primary_key=True)  # '' = non classe
+    duplicate = Column(Boolean, primary_key=True)  # Quasi-doublons (duplicate_of renseigne)
+
+    count = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    shares = Column(Integer, nullable=False, default=0)
+    confidence_total = Column(Float, nullable=False, default=0)  # Somme des confidence_score renseignes
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_post_stats_company_day", "company_id", "day"),
+    )
+
+    def __repr__(self):
+        return f"<DailyPostStats {self.day} company={self.company_id} {self.category}: {self.count}>"
+
+
+class DailyCollectedPostStats(Base):
+    """Agregats journaliers des posts par date de collecte (compteurs des derniers jours), comme DailyPostStats"""
+    __tablename__ = "daily_collected_post_stats"
+
+    day = Column(String(10), primary_key=True)  # Date de collecte
+    company_id = Column(Integer, primary_key=True)
+    category = Column(String(50), primary_key=True)  # '' = non classe
+    duplicate = Column(Boolean, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    shares = Column(Integer, nullable=False, default=0)
+    confidence_total = Column(Float, nullable=False, default=0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_collected_post_stats_company_day", "company_id", "day"),
+    )
+
+    def __repr__(self):
+        return f"<DailyCollectedPostStats {self.day} company={self.company_id} {self.category}: {self.count}>"
+
+
+class CompanyPostStats(Base):
+    """
+    Agregats des posts sur toute la periode, sans le jour (memes triggers) :
+    les compteurs du dashboard lisent une ligne par entreprise, categorie et
+    sentiment au lieu de tout l'historique journalier.
+    """
+    __tablename__ = "company_post_stats"
+
+    company_id = Column(Integer, primary_key=True)
+    category = Column(String(50), primary_key=True)  # '' = non classe
+    sentiment = Column(String(20), primary_key=True)  # '' = non classe
+    duplicate = Column(Boolean, primary_key=True)  # Quasi-doublons (duplicate_of renseigne)
+
+    count = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    shares = Column(Integer, nullable=False, default=0)
+    confidence_total = Column(Float, nullable=False, default=0)  # Somme des confidence_score renseignes
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CompanyPostStats company={self.company_id} {self.category}: {self.count}>"
+
+
 # ============ Generator Models ============
 
 class UserCompanyProfile(Base):
@@ -109,6 +190,7 @@ class UserCompanyProfile(Base):
 
     # Relations
     relevance_scores = relationship("PostRelevanceScore", back_populates="profile", cascade="all, delete-orphan")
+    prefiltered_posts = relationship("PrefilteredPost", cascade="all, delete-orphan")
     generated_posts = relationship("GeneratedPost", back_populates="profile", cascade="all, delete-orphan")
 
     def __repr__(self):
@@ -145,10 +227,34 @@ class PostRelevanceScore(Base):
     post = relationship("Post")
     profile = relationship("UserCompanyProfile", back_populates="relevance_scores")
 
+    # Un score par post et par profil : l'INSERT OR REPLACE du workflow
+    # remplace le score precedent au lieu d'en ajouter un
+    __table_args__ = (
+        Index("ix_post_relevance_scores_post_profile", "post_id", "profile_id", unique=True),
+    )
+
     def __repr__(self):
         return f"<PostRelevanceScore post={self.post_id} score={self.overall_relevance}>"
 
 
+class PrefilteredPost(Base):
+    """
+    Post ecarte par le pre-filtre local pour un profil : il n'est plus
+    propose au LLM tant que la version du profil ne change pas et que sa
+    similarite reste sous le seuil (voir services/relevance_prefilter.py).
+    """
+    __tablename__ = "prefiltered_posts"
+
+    profile_id = Column(Integer, ForeignKey("user_company_profile.id"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), primary_key=True)
+    profile_version = Column(String(64), nullable=False)  # ActiveProfile.version au moment du filtrage
+    similarity = Column(Float, nullable=False)  # Similarite TF-IDF avec le profil
+    skipped_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PrefilteredPost post={self.post_id} profile={self.profile_id}>"
+
+
 class GeneratedPost(Base):
     """Post LinkedIn généré"""
     __tablename__ = "generated_posts"
@@ -162,7 +268,7 @@ class GeneratedPost(Base):
     call_to_action = Column(String(500), nullable=True)
 
     # Generation Context
-    inspiration_post_ids = Column(Text, nullable=True)  # JSON: [1, 5, 12]
+    inspiration_post_ids = Column(Text, nullable=True)  # Ancien JSON [1, 5, 12], migre vers generated_post_sources
     theme = Column(String(255), nullable=True)
     category = Column(String(50), nullable=True)
     target_emotion = Column(String(50), nullable=True)  # inspire, educate, engage
@@ -180,11 +286,34 @@ class GeneratedPost(Base):
 
     # Relations
     profile = relationship("UserCompanyProfile", back_populates="generated_posts")
+    source_links = relationship(
+        "GeneratedPostSource", back_populates="generated_post",
+        cascade="all, delete-orphan", order_by="GeneratedPostSource.source_id"
+    )
 
     def __repr__(self):
         return f"<GeneratedPost {self.id} - {self.status}>"
 
 
+class GeneratedPostSource(Base):
+    """Post d'inspiration d'un post genere (post collecte ou post tracke pour un spin)"""
+    __tablename__ = "generated_post_sources"
+
+    generated_post_id = Column(Integer, ForeignKey("generated_posts.id", ondelete="CASCADE"), primary_key=True)
+    source_type = Column(String(20), primary_key=True)  # post, tracked_post
+    source_id = Column(Integer, primary_key=True)
+
+    generated_post = relationship("GeneratedPost", back_populates="source_links")
+
+    # "Quels posts generes s'inspirent du post X"
+    __table_args__ = (
+        Index("ix_generated_post_sources_source", "source_type", "source_id"),
+    )
+
+    def __repr__(self):
+        return f"<GeneratedPostSource {self.generated_post_id} <- {self.source_type}:{self.source_id}>"
+
+
 class ExtractedTheme(Base):
     """Thèmes extraits des posts concurrents"""
     __tablename__ = "extracted_themes"
@@ -202,8 +331,8 @@ class ExtractedTheme(Base):
     avg_engagement = Column(Float, nullable=True)
     avg_relevance_score = Column(Float, nullable=True)
 
-    # Source Posts (JSON array)
-    source_post_ids = Column(Text, nullable=True)  # [1, 5, 12]
+    # Source Posts : table theme_posts (ancien JSON [1, 5, 12], migre au demarrage)
+    source_post_ids = Column(Text, nullable=True)
     example_angles = Column(Text, nullable=True)  # JSON: ["angle1", "angle2"]
 
     # Metadata
@@ -211,10 +340,116 @@ class ExtractedTheme(Base):
     last_seen_at = Column(DateTime, default=datetime.utcnow)
     is_trending = Column(Boolean, default=False)
 
+    # Clustering local (voir services/theme_clustering.py)
+    centroid = Column(LargeBinary, nullable=True)  # float32, moyenne des vecteurs TF-IDF des posts
+    named_size = Column(Integer, nullable=True)  # occurrence_count au dernier nommage LLM, NULL = a nommer
+
+    post_links = relationship(
+        "ThemePost", back_populates="theme",
+        cascade="all, delete-orphan", order_by="ThemePost.post_id"
+    )
+
     def __repr__(self):
         return f"<ExtractedTheme {self.theme_name}>"
 
 
+class ThemePost(Base):
+    """Post source d'un theme extrait"""
+    __tablename__ = "theme_posts"
+
+    # La cle primaire (theme_id, post_id) sert la pagination des posts d'un theme
+    theme_id = Column(Integer, ForeignKey("extracted_themes.id", ondelete="CASCADE"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    added_at = Column(DateTime, default=datetime.utcnow)
+
+    theme = relationship("ExtractedTheme", back_populates="post_links")
+    post = relationship("Post", back_populates="theme_links")
+
+    def __repr__(self):
+        return f"<ThemePost theme={self.theme_id} post={self.post_id}>"
+
+
+class SpinAnalysisCache(Base):
+    """Analyse d'un post original par le workflow de spin, reutilisee entre spins"""
+    __tablename__ = "spin_analysis_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 du contenu du post
+    analysis = Column(Text, nullable=False)  # JSON: PostAnalysisResult
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<SpinAnalysisCache {self.content_hash[:12]}>"
+
+
+class SpinResultCache(Base):
+    """Resultat d'un spin pour un post, une version du profil et des options"""
+    __tablename__ = "spin_result_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 de la cle complete
+    content_hash = Column(String(64), nullable=False, index=True)
+    profile_version = Column(String(64), nullable=False)
+    tone = Column(String(50), nullable=False)
+    angle_preference = Column(String(255), nullable=True)
+    include_cta = Column(Boolean, nullable=False)
+
+    result = Column(Text, nullable=False)  # JSON: resultat du workflow
+    generated_post_id = Column(Integer, ForeignKey("generated_posts.id", ondelete="SET NULL"), nullable=True)
+
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<SpinResultCache {self.cache_key[:12]} tone={self.tone}>"
+
+
+class MinHashBucket(Base):
+    """Bande LSH d'une signature MinHash : les posts d'un meme bucket sont candidats doublons"""
+    __tablename__ = "minhash_buckets"
+
+    source = Column(String(20), primary_key=True)  # posts, tracked_posts
+    bucket = Column(Integer, primary_key=True)  # Hash 64 bits de la bande
+    doc_id = Column(Integer, primary_key=True)  # Id du post dans la table source
+
+    def __repr__(self):
+        return f"<MinHashBucket {self.source}:{self.doc_id}>"
+
+
+class ShingleFingerprint(Base):
+    """Empreinte (winnowing) d'un post tracke, pour le controle d'originalite des brouillons"""
+    __tablename__ = "shingle_fingerprints"
+
+    fingerprint = Column(Integer, primary_key=True)  # crc32 d'une sequence de 5 mots
+    post_id = Column(Integer, primary_key=True, index=True)  # Id du post tracke
+
+    def __repr__(self):
+        return f"<ShingleFingerprint {self.fingerprint} post={self.post_id}>"
+
+
+class WorkflowRunRecord(Base):
+    """
+    Etat d'un run de workflow (job, spin, batch) ecrit par le process qui
+    l'execute : les autres workers API repondent aux polls de statut
+    (voir services/workflow_runs.py).
+    """
+    __tablename__ = "workflow_runs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(20), nullable=False)  # relevance, themes, generate, spin, spin_batch
+    status = Column(String(20), nullable=False)  # queued, running, completed, failed
+    params = Column(Text, nullable=True)  # JSON
+    events = Column(Integer, default=0)
+    last_event = Column(Text, nullable=True)  # JSON
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<WorkflowRunRecord {self.id} {self.kind} {self.status}>"
+
+
 # ============ LinkedIn Tracker Models ============
 
 class TrackedProfile(Base):
@@ -236,7 +471,7 @@ class TrackedProfile(Base):
     about = Column(Text, nullable=True)
 
     # Tracking config
-    tracking_frequency = Column(String(20), default="daily")  # hourly, daily, weekly
+    tracking_frequency = Column(String(20), default="daily")  # hourly, daily, weekly, auto
     is_active = Column(Boolean, default=True)
     priority = Column(Integer, default=5)  # 1-10, higher = more important
     tags = Column(Text, nullable=True)  # JSON array: ["competitor", "influencer"]
@@ -246,6 +481,10 @@ class TrackedProfile(Base):
     total_posts_tracked = Column(Integer, default=0)
     avg_engagement_rate = Column(Float, nullable=True)
 
+    # Posting habits (JSON: 168 weights, index = weekday * 24 + hour UTC)
+    posting_histogram = Column(Text, nullable=True)
+    histogram_updated_at = Column(DateTime, nullable=True)  # first_seen_at of the last post counted
+
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     last_scraped_at = Column(DateTime, nullable=True)
@@ -329,9 +568,16 @@ class TrackedPost(Base):
 
     # Tracking
     is_new = Column(Boolean, default=True)  # True if detected this scrape cycle
-    first_seen_at = Column(DateTime, default=datetime.utcnow)
+    first_seen_at = Column(DateTime, default=datetime.utcnow, index=True)
     engagement_history = Column(Text, nullable=True)  # JSON: [{"date": "...", "likes": 100}]
 
+    # Near-duplicates (see services/near_duplicates.py)
+    minhash = Column(LargeBinary, nullable=True)  # MinHash signature, b"" when there is no text
+    duplicate_of = Column(Integer, nullable=True, index=True)  # First post of the cluster, NULL if canonical
+
+    # Originality index (see services/originality.py)
+    fingerprinted = Column(Boolean, nullable=True)  # True once in shingle_fingerprints, NULL = to index
+
     # Relations
     profile = relationship("TrackedProfile", back_populates="tracked_posts")
     content_insights = relationship("PostContentInsight", back_populates="post", cascade="all, delete-orphan")
@@ -384,13 +630,19 @@ class ScrapeJob(Base):
     profile_id = Column(Integer, ForeignKey("tracked_profiles.id"), nullable=True)
 
     job_type = Column(String(20), nullable=False)  # profile, posts, full
-    status = Column(String(20), default="pending")  # pending, running, completed, failed
+    status = Column(String(20), default="pending", index=True)  # pending, running, completed, failed, dead
 
     # Execution details
     scheduled_at = Column(DateTime, nullable=True)
+    due_at = Column(DateTime, nullable=True)  # next_scrape_at du profil a l'enqueue (retard du scheduler)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
+    # Lease du worker qui execute le job (voir services/job_queue.py)
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
     # Results
     items_scraped = Column(Integer, default=0)
     new_items_found = Column(Integer, default=0)
@@ -402,7 +654,62 @@ class ScrapeJob(Base):
     max_retries = Column(Integer, default=3)
 
     # Metadata
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Un seul job actif par profil (single-flight entre process)
+    __table_args__ = (
+        Index(
+            "ix_scrape_jobs_active_profile", "profile_id", unique=True,
+            sqlite_where=text("status IN ('pending', 'running')"),
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
 
     def __repr__(self):
         return f"<ScrapeJob {self.id} type={self.job_type} status={self.status}>"
+
+
+class DailyTrackedPostStats(Base):
+    """Agregats journaliers des posts trackes (par first_seen_at), comme DailyPostStats"""
+    __tablename__ = "daily_tracked_post_stats"
+
+    day = Column(String(10), primary_key=True)  # Date de first_seen_at, '' si inconnue
+    profile_id = Column(Integer, primary_key=True)
+    category = Column(String(50), primary_key=True)  # '' = non classe
+    sentiment = Column(String(20), primary_key=True)
+    duplicate = Column(Boolean, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    shares = Column(Integer, nullable=False, default=0)
+    confidence_total = Column(Float, nullable=False, default=0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_tracked_post_stats_profile_day", "profile_id", "day"),
+    )
+
+    def __repr__(self):
+        return f"<DailyTrackedPostStats {self.day} profile={self.profile_id}: {self.count}>"
+
+
+class SchedulerLease(Base):
+    """Lease de leader pour les taches qui ne doivent tourner que dans un seul process"""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(100), primary_key=True)  # tracker-scheduler
+    holder = Column(String(100), nullable=True)  # host:pid:random du process leader
+    acquired_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    # Un process non-leader demande au leader de recharger les profils
+    reload_requested_at = Column(DateTime, nullable=True)
+
+    # Resume publie par le leader (file, retard, SLA) pour les autres process
+    summary = Column(Text, nullable=True)  # JSON
+    summary_published_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} holder={self.holder}>"
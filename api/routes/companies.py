@@ -8,6 +8,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
 from models import Company, Post
 from schemas import Company as CompanySchema, CompanyCreate, CompanyUpdate
+from services.near_duplicates import post_duplicates
 
 router = APIRouter(prefix="/api/companies", tags=["companies"])
 
@@ -147,6 +148,9 @@ def delete_company(company_id: int, db: Session = Depends(get_db)):
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
 
+    # Quasi-doublons d'autres entreprises dont un post supprime etait l'original
+    post_ids = [post_id for (post_id,) in db.query(Post.id).filter(Post.company_id == company_id)]
+    post_duplicates.forget(db, post_ids)
     db.delete(company)
     db.commit()
 
@@ -1,20 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, case, exists, and_
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import json
-import subprocess
 import sys
 import os
 import platform
-import time
-import re
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_db
+from database import get_db, SessionLocal
 from models import (
-    UserCompanyProfile, Post, PostRelevanceScore,
-    GeneratedPost, ExtractedTheme,
+    Post, PostRelevanceScore,
+    GeneratedPost, ExtractedTheme, ThemePost, GeneratedPostSource,
     TrackedPost, PostContentInsight, TrackedProfile
 )
 from schemas import (
@@ -24,11 +23,50 @@ from schemas import (
     GeneratedPost as GeneratedPostSchema,
     ExtractedTheme as ExtractedThemeSchema,
     DraftStatus,
-    InspirationPost
+    InspirationPost,
+    SpinBatchRequest, SpinBatchResponse,
+    OriginalityCheckRequest, OriginalityCheckResponse,
+    ThemePostsPage
 )
+from routes.posts import serialize_post
+from services.workflow_executor import workflow_executor, WorkflowQueueFull
+from services.workflow_runs import workflow_runs, WorkflowRun
+from services.spin_cache import spin_cache
+from services.profile_cache import ActiveProfile, active_profile_cache
+from services.generator_stats import generator_stats
+from services.relevance_prefilter import relevance_prefilter
+from services.near_duplicates import post_duplicates
+from services.originality import originality_checker
+from services.theme_clustering import theme_clusterer
 
 router = APIRouter(prefix="/api/generator", tags=["generator"])
 
+# Duree max d'un workflow d'analyse / extraction / generation
+WORKFLOW_TIMEOUT = 1800
+SPIN_TIMEOUT = 180
+SSE_KEEPALIVE = 15  # Secondes sans evenement avant un commentaire keepalive
+PREFILTER_OVERSAMPLE = 5  # Candidats examines par post envoye quand le pre-filtre est actif
+SPIN_BATCH_RETRY_DELAY = 5  # Secondes avant de resoumettre un spin quand la file est pleine
+JOB_KINDS = ("relevance", "themes", "generate")  # Runs suivis par /jobs/{job_id}
+JOB_MAX_WAIT = 60  # Attente max d'un long-poll sur /jobs/{job_id}
+
+
+def submit_workflow(label: str, work):
+    """Met un workflow dans la file bornee, 503 si elle est pleine"""
+    try:
+        return workflow_executor.submit(label, work)
+    except WorkflowQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Workflow queue full: {e}")
+
+
+def submit_job(run: WorkflowRun, work):
+    """Soumet le workflow d'un job ; le job echoue si la file est pleine"""
+    try:
+        return submit_workflow(run.kind, work)
+    except HTTPException as e:
+        run.finish(error=e.detail)
+        raise
+
 
 def serialize_relevance_score(score: PostRelevanceScore, post: Post = None) -> dict:
     """Serialize relevance score with post info"""
@@ -68,7 +106,7 @@ def serialize_generated_post(post: GeneratedPost) -> dict:
         "theme": post.theme,
         "category": post.category,
         "target_emotion": post.target_emotion,
-        "inspiration_post_ids": json.loads(post.inspiration_post_ids) if post.inspiration_post_ids else None,
+        "inspiration_post_ids": [link.source_id for link in post.source_links] or None,
         "predicted_engagement": post.predicted_engagement,
         "authenticity_score": post.authenticity_score,
         "status": post.status,
@@ -88,7 +126,7 @@ def serialize_theme(theme: ExtractedTheme) -> dict:
         "occurrence_count": theme.occurrence_count,
         "avg_engagement": theme.avg_engagement,
         "avg_relevance_score": theme.avg_relevance_score,
-        "source_post_ids": json.loads(theme.source_post_ids) if theme.source_post_ids else None,
+        "source_post_ids": [link.post_id for link in theme.post_links] or None,
         "example_angles": json.loads(theme.example_angles) if theme.example_angles else None,
         "first_seen_at": theme.first_seen_at,
         "last_seen_at": theme.last_seen_at,
@@ -98,21 +136,66 @@ def serialize_theme(theme: ExtractedTheme) -> dict:
 
 @router.post("/analyze-relevance", response_model=AnalyzeRelevanceResponse)
 async def analyze_relevance(
-    background_tasks: BackgroundTasks,
     category: Optional[str] = None,
     days: Optional[int] = 30,
     min_engagement: Optional[int] = None,
     limit: int = 100,
+    force: bool = False,
+    prefilter: bool = True,
+    skip_duplicates: bool = True,
     db: Session = Depends(get_db)
 ):
     """
-    Analyse la pertinence de tous les posts concurrents par rapport au profil utilisateur.
+    Analyse la pertinence des posts concurrents par rapport au profil utilisateur.
     Lance le workflow TypeScript en arriere-plan.
+
+    Seuls les posts sans score, ou notes avant la derniere modification du
+    profil, sont envoyes au workflow ; force=true re-note tous les posts.
+    Avec prefilter, les posts sans vocabulaire commun avec le profil
+    (similarite TF-IDF locale sous le seuil) ne sont pas envoyes au LLM.
+    Avec skip_duplicates, seul le premier post d'un cluster de quasi-doublons
+    (reposts entre entreprises) est note.
+    """
+    # Selection SQL, quasi-doublons et pre-filtre TF-IDF hors de la boucle evenementielle
+    profile, post_ids, counts = await asyncio.to_thread(
+        select_relevance_candidates,
+        db, category, days, min_engagement, limit, force, prefilter, skip_duplicates
+    )
+
+    # Lancer le workflow TypeScript en arriere-plan (rien a faire si tout est a jour)
+    job = None
+    if post_ids:
+        job = workflow_runs.create("relevance", {"profile_id": profile.id, "posts": len(post_ids)})
+        submit_job(job, run_relevance_analysis(job, profile_id=profile.id, post_ids=post_ids))
+
+    # Retourner les statistiques actuelles, calculees en SQL
+    return {
+        "job_id": job.id if job else None,
+        "total_posts_analyzed": len(post_ids),
+        **counts,
+        **await asyncio.to_thread(relevance_summary, db, profile.id)
+    }
+
+
+def select_relevance_candidates(
+    db: Session,
+    category: Optional[str],
+    days: Optional[int],
+    min_engagement: Optional[int],
+    limit: int,
+    force: bool,
+    prefilter: bool,
+    skip_duplicates: bool
+) -> tuple:
+    """
+    Posts a envoyer au workflow de pertinence (voir analyze_relevance).
+
+    Returns:
+        (profile, post_ids, counts) ; counts donne les posts deja notes,
+        pre-filtres et quasi-doublons ecartes
     """
     # Verifier qu'un profil actif existe
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(
@@ -133,77 +216,141 @@ async def analyze_relevance(
 
     # Filtrer par date si days est spécifié
     if days:
-        from datetime import timedelta
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         query = query.filter(Post.collected_at >= cutoff_date)
 
-    posts = query.limit(limit).all()
+    duplicates_skipped = 0
+    if skip_duplicates:
+        post_duplicates.sync(db)
+        duplicates_skipped = query.filter(Post.duplicate_of.isnot(None)).count()
+        query = query.filter(Post.duplicate_of.is_(None))
 
-    if not posts:
+    # Score a jour : note pour ce profil depuis sa derniere modification
+    fresh_score_conditions = [
+        PostRelevanceScore.post_id == Post.id,
+        PostRelevanceScore.profile_id == profile.id
+    ]
+    if profile.updated_at:
+        fresh_score_conditions.append(PostRelevanceScore.scored_at >= profile.updated_at)
+    has_fresh_score = exists().where(and_(*fresh_score_conditions))
+
+    # Avec le pre-filtre, on examine plus de candidats pour remplir `limit` ;
+    # les posts deja ecartes pour cette version du profil ne reviennent pas
+    candidate_limit = limit * PREFILTER_OVERSAMPLE if prefilter else limit
+    previously_prefiltered = 0
+    if force:
+        already_scored = 0
+        candidates = query
+    else:
+        already_scored = query.filter(has_fresh_score).count()
+        candidates = query.filter(~has_fresh_score)
+        if prefilter:
+            skipped = relevance_prefilter.skipped(profile)
+            previously_prefiltered = candidates.filter(skipped).count()
+            candidates = candidates.filter(~skipped)
+    post_ids = [
+        post_id for (post_id,) in
+        candidates.with_entities(Post.id).order_by(Post.id.desc()).limit(candidate_limit)
+    ]
+
+    if not post_ids and not already_scored and not previously_prefiltered:
         raise HTTPException(
             status_code=404,
             detail="No posts found matching criteria"
         )
 
-    # Lancer le workflow TypeScript en arriere-plan
-    background_tasks.add_task(
-        run_relevance_analysis,
-        profile_id=profile.id,
-        post_ids=[p.id for p in posts]
-    )
-
-    # Retourner les statistiques actuelles
-    existing_scores = db.query(PostRelevanceScore).filter(
-        PostRelevanceScore.profile_id == profile.id
-    ).all()
+    prefiltered = []
+    if prefilter and post_ids:
+        post_ids, prefiltered = relevance_prefilter.filter(db, profile, post_ids)
 
-    relevant = [s for s in existing_scores if s.overall_relevance >= 50]
-    company_specific = [s for s in existing_scores if s.is_company_specific]
-    adaptable = [s for s in existing_scores if s.is_adaptable]
+    return profile, post_ids[:limit], {
+        "posts_already_scored": already_scored,
+        "posts_prefiltered": len(prefiltered) + previously_prefiltered,
+        "posts_duplicates_skipped": duplicates_skipped,
+    }
 
-    # Extraire les themes les plus courants
-    theme_counts = {}
-    for score in existing_scores:
-        if score.universal_theme:
-            theme_counts[score.universal_theme] = theme_counts.get(score.universal_theme, 0) + 1
 
-    top_themes = sorted(theme_counts.keys(), key=lambda x: theme_counts[x], reverse=True)[:5]
+def relevance_summary(db: Session, profile_id: int) -> dict:
+    """Agregats des scores de pertinence d'un profil (comptes, moyenne, themes)"""
+    total, relevant, company_specific, adaptable, avg_relevance = db.query(
+        func.count(PostRelevanceScore.id),
+        func.sum(case((PostRelevanceScore.overall_relevance >= 50, 1), else_=0)),
+        func.sum(case((PostRelevanceScore.is_company_specific == True, 1), else_=0)),
+        func.sum(case((PostRelevanceScore.is_adaptable == True, 1), else_=0)),
+        func.avg(PostRelevanceScore.overall_relevance)
+    ).filter(
+        PostRelevanceScore.profile_id == profile_id
+    ).one()
+
+    # Themes les plus courants
+    theme_count = func.count(PostRelevanceScore.id).label("theme_count")
+    top_themes = db.query(
+        PostRelevanceScore.universal_theme,
+        theme_count
+    ).filter(
+        PostRelevanceScore.profile_id == profile_id,
+        PostRelevanceScore.universal_theme != None,
+        PostRelevanceScore.universal_theme != ""
+    ).group_by(
+        PostRelevanceScore.universal_theme
+    ).order_by(
+        theme_count.desc(),
+        PostRelevanceScore.universal_theme
+    ).limit(5).all()
 
     return {
-        "total_posts_analyzed": len(posts),
-        "relevant_posts": len(relevant),
-        "company_specific_posts": len(company_specific),
-        "adaptable_posts": len(adaptable),
-        "avg_relevance": sum(s.overall_relevance for s in existing_scores) / len(existing_scores) if existing_scores else 0,
-        "top_themes": top_themes,
+        "relevant_posts": relevant or 0,
+        "company_specific_posts": company_specific or 0,
+        "adaptable_posts": adaptable or 0,
+        "avg_relevance": float(avg_relevance) if total else 0,
+        "top_themes": [theme for theme, _ in top_themes],
     }
 
 
-def run_relevance_analysis(profile_id: int, post_ids: List[int]):
+@router.get("/prefilter-report")
+async def get_prefilter_report(db: Session = Depends(get_db)):
+    """
+    Rappel du pre-filtre local mesure sur les posts deja notes par le LLM :
+    pour chaque seuil, posts pertinents manques et appels LLM evites.
+    """
+    profile = active_profile_cache.get(db)
+    if not profile:
+        raise HTTPException(status_code=404, detail="No active profile found")
+    return await asyncio.to_thread(relevance_prefilter.report, db, profile)
+
+
+@router.post("/prefilter/rebuild")
+async def rebuild_prefilter(db: Session = Depends(get_db)):
+    """Recalcule tous les vecteurs du pre-filtre avec l'IDF du corpus actuel"""
+    embedded = await asyncio.to_thread(relevance_prefilter.rebuild, db)
+    return {"success": True, "embedded_posts": embedded}
+
+
+async def run_relevance_analysis(run: WorkflowRun, profile_id: int, post_ids: List[int]):
     """Execute le workflow TypeScript pour l'analyse de pertinence"""
     try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         print(f"[Generator] Running relevance analysis for profile {profile_id} with {len(post_ids)} posts")
-        print(f"[Generator] CWD: {cwd}")
-
-        cmd = f'npx tsx src/workflow-generator.ts analyze {profile_id} {json.dumps(json.dumps(post_ids))}'
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            encoding='utf-8',
-            errors='replace'
+
+        result = await workflow_executor.run_workflow(
+            f'npx tsx src/workflow-generator.ts analyze {profile_id} --stdin',
+            payload=post_ids,
+            timeout=WORKFLOW_TIMEOUT,
+            on_event=run.publish,
+            log_prefix="[Generator]"
         )
 
-        if result.returncode != 0:
-            print(f"[Generator] ERROR: {result.stderr}")
+        if not result["success"]:
+            error = "timeout" if result["timed_out"] else result["output"][-500:]
+            print(f"[Generator] ERROR: {error}")
+            run.finish(error=error)
         else:
-            print(f"[Generator] SUCCESS: {result.stdout[:500] if result.stdout else 'No output'}")
+            print(f"[Generator] SUCCESS: {json.dumps(result['result'])[:500]}")
+            run.finish(result=result["result"])
     except Exception as e:
         print(f"[Generator] EXCEPTION: {e}")
+        run.finish(error=str(e))
+    finally:
+        generator_stats.invalidate()
 
 
 @router.get("/relevance-scores", response_model=List[RelevanceScoreSchema])
@@ -214,9 +361,7 @@ def get_relevance_scores(
     db: Session = Depends(get_db)
 ):
     """Recupere les scores de pertinence des posts"""
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(status_code=400, detail="No active profile")
@@ -248,9 +393,7 @@ def get_themes(
     db: Session = Depends(get_db)
 ):
     """Recupere les themes extraits des posts concurrents"""
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(status_code=400, detail="No active profile")
@@ -265,7 +408,7 @@ def get_themes(
     if category:
         query = query.filter(ExtractedTheme.category == category)
 
-    themes = query.order_by(
+    themes = query.options(selectinload(ExtractedTheme.post_links)).order_by(
         ExtractedTheme.avg_engagement.desc().nullslast(),
         ExtractedTheme.occurrence_count.desc()
     ).all()
@@ -273,18 +416,87 @@ def get_themes(
     return [serialize_theme(t) for t in themes]
 
 
+@router.get("/themes/{theme_id}/posts", response_model=ThemePostsPage)
+def get_theme_posts(
+    theme_id: int,
+    after_id: int = Query(0, ge=0, description="Dernier post_id de la page precedente"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Posts sources d'un theme, par ordre d'id.
+    Pagination par curseur : passer next_after_id de la page precedente.
+    """
+    if not db.query(ExtractedTheme.id).filter(ExtractedTheme.id == theme_id).first():
+        raise HTTPException(status_code=404, detail="Theme not found")
+
+    # Parcours de la cle primaire (theme_id, post_id), sans OFFSET
+    posts = db.query(Post).join(ThemePost, ThemePost.post_id == Post.id).filter(
+        ThemePost.theme_id == theme_id,
+        ThemePost.post_id > after_id
+    ).options(joinedload(Post.company)).order_by(ThemePost.post_id).limit(limit + 1).all()
+
+    total = db.query(func.count(ThemePost.post_id)).filter(ThemePost.theme_id == theme_id).scalar()
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    return {
+        "theme_id": theme_id,
+        "total": total,
+        "items": [serialize_post(p) for p in posts],
+        "next_after_id": posts[-1].id if has_more else None
+    }
+
+
+@router.get("/posts/{post_id}/themes", response_model=List[ExtractedThemeSchema])
+def get_post_themes(post_id: int, db: Session = Depends(get_db)):
+    """Themes dont le post est une source (index sur theme_posts.post_id)"""
+    themes = db.query(ExtractedTheme).join(ThemePost).filter(
+        ThemePost.post_id == post_id
+    ).options(selectinload(ExtractedTheme.post_links)).order_by(ExtractedTheme.id).all()
+
+    return [serialize_theme(t) for t in themes]
+
+
 @router.post("/extract-themes")
 async def extract_themes(
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Extrait les themes des posts pertinents.
-    Lance le workflow TypeScript.
+
+    Les posts pas encore classes sont affectes localement aux themes
+    existants (k-means incremental sur les vecteurs TF-IDF), ou en creent
+    de nouveaux ; seuls les themes nouveaux ou qui ont nettement grossi
+    sont envoyes au workflow TypeScript pour etre nommes.
     """
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    # Clustering et payload de nommage hors de la boucle evenementielle
+    profile_id, clustering, clusters = await asyncio.to_thread(cluster_relevant_posts, db)
+
+    # Nommer en arriere-plan les seuls themes nouveaux ou modifies
+    job = None
+    if clusters:
+        job = workflow_runs.create("themes", {"profile_id": profile_id, "clusters": len(clusters)})
+        submit_job(job, run_theme_extraction(job, profile_id=profile_id, clusters=clusters))
+
+    return {
+        "job_id": job.id if job else None,
+        "status": "started" if clusters else "up_to_date",
+        "posts_to_analyze": clustering["posts_assigned"],
+        "themes_created": clustering["themes_created"],
+        "themes_to_name": len(clusters),
+        "themes_total": clustering["themes_total"]
+    }
+
+
+def cluster_relevant_posts(db: Session) -> tuple:
+    """
+    Classe les posts pertinents du profil actif dans les clusters de themes.
+
+    Returns:
+        (profile_id, clustering, clusters a nommer)
+    """
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(status_code=400, detail="No active profile")
@@ -302,57 +514,47 @@ async def extract_themes(
             detail="No relevant posts found. Run analyze-relevance first."
         )
 
-    # Lancer l'extraction en arriere-plan
-    background_tasks.add_task(
-        run_theme_extraction,
-        profile_id=profile.id,
-        score_ids=[s.id for s in scores]
-    )
+    clustering = theme_clusterer.update(db, profile.id, scores)
+    generator_stats.invalidate()
+    return profile.id, clustering, theme_clusterer.naming_payload(db, profile.id, clustering["themes_to_name"])
 
-    return {
-        "status": "started",
-        "posts_to_analyze": len(scores)
-    }
 
-
-def run_theme_extraction(profile_id: int, score_ids: List[int]):
-    """Execute le workflow TypeScript pour l'extraction de themes"""
+async def run_theme_extraction(run: WorkflowRun, profile_id: int, clusters: List[dict]):
+    """Execute le workflow TypeScript qui nomme les clusters de themes"""
     try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        print(f"[Generator] Running theme extraction for profile {profile_id} with {len(score_ids)} scores")
-
-        cmd = f'npx tsx src/workflow-generator.ts themes {profile_id} {json.dumps(json.dumps(score_ids))}'
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            encoding='utf-8',
-            errors='replace'
+        print(f"[Generator] Naming {len(clusters)} theme clusters for profile {profile_id}")
+
+        result = await workflow_executor.run_workflow(
+            f'npx tsx src/workflow-generator.ts name-themes {profile_id} --stdin',
+            payload=clusters,
+            timeout=WORKFLOW_TIMEOUT,
+            on_event=run.publish,
+            log_prefix="[Generator]"
         )
 
-        if result.returncode != 0:
-            print(f"[Generator] Theme extraction ERROR: {result.stderr}")
+        if not result["success"]:
+            error = "timeout" if result["timed_out"] else result["output"][-500:]
+            print(f"[Generator] Theme naming ERROR: {error}")
+            run.finish(error=error)
         else:
-            print(f"[Generator] Theme extraction SUCCESS")
+            print(f"[Generator] Theme naming SUCCESS")
+            run.finish(result=result["result"])
     except Exception as e:
-        print(f"[Generator] Theme extraction EXCEPTION: {e}")
+        print(f"[Generator] Theme naming EXCEPTION: {e}")
+        run.finish(error=str(e))
+    finally:
+        generator_stats.invalidate()
 
 
 @router.post("/generate", response_model=GeneratePostsResponse)
 async def generate_posts(
     request: GeneratePostsRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Genere des posts LinkedIn bases sur les themes et le profil.
     """
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(status_code=400, detail="No active profile")
@@ -370,30 +572,31 @@ async def generate_posts(
 
     themes = theme_query.limit(5).all()
 
-    # Lancer la generation en arriere-plan
-    background_tasks.add_task(
-        run_post_generation,
-        profile_id=profile.id,
-        num_posts=request.num_posts,
-        category=request.category,
-        theme=request.theme,
-        target_emotion=request.target_emotion
+    # Lancer la generation en arriere-plan ; les posts arrivent dans le resultat du job
+    job = workflow_runs.create("generate", {"profile_id": profile.id, "num_posts": request.num_posts})
+    submit_job(
+        job,
+        run_post_generation(
+            job,
+            profile_id=profile.id,
+            num_posts=request.num_posts,
+            category=request.category,
+            theme=request.theme,
+            target_emotion=request.target_emotion
+        )
     )
 
-    # Retourner les posts deja generes comme placeholder
-    existing_posts = db.query(GeneratedPost).filter(
-        GeneratedPost.profile_id == profile.id,
-        GeneratedPost.status == "draft"
-    ).order_by(GeneratedPost.generated_at.desc()).limit(request.num_posts).all()
-
     return {
-        "generated_posts": [serialize_generated_post(p) for p in existing_posts],
+        "job_id": job.id,
+        "status": job.status,
+        "job_url": f"/api/generator/jobs/{job.id}",
         "inspiration_sources": [],
         "themes_used": [t.theme_name for t in themes],
     }
 
 
-def run_post_generation(
+async def run_post_generation(
+    run: WorkflowRun,
     profile_id: int,
     num_posts: int,
     category: Optional[str],
@@ -402,7 +605,6 @@ def run_post_generation(
 ):
     """Execute le workflow TypeScript pour la generation de posts"""
     try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         args = {
             "num_posts": num_posts,
             "category": category,
@@ -411,24 +613,133 @@ def run_post_generation(
         }
         print(f"[Generator] Running post generation for profile {profile_id}: {args}")
 
-        cmd = f'npx tsx src/workflow-generator.ts generate {profile_id} {json.dumps(json.dumps(args))}'
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            encoding='utf-8',
-            errors='replace'
+        saved = []
+
+        async def finish_saved(post_ids: List[int]):
+            # Lecture des brouillons hors de la boucle evenementielle
+            posts = await asyncio.to_thread(generated_posts_result, post_ids)
+            if not run.done:
+                run.finish(result=posts)
+
+        def on_event(event: dict):
+            run.publish(event)
+            # Les posts sont en base : le job se termine sans attendre la fin du process
+            if event.get("phase") == "saved" and not saved:
+                generator_stats.invalidate()
+                saved.append(asyncio.create_task(
+                    finish_saved((event.get("data") or {}).get("generated_post_ids", []))
+                ))
+
+        result = await workflow_executor.run_workflow(
+            f'npx tsx src/workflow-generator.ts generate {profile_id} --stdin',
+            payload=args,
+            timeout=WORKFLOW_TIMEOUT,
+            on_event=on_event,
+            log_prefix="[Generator]"
         )
-
-        if result.returncode != 0:
-            print(f"[Generator] Post generation ERROR: {result.stderr}")
+        if saved:
+            await saved[0]
+
+        if not result["success"]:
+            error = "timeout" if result["timed_out"] else result["output"][-500:]
+            print(f"[Generator] Post generation ERROR: {error}")
+            if not run.done:
+                run.finish(error=error)
         else:
             print(f"[Generator] Post generation SUCCESS")
+            if not run.done:
+                run.finish(result={"generated_posts": []})
     except Exception as e:
         print(f"[Generator] Post generation EXCEPTION: {e}")
+        if not run.done:
+            run.finish(error=str(e))
+    finally:
+        generator_stats.invalidate()
+
+
+def generated_posts_result(post_ids: List[int]) -> dict:
+    """Resultat d'un job de generation : les brouillons crees"""
+    db = SessionLocal()
+    try:
+        posts = db.query(GeneratedPost).filter(GeneratedPost.id.in_(post_ids)).options(
+            selectinload(GeneratedPost.source_links)
+        ).order_by(GeneratedPost.id).all() if post_ids else []
+        return {"generated_posts": [serialize_generated_post(p) for p in posts]}
+    finally:
+        db.close()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=JOB_MAX_WAIT, description="Secondes d'attente max si le job est en cours")
+):
+    """
+    Statut d'un job d'analyse, d'extraction de themes ou de generation.
+    Avec wait, la reponse part des que le job se termine (long-poll) ;
+    une generation se termine des que les nouveaux posts sont en base.
+    Le job peut tourner dans un autre worker API (etat lu en base).
+    """
+    status = await run_status(job_id, JOB_KINDS, wait)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Flux SSE de l'avancement d'un job (phases du workflow, puis result ou error)"""
+    stream = await run_event_stream(job_id, JOB_KINDS, request)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return stream
+
+
+async def run_status(run_id: str, kinds: tuple, wait: float = 0) -> Optional[dict]:
+    """
+    Etat d'un run : en memoire s'il tourne dans ce process, sinon tel que
+    l'a ecrit le worker API qui l'execute (voir services/workflow_runs.py).
+    """
+    run = workflow_runs.get(run_id)
+    if run is None:
+        status = await workflow_runs.wait_stored(run_id, wait)
+        return status if status and status["kind"] in kinds else None
+    if run.kind not in kinds:
+        return None
+    if wait and not run.done:
+        await run.wait(wait)
+    return run.to_dict()
+
+
+async def run_event_stream(run_id: str, kinds: tuple, request: Request) -> Optional[StreamingResponse]:
+    """
+    Flux SSE d'un run. Un run d'un autre worker API n'a pas ses evenements
+    ici : le flux n'envoie que result ou error, lus en base a la fin du run.
+    """
+    run = workflow_runs.get(run_id)
+    if run is not None:
+        return stream_run_events(run, request) if run.kind in kinds else None
+    status = await asyncio.to_thread(workflow_runs.load, run_id)
+    if status is None or status["kind"] not in kinds:
+        return None
+
+    async def event_stream():
+        state = status
+        while state["status"] not in ("completed", "failed"):
+            yield ": keepalive\n\n"
+            state = await workflow_runs.wait_stored(run_id, SSE_KEEPALIVE)
+            if state is None:  # Supprime de la base (RUN_RETENTION)
+                return
+        if state["error"]:
+            yield format_sse("error", {"error": state["error"]})
+        else:
+            yield format_sse("result", state["result"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/drafts", response_model=List[GeneratedPostSchema])
@@ -438,9 +749,7 @@ def get_drafts(
     db: Session = Depends(get_db)
 ):
     """Recupere les brouillons de posts generes"""
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         raise HTTPException(status_code=400, detail="No active profile")
@@ -452,7 +761,7 @@ def get_drafts(
     if status:
         query = query.filter(GeneratedPost.status == status)
 
-    drafts = query.order_by(
+    drafts = query.options(selectinload(GeneratedPost.source_links)).order_by(
         GeneratedPost.generated_at.desc()
     ).limit(limit).all()
 
@@ -479,6 +788,7 @@ def update_draft_status(
         draft.used_at = datetime.utcnow()
 
     db.commit()
+    generator_stats.invalidate()
     db.refresh(draft)
 
     return serialize_generated_post(draft)
@@ -496,6 +806,7 @@ def delete_draft(draft_id: int, db: Session = Depends(get_db)):
 
     db.delete(draft)
     db.commit()
+    generator_stats.invalidate()
 
     return {"success": True, "message": f"Draft {draft_id} deleted"}
 
@@ -503,9 +814,7 @@ def delete_draft(draft_id: int, db: Session = Depends(get_db)):
 @router.get("/stats")
 def get_generator_stats(db: Session = Depends(get_db)):
     """Statistiques du generateur"""
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         return {
@@ -517,37 +826,11 @@ def get_generator_stats(db: Session = Depends(get_db)):
             "posts_used": 0,
         }
 
-    posts_analyzed = db.query(PostRelevanceScore).filter(
-        PostRelevanceScore.profile_id == profile.id
-    ).count()
-
-    relevant_posts = db.query(PostRelevanceScore).filter(
-        PostRelevanceScore.profile_id == profile.id,
-        PostRelevanceScore.overall_relevance >= 50,
-        PostRelevanceScore.is_adaptable == True
-    ).count()
-
-    themes_extracted = db.query(ExtractedTheme).filter(
-        ExtractedTheme.profile_id == profile.id
-    ).count()
-
-    posts_generated = db.query(GeneratedPost).filter(
-        GeneratedPost.profile_id == profile.id
-    ).count()
-
-    posts_used = db.query(GeneratedPost).filter(
-        GeneratedPost.profile_id == profile.id,
-        GeneratedPost.status == "used"
-    ).count()
-
+    # Une seule requete agregee, en cache pour la version du profil
     return {
         "has_profile": True,
         "profile_name": profile.company_name,
-        "posts_analyzed": posts_analyzed,
-        "relevant_posts": relevant_posts,
-        "themes_extracted": themes_extracted,
-        "posts_generated": posts_generated,
-        "posts_used": posts_used,
+        **generator_stats.get(db, profile)
     }
 
 
@@ -615,17 +898,18 @@ def get_inspiration_from_tracker(
     return inspiration_posts
 
 
-@router.post("/spin")
-async def spin_post(
+def build_spin_request(
+    db: Session,
     post_id: int,
-    tone: str = "professional",
-    angle_preference: Optional[str] = None,
-    include_cta: bool = True,
-    db: Session = Depends(get_db)
-):
+    tone: str,
+    angle_preference: Optional[str],
+    include_cta: bool
+) -> tuple:
     """
-    Spin un post tracke pour creer un nouveau post original.
-    Utilise le workflow TypeScript avec gpt-5-nano reasoning.
+    Construit la requete du workflow de spin pour un post tracke.
+
+    Returns:
+        (spin_request, tracked_post, company_profile)
     """
     # Recuperer le post tracke
     tracked_post = db.query(TrackedPost).filter(TrackedPost.id == post_id).first()
@@ -638,15 +922,14 @@ async def spin_post(
     ).first()
 
     # Recuperer le profil entreprise actif
-    company_profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    company_profile = active_profile_cache.get(db)
 
     if not company_profile:
         raise HTTPException(
             status_code=400,
             detail="No active company profile. Create a profile first."
         )
+    profile_fields = company_profile.to_dict()
 
     # Construire la requete pour le workflow TypeScript
     spin_request = {
@@ -663,11 +946,11 @@ async def spin_post(
         "company_profile": {
             "company_name": company_profile.company_name,
             "industry": company_profile.industry,
-            "tone_of_voice": json.loads(company_profile.tone_of_voice) if company_profile.tone_of_voice else [],
-            "key_messages": json.loads(company_profile.key_messages) if company_profile.key_messages else [],
-            "values": json.loads(company_profile.values) if company_profile.values else [],
-            "target_audience": json.loads(company_profile.target_audience) if company_profile.target_audience else None,
-            "differentiators": json.loads(company_profile.differentiators) if company_profile.differentiators else None
+            "tone_of_voice": profile_fields["tone_of_voice"] or [],
+            "key_messages": profile_fields["key_messages"] or [],
+            "values": profile_fields["values"] or [],
+            "target_audience": profile_fields["target_audience"],
+            "differentiators": profile_fields["differentiators"]
         },
         "spin_options": {
             "tone": tone,
@@ -676,38 +959,195 @@ async def spin_post(
         }
     }
 
-    # Executer le workflow TypeScript de maniere synchrone
-    result = run_spin_workflow(spin_request)
+    return spin_request, tracked_post, company_profile
 
-    if result.get("success"):
-        # Sauvegarder le post genere en base
-        generated = GeneratedPost(
-            profile_id=company_profile.id,
-            content=result["final_post"]["content"],
-            hashtags=json.dumps(result["final_post"]["hashtags"]),
-            theme=result.get("selected_angle"),
-            category=tracked_post.category,
-            target_emotion=None,
-            inspiration_post_ids=json.dumps([post_id]),
-            predicted_engagement=result["final_post"]["predicted_engagement"],
-            authenticity_score=result["final_post"]["authenticity_score"],
-            status="draft"
+
+def save_spin_result(
+    db: Session,
+    spin_request: dict,
+    result: dict,
+    profile: ActiveProfile,
+    post_id: int,
+    category: Optional[str]
+) -> dict:
+    """Sauvegarde le post genere par un spin reussi, le met en cache et construit la reponse"""
+    # Controle d'originalite local : remplace l'auto-evaluation du LLM
+    if "originality_check" not in result:
+        check = originality_checker.check(
+            db,
+            result["final_post"]["content"],
+            spin_request["original_post"]["content"],
+            exclude_ids={post_id}
         )
-        db.add(generated)
-        db.commit()
-        db.refresh(generated)
+        result["final_post"]["originality_score"] = check["originality_score"]
+        result["passed_plagiarism_check"] = check["passed"]
+        result["originality_check"] = check
 
-        return {
-            "success": True,
-            "generated_post": serialize_generated_post(generated),
-            "analysis": result.get("analysis"),
-            "selected_angle": result.get("selected_angle"),
-            "authenticity_score": result["final_post"]["authenticity_score"],
-            "originality_score": result["final_post"]["originality_score"],
-            "passed_ai_check": result.get("passed_ai_check"),
-            "passed_plagiarism_check": result.get("passed_plagiarism_check"),
-            "iterations": result.get("iterations_count")
-        }
+    generated = GeneratedPost(
+        profile_id=profile.id,
+        content=result["final_post"]["content"],
+        hashtags=json.dumps(result["final_post"]["hashtags"]),
+        theme=result.get("selected_angle"),
+        category=category,
+        target_emotion=None,
+        source_links=[GeneratedPostSource(source_type="tracked_post", source_id=post_id)],
+        predicted_engagement=result["final_post"]["predicted_engagement"],
+        authenticity_score=result["final_post"]["authenticity_score"],
+        status="draft"
+    )
+    db.add(generated)
+    db.commit()
+    generator_stats.invalidate()
+    db.refresh(generated)
+
+    try:
+        if result.get("analysis"):
+            spin_cache.store_analysis(db, spin_request["original_post"]["content"], result["analysis"])
+        spin_cache.store_result(db, spin_request, profile.version, result, generated.id)
+    except Exception as e:
+        # Le cache est optionnel, le post genere est deja sauvegarde
+        db.rollback()
+        print(f"[Spin] Cache store failed: {e}")
+
+    return spin_response(generated, result)
+
+
+def spin_response(generated: GeneratedPost, result: dict, cached: bool = False) -> dict:
+    """Reponse d'un spin a partir du post genere et du resultat du workflow"""
+    return {
+        "success": True,
+        "generated_post": serialize_generated_post(generated),
+        "analysis": result.get("analysis"),
+        "selected_angle": result.get("selected_angle"),
+        "authenticity_score": result["final_post"]["authenticity_score"],
+        "originality_score": result["final_post"]["originality_score"],
+        "passed_ai_check": result.get("passed_ai_check"),
+        "passed_plagiarism_check": result.get("passed_plagiarism_check"),
+        "originality_check": result.get("originality_check"),
+        "iterations": result.get("iterations_count"),
+        "cached": cached
+    }
+
+
+def cached_spin_response(
+    db: Session,
+    spin_request: dict,
+    profile: ActiveProfile,
+    post_id: int,
+    category: Optional[str]
+) -> Optional[dict]:
+    """
+    Variante deja generee pour ce post, cette version du profil et ces options.
+    Si le brouillon a ete supprime depuis, il est recree a partir du cache.
+    """
+    entry = spin_cache.get_result(db, spin_request, profile.version)
+    if not entry:
+        return None
+
+    result = json.loads(entry.result)
+    generated = None
+    if entry.generated_post_id:
+        generated = db.query(GeneratedPost).filter(GeneratedPost.id == entry.generated_post_id).first()
+    if generated is None:
+        return {**save_spin_result(db, spin_request, result, profile, post_id, category), "cached": True}
+    return spin_response(generated, result, cached=True)
+
+
+def attach_cached_analysis(db: Session, spin_request: dict):
+    """Ajoute l'analyse en cache du post original pour sauter l'etape 1 du workflow"""
+    analysis = spin_cache.get_analysis(db, spin_request["original_post"]["content"])
+    if analysis:
+        spin_request["cached_analysis"] = analysis
+
+
+def prepare_spin(
+    db: Session,
+    post_id: int,
+    tone: str,
+    angle_preference: Optional[str],
+    include_cta: bool,
+    force: bool
+) -> tuple:
+    """
+    Requete du workflow de spin, ou la variante deja en cache.
+
+    Returns:
+        (spin_request, profile, category, cached) ; profile est l'instantane
+        du profil actif (id et version), cached vaut None si le workflow doit tourner
+    """
+    spin_request, tracked_post, company_profile = build_spin_request(
+        db, post_id, tone, angle_preference, include_cta
+    )
+    cached = None if force else cached_spin_response(
+        db, spin_request, company_profile, post_id, tracked_post.category
+    )
+    if cached is None:
+        attach_cached_analysis(db, spin_request)
+    return spin_request, company_profile, tracked_post.category, cached
+
+
+def prepare_spin_in_session(
+    post_id: int,
+    tone: str,
+    angle_preference: Optional[str],
+    include_cta: bool,
+    force: bool
+) -> tuple:
+    """prepare_spin dans sa propre session, fermee avant le lancement du workflow"""
+    db = SessionLocal()
+    try:
+        return prepare_spin(db, post_id, tone, angle_preference, include_cta, force)
+    finally:
+        db.close()
+
+
+def save_spin_draft(
+    spin_request: dict,
+    result: dict,
+    profile: ActiveProfile,
+    post_id: int,
+    category: Optional[str]
+) -> dict:
+    """save_spin_result dans sa propre session, ouverte une fois le workflow termine"""
+    db = SessionLocal()
+    try:
+        return save_spin_result(db, spin_request, result, profile, post_id, category)
+    finally:
+        db.close()
+
+
+@router.post("/spin")
+async def spin_post(
+    post_id: int,
+    tone: str = "professional",
+    angle_preference: Optional[str] = None,
+    include_cta: bool = True,
+    force: bool = False
+):
+    """
+    Spin un post tracke pour creer un nouveau post original.
+    Utilise le workflow TypeScript avec gpt-5-nano reasoning.
+    Attend la fin du workflow ; voir /spin/start pour suivre l'avancement.
+
+    Le meme post avec le meme profil et les memes options renvoie la
+    variante en cache (cached=true) ; force=true genere une nouvelle variante.
+    Aucune connexion a la base n'est tenue pendant le workflow.
+    """
+    # Lectures, cache et controle d'originalite tournent dans un thread
+    spin_request, profile, category, cached = await asyncio.to_thread(
+        prepare_spin_in_session, post_id, tone, angle_preference, include_cta, force
+    )
+    if cached:
+        return cached
+
+    # Le spin attend son resultat, mais passe par la file bornee et ne
+    # bloque pas la boucle evenementielle pendant l'execution
+    result = await submit_workflow("spin", run_spin_workflow(spin_request))
+
+    if result.get("success"):
+        return await asyncio.to_thread(
+            save_spin_draft, spin_request, result, profile, post_id, category
+        )
     else:
         raise HTTPException(
             status_code=500,
@@ -715,146 +1155,337 @@ async def spin_post(
         )
 
 
-def run_spin_workflow(spin_request: dict) -> dict:
-    """Execute le workflow TypeScript de spin"""
-    import tempfile
-    temp_file = None
+@router.post("/spin/start")
+async def start_spin(
+    post_id: int,
+    tone: str = "professional",
+    angle_preference: Optional[str] = None,
+    include_cta: bool = True,
+    force: bool = False
+):
+    """
+    Lance un spin en arriere-plan et renvoie son identifiant.
+    L'avancement (analyse, angles, redaction, verifications) est diffuse
+    en SSE sur /spin/{spin_id}/events. Une variante en cache termine le
+    spin immediatement.
+    """
+    spin_request, profile, category, cached = await asyncio.to_thread(
+        prepare_spin_in_session, post_id, tone, angle_preference, include_cta, force
+    )
+
+    run = workflow_runs.create("spin", {"post_id": post_id, "tone": tone})
 
+    if cached:
+        run.publish({"type": "progress", "phase": "done", "message": "Cached variant", "data": {"cached": True}})
+        run.finish(result=cached)
+    else:
+        try:
+            submit_workflow("spin", execute_spin_run(run, spin_request, profile, post_id, category))
+        except HTTPException as e:
+            run.finish(error=e.detail)
+            raise
+
+    return {
+        "spin_id": run.id,
+        "status": run.status,
+        "events_url": f"/api/generator/spin/{run.id}/events"
+    }
+
+
+async def execute_spin_run(
+    run: WorkflowRun,
+    spin_request: dict,
+    profile: ActiveProfile,
+    post_id: int,
+    category: Optional[str]
+):
+    """Execute un spin lance par /spin/start et publie son resultat"""
+    run.publish({"type": "progress", "phase": "started", "message": "Spin started", "data": None})
     try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        print(f"[Spin] Starting spin workflow...")
-        print(f"[Spin] CWD: {cwd}")
-
-        # Écrire le JSON dans un fichier temporaire pour éviter les problèmes d'encodage
-        request_json = json.dumps(spin_request, ensure_ascii=False)
-        temp_file = tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.json',
-            delete=False,
-            encoding='utf-8'
+        result = await run_spin_workflow(spin_request, on_event=run.publish)
+        if not result.get("success"):
+            run.finish(error=result.get("error") or "Unknown error")
+            return
+
+        run.finish(result=await asyncio.to_thread(
+            save_spin_draft, spin_request, result, profile, post_id, category
+        ))
+    except Exception as e:
+        print(f"[Spin] EXCEPTION: {e}")
+        run.finish(error=str(e))
+
+
+@router.post("/originality-check", response_model=OriginalityCheckResponse)
+def check_originality(request: OriginalityCheckRequest, db: Session = Depends(get_db)):
+    """
+    Controle d'originalite local d'un brouillon, sans appel LLM.
+    Compare le texte au post d'origine et a tous les posts trackes
+    (sequences de 5 mots communes) et renvoie les passages copies.
+    """
+    source_text = request.source_text
+    exclude_ids = set()
+    if request.source_post_id is not None:
+        source = db.query(TrackedPost).filter(TrackedPost.id == request.source_post_id).first()
+        if not source:
+            raise HTTPException(status_code=404, detail="Source post not found")
+        source_text = source.content
+        exclude_ids.add(source.id)
+
+    return originality_checker.check(db, request.content, source_text, exclude_ids=exclude_ids)
+
+
+@router.get("/spin-cache")
+def get_spin_cache_stats(db: Session = Depends(get_db)):
+    """Taille et hits du cache de spin"""
+    return spin_cache.stats(db)
+
+
+@router.delete("/spin-cache")
+def clear_spin_cache(db: Session = Depends(get_db)):
+    """Vide le cache de spin (variantes et analyses)"""
+    return {"success": True, "deleted": spin_cache.clear(db)}
+
+
+@router.post("/spin/batch", response_model=SpinBatchResponse)
+async def start_spin_batch(request: SpinBatchRequest, db: Session = Depends(get_db)):
+    """
+    Spin plusieurs posts trackes en une fois (ex: une semaine de contenu).
+    Au plus `concurrency` spins tournent en parallele ; chaque brouillon est
+    sauvegarde des que son spin termine. Renvoie un identifiant de batch :
+    statut sur /spin/batch/{batch_id}, avancement en SSE sur .../events.
+    """
+    post_ids = list(dict.fromkeys(request.post_ids))
+
+    found = {
+        post_id for (post_id,) in
+        db.query(TrackedPost.id).filter(TrackedPost.id.in_(post_ids))
+    }
+    missing = [post_id for post_id in post_ids if post_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Posts not found: {missing}")
+
+    if not active_profile_cache.get(db):
+        raise HTTPException(
+            status_code=400,
+            detail="No active company profile. Create a profile first."
         )
-        temp_file.write(request_json)
-        temp_file.close()
-
-        print(f"[Spin] Request saved to: {temp_file.name}")
-
-        # Utiliser le fichier temporaire comme argument
-        cmd = f'npx tsx src/workflow-spin.ts --file "{temp_file.name}"'
-
-        # Utiliser Popen pour éviter les problèmes de buffering avec le SDK OpenAI
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace'
+
+    run = workflow_runs.create("spin_batch", {
+        "post_ids": post_ids,
+        "tone": request.tone,
+        "concurrency": request.concurrency
+    })
+
+    # Le batch lui-meme n'occupe pas de place dans la file des workflows :
+    # seuls ses spins y passent, un par un
+    workflow_executor.spawn(f"spin batch {run.id}", execute_spin_batch(run, post_ids, request))
+
+    return {
+        "batch_id": run.id,
+        "status": run.status,
+        "total": len(post_ids),
+        "status_url": f"/api/generator/spin/batch/{run.id}",
+        "events_url": f"/api/generator/spin/batch/{run.id}/events"
+    }
+
+
+async def execute_spin_batch(run: WorkflowRun, post_ids: List[int], options: SpinBatchRequest):
+    """Spin les posts d'un batch avec au plus options.concurrency spins en parallele"""
+    semaphore = asyncio.Semaphore(options.concurrency)
+    items = []
+
+    async def spin_one(post_id: int):
+        async with semaphore:
+            run.publish({
+                "type": "progress", "phase": "item_started",
+                "message": f"Spinning post {post_id}", "data": {"post_id": post_id}
+            })
+            try:
+                item = await spin_batch_item(post_id, options)
+                phase = "item_done"
+            except HTTPException as e:
+                item = {"post_id": post_id, "success": False, "error": e.detail}
+                phase = "item_failed"
+            except Exception as e:
+                print(f"[Spin] Batch item {post_id} failed: {e}")
+                item = {"post_id": post_id, "success": False, "error": str(e)}
+                phase = "item_failed"
+            items.append(item)
+            run.publish({
+                "type": "progress", "phase": phase,
+                "message": f"Post {post_id} {'done' if item['success'] else 'failed'} ({len(items)}/{len(post_ids)})",
+                "data": item
+            })
+
+    try:
+        await asyncio.gather(*(spin_one(post_id) for post_id in post_ids))
+    except Exception as e:
+        print(f"[Spin] Batch EXCEPTION: {e}")
+        run.finish(error=str(e))
+        return
+
+    order = {post_id: index for index, post_id in enumerate(post_ids)}
+    items.sort(key=lambda item: order[item["post_id"]])
+    completed = sum(1 for item in items if item["success"])
+    run.finish(result={
+        "total": len(post_ids),
+        "completed": completed,
+        "failed": len(items) - completed,
+        "cached": sum(1 for item in items if item.get("cached")),
+        "items": items
+    })
+
+
+async def spin_batch_item(post_id: int, options: SpinBatchRequest) -> dict:
+    """
+    Spin un post d'un batch et sauvegarde son brouillon.
+
+    Aucune session n'est tenue pendant l'attente d'une place dans la file
+    ni pendant le workflow : une pour preparer le spin, une pour le sauvegarder.
+    """
+    spin_request, profile, category, response = await asyncio.to_thread(
+        prepare_spin_in_session,
+        post_id, options.tone, options.angle_preference, options.include_cta, options.force
+    )
+
+    if response is None:
+        result = await submit_spin_when_admitted(spin_request)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error") or "Unknown error")
+        response = await asyncio.to_thread(
+            save_spin_draft, spin_request, result, profile, post_id, category
         )
 
-        # Lire la sortie ligne par ligne avec timeout
-        start_time = time.time()
-        output_lines = []
+    return {
+        "post_id": post_id,
+        "success": True,
+        "generated_post_id": response["generated_post"]["id"],
+        "selected_angle": response["selected_angle"],
+        "authenticity_score": response["authenticity_score"],
+        "cached": response["cached"]
+    }
+
+
+async def submit_spin_when_admitted(spin_request: dict) -> dict:
+    """Soumet un spin a la file bornee, en attendant qu'une place se libere"""
+    while True:
+        try:
+            return await workflow_executor.submit("spin", run_spin_workflow(spin_request))
+        except WorkflowQueueFull:
+            await asyncio.sleep(SPIN_BATCH_RETRY_DELAY)
+
+
+@router.get("/spin/batch/{batch_id}")
+async def get_spin_batch(batch_id: str):
+    """Statut d'un batch de spins ; le resultat liste les brouillons crees"""
+    status = await run_status(batch_id, ("spin_batch",))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Spin batch not found")
+    return status
+
+
+@router.get("/spin/batch/{batch_id}/events")
+async def stream_spin_batch_events(batch_id: str, request: Request):
+    """
+    Flux SSE d'un batch de spins.
+    Evenements : progress (item_started, item_done, item_failed), puis result.
+    """
+    stream = await run_event_stream(batch_id, ("spin_batch",), request)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Spin batch not found")
+    return stream
+
+
+@router.get("/spin/{spin_id}")
+async def get_spin(spin_id: str):
+    """Statut et resultat d'un spin lance par /spin/start"""
+    status = await run_status(spin_id, ("spin",))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Spin not found")
+    return status
+
+
+@router.get("/spin/{spin_id}/events")
+async def stream_spin_events(spin_id: str, request: Request):
+    """
+    Flux SSE de l'avancement d'un spin.
+    Evenements : progress (une phase du workflow), puis result ou error.
+    Last-Event-ID permet de reprendre apres une deconnexion.
+    """
+    stream = await run_event_stream(spin_id, ("spin",), request)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Spin not found")
+    return stream
+
+
+def stream_run_events(run: WorkflowRun, request: Request) -> StreamingResponse:
+    """Diffuse les evenements d'un run en SSE, en reprenant apres Last-Event-ID"""
+    last_event_id = request.headers.get("last-event-id")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def event_stream():
+        index = start
         while True:
-            if time.time() - start_time > 180:
-                proc.kill()
-                raise subprocess.TimeoutExpired(cmd, 180)
-
-            # Check if process is done first
-            if proc.poll() is not None:
-                # Process terminé, lire le reste
-                remaining = proc.stdout.read()
-                if remaining:
-                    print(f"[Spin] (remaining output)")
-                    output_lines.append(remaining)
+            async for event in run.follow(index, timeout=SSE_KEEPALIVE):
+                yield format_sse("progress", event, event["seq"])
+                index = event["seq"] + 1
+            if run.done:
                 break
+            # Commentaire SSE pour garder la connexion ouverte entre deux phases
+            yield ": keepalive\n\n"
+        if run.error:
+            yield format_sse("error", {"error": run.error})
+        else:
+            yield format_sse("result", run.result)
 
-            line = proc.stdout.readline()
-            if line:
-                print(f"[Spin] {line.rstrip()}")
-                output_lines.append(line)
-            else:
-                # Pas de ligne disponible, petit délai pour éviter busy-wait
-                time.sleep(0.1)
-
-        if proc.returncode != 0:
-            print(f"[Spin] Process returned: {proc.returncode}")
-            return {
-                "success": False,
-                "error": "".join(output_lines) or "Workflow execution failed"
-            }
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        # Parser la sortie JSON du workflow
-        stdout = "".join(output_lines).strip()
 
-        # Trouver le dernier objet JSON complet dans la sortie
-        # Le JSON du workflow commence par "{" sur une nouvelle ligne
-        lines = stdout.split('\n')
-        json_start_idx = -1
-        for i in range(len(lines) - 1, -1, -1):
-            if lines[i].strip() == '{':
-                json_start_idx = i
-                break
+def format_sse(event: str, data, event_id: Optional[int] = None) -> str:
+    """Formate un evenement Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
 
-        if json_start_idx != -1:
-            json_str = '\n'.join(lines[json_start_idx:])
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                # Fallback: essayer de trouver le JSON autrement
-                pass
-
-        # Fallback: chercher le pattern "success": au début d'un objet JSON
-        match = re.search(r'\{\s*"success":', stdout)
-        if match:
-            json_str = stdout[match.start():]
-            # Trouver la fin du JSON (dernière })
-            brace_count = 0
-            end_idx = 0
-            for i, char in enumerate(json_str):
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_idx = i + 1
-                        break
-            if end_idx > 0:
-                return json.loads(json_str[:end_idx])
-
-        print(f"[Spin] No JSON found in output: {stdout[:500]}")
-        return {
-            "success": False,
-            "error": "No valid JSON output from workflow"
-        }
 
-    except subprocess.TimeoutExpired:
+async def run_spin_workflow(spin_request: dict, on_event=None) -> dict:
+    """
+    Execute le workflow TypeScript de spin.
+    La requete passe par stdin, le resultat et l'avancement reviennent
+    par le canal de resultat (trames NDJSON, voir src/result-channel.ts).
+    """
+    print(f"[Spin] Starting spin workflow...")
+
+    outcome = await workflow_executor.run_workflow(
+        'npx tsx src/workflow-spin.ts --stdin',
+        payload=spin_request,
+        timeout=SPIN_TIMEOUT,
+        on_event=on_event,
+        log_prefix="[Spin]"
+    )
+
+    if outcome["timed_out"]:
         print("[Spin] Workflow timeout")
         return {
             "success": False,
-            "error": "Workflow timeout after 180 seconds"
+            "error": f"Workflow timeout after {SPIN_TIMEOUT} seconds"
         }
-    except json.JSONDecodeError as e:
-        print(f"[Spin] JSON parse error: {e}")
-        return {
-            "success": False,
-            "error": f"Failed to parse workflow output: {e}"
-        }
-    except Exception as e:
-        print(f"[Spin] EXCEPTION: {e}")
+
+    if outcome["result"] is None:
+        print(f"[Spin] Process returned: {outcome['returncode']}, no result")
         return {
             "success": False,
-            "error": str(e)
+            "error": outcome["output"] or "Workflow execution failed"
         }
-    finally:
-        # Nettoyer le fichier temporaire
-        if temp_file and os.path.exists(temp_file.name):
-            try:
-                os.unlink(temp_file.name)
-            except Exception:
-                pass
+
+    return outcome["result"]
 
 
 @router.get("/inspiration-stats")
@@ -14,9 +14,12 @@ from schemas import (
     CollectRequest,
     CollectBatchRequest,
     CollectionStatus,
-    PostCategory
+    PostCategory,
+    SimilarPost
 )
 from services.collector import collect_company_posts, collect_all_companies
+from services.similarity_index import post_similarity
+from services.near_duplicates import post_duplicates
 
 router = APIRouter(prefix="/api/posts", tags=["posts"])
 
@@ -87,13 +90,8 @@ def list_posts(
     return result
 
 
-@router.get("/{post_id}", response_model=PostSchema)
-def get_post(post_id: int, db: Session = Depends(get_db)):
-    """Récupère un post par son ID"""
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-
+def serialize_post(post: Post) -> dict:
+    """Serialize post with its company name"""
     return {
         "id": post.id,
         "company_id": post.company_id,
@@ -110,10 +108,55 @@ def get_post(post_id: int, db: Session = Depends(get_db)):
         "media_type": post.media_type,
         "url": post.url,
         "collected_at": post.collected_at,
-        "company_name": post.company.name
+        "company_name": post.company.name,
+        "duplicate_of": post.duplicate_of
     }
 
 
+@router.get("/{post_id}", response_model=PostSchema)
+def get_post(post_id: int, db: Session = Depends(get_db)):
+    """Récupère un post par son ID"""
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    return serialize_post(post)
+
+
+@router.get("/{post_id}/similar", response_model=List[SimilarPost])
+def get_similar_posts(
+    post_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Posts au contenu le plus proche ("more like this").
+    Recherche approximative dans l'index de similarite, mis a jour avec les nouveaux posts.
+    """
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    return [
+        {**serialize_post(similar), "similarity": round(score, 4)}
+        for similar, score in post_similarity.similar(db, post, limit)
+    ]
+
+
+@router.get("/{post_id}/duplicates", response_model=List[PostSchema])
+def get_post_duplicates(post_id: int, db: Session = Depends(get_db)):
+    """
+    Cluster de quasi-doublons du post (reposts, copies legerement modifiees),
+    premier post collecte en tete. Un post sans doublon est seul dans la liste.
+    """
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    post_duplicates.sync(db)
+    return [serialize_post(p) for p in post_duplicates.cluster(db, post_id)]
+
+
 @router.post("/collect")
 async def trigger_collection(
     request: CollectRequest,
@@ -252,6 +295,8 @@ def delete_post(post_id: int, db: Session = Depends(get_db)):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
+    # Les copies d'un post canonique passent au plus ancien des restants
+    post_duplicates.forget(db, [post.id])
     db.delete(post)
     db.commit()
 
@@ -7,6 +7,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
 from models import UserCompanyProfile
+from services.profile_cache import active_profile_cache
 from schemas import (
     UserCompanyProfile as ProfileSchema,
     UserCompanyProfileCreate,
@@ -42,14 +43,12 @@ def serialize_profile(profile: UserCompanyProfile) -> dict:
 @router.get("", response_model=Optional[ProfileSchema])
 def get_profile(db: Session = Depends(get_db)):
     """Recupere le profil entreprise actif (un seul par utilisateur)"""
-    profile = db.query(UserCompanyProfile).filter(
-        UserCompanyProfile.is_active == True
-    ).first()
+    profile = active_profile_cache.get(db)
 
     if not profile:
         return None
 
-    return serialize_profile(profile)
+    return profile.to_dict()
 
 
 @router.get("/{profile_id}", response_model=ProfileSchema)
@@ -94,6 +93,7 @@ def create_profile(profile_data: UserCompanyProfileCreate, db: Session = Depends
     db_profile = UserCompanyProfile(**data)
     db.add(db_profile)
     db.commit()
+    active_profile_cache.invalidate()
     db.refresh(db_profile)
 
     return serialize_profile(db_profile)
@@ -132,6 +132,7 @@ def update_active_profile(
         setattr(profile, key, value)
 
     db.commit()
+    active_profile_cache.invalidate()
     db.refresh(profile)
 
     return serialize_profile(profile)
@@ -171,6 +172,7 @@ def update_profile_by_id(
         setattr(profile, key, value)
 
     db.commit()
+    active_profile_cache.invalidate()
     db.refresh(profile)
 
     return serialize_profile(profile)
@@ -188,5 +190,6 @@ def delete_profile(profile_id: int, db: Session = Depends(get_db)):
 
     db.delete(profile)
     db.commit()
+    active_profile_cache.invalidate()
 
     return {"success": True, "message": f"Profile {profile_id} deleted"}
@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
 from datetime import datetime, timedelta
 import json
-import subprocess
 import sys
 import os
 
@@ -12,13 +11,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
 from models import (
     TrackedProfile, ProfileSnapshot, TrackedPost,
-    PostContentInsight, ScrapeJob
+    PostContentInsight, ScrapeJob, SchedulerLease, DailyTrackedPostStats
 )
 from schemas import (
     TrackedProfile as TrackedProfileSchema,
     TrackedProfileCreate, TrackedProfileUpdate, TrackedProfileWithStats,
     ProfileSnapshot as ProfileSnapshotSchema,
-    TrackedPost as TrackedPostSchema, TrackedPostWithInsights,
+    TrackedPost as TrackedPostSchema, TrackedPostWithInsights, SimilarTrackedPost,
     PostContentInsight as PostContentInsightSchema,
     ScrapeJob as ScrapeJobSchema,
     TriggerScrapeRequest, BatchScrapeRequest, BatchScrapeResponse,
@@ -26,10 +25,45 @@ from schemas import (
     InspirationPost, InspirationResponse,
     ProfileType, TrackingFrequency, JobType
 )
+from services.tracker_scheduler import get_scheduler
+from services.scrape_planning import plan_auto_frequency, parse_histogram
+from services.job_queue import ScrapeJobQueue
+from services.rollups import window_bounds
+from services.similarity_index import tracked_post_similarity
+from services.near_duplicates import tracked_post_duplicates
+from services.originality import originality_checker
 
 router = APIRouter(prefix="/api/tracker", tags=["tracker"])
 
 
+# ============ Scheduler Helpers ============
+
+def notify_scheduler(*profile_ids: int):
+    """Previent le scheduler qu'il doit recharger ces profils depuis la DB"""
+    scheduler = get_scheduler()
+    if not scheduler:
+        return
+    for profile_id in profile_ids:
+        scheduler.notify_profile_changed(profile_id)
+
+
+# File utilisee quand le scheduler n'est pas demarre (scripts, tests)
+_standalone_queue = ScrapeJobQueue()
+
+
+def get_job_queue() -> ScrapeJobQueue:
+    """File de jobs du scheduler de ce process (ou une file autonome)"""
+    scheduler = get_scheduler()
+    return scheduler.queue if scheduler else _standalone_queue
+
+
+def wake_workers():
+    """Previent les workers qu'un job vient d'etre mis en file"""
+    scheduler = get_scheduler()
+    if scheduler:
+        scheduler.wake_workers()
+
+
 # ============ Serialization Helpers ============
 
 def serialize_profile(profile: TrackedProfile) -> dict:
@@ -104,6 +138,7 @@ def serialize_tracked_post(post: TrackedPost, profile_name: str = None) -> dict:
         "is_new": post.is_new,
         "first_seen_at": post.first_seen_at,
         "engagement_history": json.loads(post.engagement_history) if post.engagement_history else None,
+        "duplicate_of": post.duplicate_of,
         "total_engagement": (post.likes or 0) + (post.comments or 0) + (post.shares or 0),
         "profile_name": profile_name,
     }
@@ -149,6 +184,9 @@ def serialize_job(job: ScrapeJob, profile_name: str = None) -> dict:
         "error_message": job.error_message,
         "retry_count": job.retry_count,
         "max_retries": job.max_retries,
+        "lease_owner": job.lease_owner,
+        "lease_expires_at": job.lease_expires_at,
+        "heartbeat_at": job.heartbeat_at,
         "created_at": job.created_at,
         "duration_seconds": duration,
         "profile_name": profile_name,
@@ -220,6 +258,8 @@ def create_profile(
     db.commit()
     db.refresh(db_profile)
 
+    notify_scheduler(db_profile.id)
+
     return serialize_profile(db_profile)
 
 
@@ -247,6 +287,9 @@ def get_profile(profile_id: int, db: Session = Depends(get_db)):
     result["recent_posts_count"] = recent_posts
     result["last_post_date"] = last_post.first_seen_at if last_post else None
     result["engagement_trend"] = None  # TODO: calculer la tendance
+    result["posting_histogram"] = (
+        parse_histogram(profile.posting_histogram) if profile.posting_histogram else None
+    )
 
     return result
 
@@ -279,6 +322,8 @@ def update_profile(
     db.commit()
     db.refresh(profile)
 
+    notify_scheduler(profile.id)
+
     return serialize_profile(profile)
 
 
@@ -292,9 +337,16 @@ def delete_profile(profile_id: int, db: Session = Depends(get_db)):
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
 
+    # Quasi-doublons d'autres profils dont un post supprime etait l'original,
+    # empreintes d'originalite des posts supprimes
+    post_ids = [post_id for (post_id,) in db.query(TrackedPost.id).filter(TrackedPost.profile_id == profile_id)]
+    tracked_post_duplicates.forget(db, post_ids)
+    originality_checker.forget(db, post_ids)
     db.delete(profile)
     db.commit()
 
+    notify_scheduler(profile_id)
+
     return {"success": True, "message": f"Profile {profile_id} deleted"}
 
 
@@ -374,54 +426,58 @@ def get_tracked_post(post_id: int, db: Session = Depends(get_db)):
     return result
 
 
-# ============ Scrape Endpoints ============
-
-@router.post("/scrape/{profile_id}")
-async def trigger_scrape(
-    profile_id: int,
-    request: TriggerScrapeRequest = TriggerScrapeRequest(),
-    background_tasks: BackgroundTasks = None,
+@router.get("/posts/{post_id}/similar", response_model=List[SimilarTrackedPost])
+def get_similar_tracked_posts(
+    post_id: int,
+    limit: int = Query(10, ge=1, le=50),
     db: Session = Depends(get_db)
 ):
-    """Declenche un scrape pour un profil"""
-    profile = db.query(TrackedProfile).filter(
-        TrackedProfile.id == profile_id
-    ).first()
+    """
+    Posts trackes au contenu le plus proche ("more like this").
+    Recherche approximative dans l'index de similarite, mis a jour avec les nouveaux posts.
+    """
+    post = db.query(TrackedPost).filter(TrackedPost.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
 
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    similar = tracked_post_similarity.similar(db, post, limit)
+    profile_names = dict(db.query(TrackedProfile.id, TrackedProfile.display_name).filter(
+        TrackedProfile.id.in_({p.profile_id for p, _ in similar})
+    ).all()) if similar else {}
 
-    # Creer le job
-    job = ScrapeJob(
-        profile_id=profile_id,
-        job_type=request.job_type.value,
-        status="pending",
-        created_at=datetime.utcnow()
-    )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
+    return [
+        {**serialize_tracked_post(p, profile_names.get(p.profile_id)), "similarity": round(score, 4)}
+        for p, score in similar
+    ]
 
-    # Lancer en arriere-plan
-    background_tasks.add_task(
-        run_scrape_workflow,
-        profile_id=profile_id
-    )
 
-    return {
-        "job_id": job.id,
-        "status": "started",
-        "profile": profile.display_name
-    }
+@router.get("/posts/{post_id}/duplicates", response_model=List[TrackedPostSchema])
+def get_tracked_post_duplicates(post_id: int, db: Session = Depends(get_db)):
+    """
+    Cluster de quasi-doublons du post tracke (meme texte publie par plusieurs
+    profils), premier post vu en tete.
+    """
+    post = db.query(TrackedPost).filter(TrackedPost.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    tracked_post_duplicates.sync(db)
+    cluster = tracked_post_duplicates.cluster(db, post_id)
+    profile_names = dict(db.query(TrackedProfile.id, TrackedProfile.display_name).filter(
+        TrackedProfile.id.in_({p.profile_id for p in cluster})
+    ).all())
 
+    return [serialize_tracked_post(p, profile_names.get(p.profile_id)) for p in cluster]
+
+
+# ============ Scrape Endpoints ============
 
 @router.post("/scrape/batch", response_model=BatchScrapeResponse)
 async def trigger_batch_scrape(
     request: BatchScrapeRequest = BatchScrapeRequest(),
-    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
-    """Declenche un scrape pour plusieurs profils"""
+    """Met en file un scrape pour plusieurs profils"""
     if request.profile_ids:
         profiles = db.query(TrackedProfile).filter(
             TrackedProfile.id.in_(request.profile_ids),
@@ -444,72 +500,51 @@ async def trigger_batch_scrape(
             "message": "No profiles to scrape"
         }
 
+    queue = get_job_queue()
     profile_ids = [p.id for p in profiles]
-
-    # Lancer en arriere-plan
-    background_tasks.add_task(
-        run_batch_scrape_workflow,
-        profile_ids=profile_ids
-    )
+    job_ids = []
+    created_count = 0
+    for profile_id in profile_ids:
+        job, created = queue.enqueue(db, profile_id, job_type=request.job_type.value)
+        job_ids.append(job.id)
+        created_count += created
+    wake_workers()
 
     return {
-        "jobs_created": len(profiles),
+        "jobs_created": created_count,
+        "jobs_attached": len(profile_ids) - created_count,
         "profile_ids": profile_ids,
-        "message": f"Batch scrape started for {len(profiles)} profiles"
+        "job_ids": job_ids,
+        "message": f"Batch scrape queued for {created_count} profiles, {len(profile_ids) - created_count} already in flight"
     }
 
 
-def run_scrape_workflow(profile_id: int):
-    """Execute le workflow TypeScript pour le scrape"""
-    try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        print(f"[Tracker] Running scrape for profile {profile_id}")
-
-        cmd = f'npx tsx src/workflow-tracker.ts scrape {profile_id}'
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            encoding='utf-8',
-            errors='replace'
-        )
+@router.post("/scrape/{profile_id}")
+async def trigger_scrape(
+    profile_id: int,
+    request: TriggerScrapeRequest = TriggerScrapeRequest(),
+    db: Session = Depends(get_db)
+):
+    """Met en file un scrape pour un profil"""
+    profile = db.query(TrackedProfile).filter(
+        TrackedProfile.id == profile_id
+    ).first()
 
-        if result.returncode != 0:
-            print(f"[Tracker] Scrape ERROR: {result.stderr}")
-        else:
-            print(f"[Tracker] Scrape SUCCESS")
-    except Exception as e:
-        print(f"[Tracker] Scrape EXCEPTION: {e}")
-
-
-def run_batch_scrape_workflow(profile_ids: List[int]):
-    """Execute le workflow TypeScript pour le batch scrape"""
-    try:
-        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        ids_str = " ".join(str(id) for id in profile_ids)
-        print(f"[Tracker] Running batch scrape for {len(profile_ids)} profiles")
-
-        cmd = f'npx tsx src/workflow-tracker.ts batch {ids_str}'
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            env=os.environ.copy(),
-            shell=True,
-            encoding='utf-8',
-            errors='replace'
-        )
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
 
-        if result.returncode != 0:
-            print(f"[Tracker] Batch scrape ERROR: {result.stderr}")
-        else:
-            print(f"[Tracker] Batch scrape SUCCESS")
-    except Exception as e:
-        print(f"[Tracker] Batch scrape EXCEPTION: {e}")
+    # Single-flight : un double clic ou un scrape du scheduler en cours
+    # renvoie le job deja actif au lieu d'en lancer un second
+    job, created = get_job_queue().enqueue(db, profile_id, job_type=request.job_type.value)
+    if created:
+        wake_workers()
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attached": not created,
+        "profile": profile.display_name
+    }
 
 
 # ============ Jobs Endpoints ============
@@ -539,6 +574,80 @@ def list_jobs(
     return [serialize_job(job, profile_name) for job, profile_name in results]
 
 
+@router.post("/jobs/{job_id}/retry")
+def retry_job(job_id: int, db: Session = Depends(get_db)):
+    """Remet en file un job mort (retries epuises) ou en echec"""
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    active = get_job_queue().requeue(db, job_id)
+    if not active:
+        raise HTTPException(status_code=400, detail=f"Job is {job.status}, only dead or failed jobs can be retried")
+
+    wake_workers()
+    return {"job_id": active.id, "status": active.status, "attached": active.id != job_id}
+
+
+# ============ Scheduler Endpoints ============
+
+@router.get("/scheduler/leader")
+def get_scheduler_leader(db: Session = Depends(get_db)):
+    """Process qui planifie les scrapes (un seul leader parmi les workers uvicorn)"""
+    lease = db.query(SchedulerLease).filter(
+        SchedulerLease.name == "tracker-scheduler"
+    ).first()
+    scheduler = get_scheduler()
+
+    return {
+        "holder": lease.holder if lease else None,
+        "acquired_at": lease.acquired_at if lease else None,
+        "expires_at": lease.expires_at if lease else None,
+        "heartbeat_at": lease.heartbeat_at if lease else None,
+        "this_process": scheduler.election.holder_id if scheduler else None,
+        "is_leader": scheduler.is_leader if scheduler else False,
+    }
+
+
+@router.get("/scheduler/metrics")
+def get_scheduler_metrics(db: Session = Depends(get_db)):
+    """
+    Retard du scheduler, durees de scrape, taux de succes et profils hors SLA.
+    File, retard et SLA : resume publie par le leader sur la ligne du lease
+    (toutes les minutes), meme reponse quel que soit le worker. Durees et
+    issues : workers de ce process.
+    """
+    scheduler = get_scheduler()
+    if not scheduler:
+        raise HTTPException(status_code=503, detail="Scheduler not running")
+    return scheduler.metrics_snapshot(db)
+
+
+@router.get("/scheduler/auto-frequency")
+def get_auto_frequency_report(db: Session = Depends(get_db)):
+    """Intervalles choisis pour les profils en frequence 'auto' et scrapes economises"""
+    profiles = db.query(TrackedProfile).filter(
+        TrackedProfile.is_active == True,
+        TrackedProfile.tracking_frequency == TrackingFrequency.auto.value
+    ).all()
+
+    now = datetime.utcnow()
+    plans = []
+    for profile in profiles:
+        plan = plan_auto_frequency(db, profile.id, profile.priority, now)
+        plan.pop("interval")
+        plan["display_name"] = profile.display_name
+        plan["next_scrape_at"] = profile.next_scrape_at
+        plans.append(plan)
+
+    return {
+        "profiles": plans,
+        "scrapes_per_week": round(sum(p["scrapes_per_week"] for p in plans), 2),
+        "baseline_scrapes_per_week": round(sum(p["baseline_scrapes_per_week"] for p in plans), 2),
+        "scrapes_saved_per_week": round(sum(p["scrapes_saved_per_week"] for p in plans), 2),
+    }
+
+
 # ============ Analytics Endpoints ============
 
 @router.get("/analytics/overview", response_model=TrackerAnalytics)
@@ -549,15 +658,22 @@ def get_tracker_analytics(db: Session = Depends(get_db)):
         TrackedProfile.is_active == True
     ).count()
 
-    total_posts = db.query(TrackedPost).count()
-    posts_7d = db.query(TrackedPost).filter(
-        TrackedPost.first_seen_at >= datetime.utcnow() - timedelta(days=7)
+    # Compteurs lus dans les agregats journaliers (daily_tracked_post_stats)
+    total_posts, total_engagement = db.query(
+        func.coalesce(func.sum(DailyTrackedPostStats.count), 0),
+        func.sum(DailyTrackedPostStats.likes + DailyTrackedPostStats.comments + DailyTrackedPostStats.shares)
+    ).one()
+    # Jours entiers dans les agregats, premier jour entame relu dans tracked_posts
+    cutoff, first_whole_day = window_bounds(7)
+    posts_7d = db.query(func.coalesce(func.sum(DailyTrackedPostStats.count), 0)).filter(
+        DailyTrackedPostStats.day >= first_whole_day.strftime("%Y-%m-%d")
+    ).scalar() + db.query(TrackedPost).filter(
+        TrackedPost.first_seen_at >= cutoff,
+        TrackedPost.first_seen_at < first_whole_day
     ).count()
 
     # Engagement moyen
-    avg_engagement = db.query(
-        func.avg(TrackedPost.likes + TrackedPost.comments + TrackedPost.shares)
-    ).scalar() or 0
+    avg_engagement = (total_engagement or 0) / total_posts if total_posts else 0
 
     # Top performers
     top_posts = db.query(
@@ -580,28 +696,7 @@ def get_tracker_analytics(db: Session = Depends(get_db)):
         })
 
     # Engagement par jour (7 derniers jours)
-    engagement_by_day = []
-    for i in range(7):
-        day = datetime.utcnow() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-
-        stats = db.query(
-            func.sum(TrackedPost.likes),
-            func.sum(TrackedPost.comments),
-            func.sum(TrackedPost.shares)
-        ).filter(
-            TrackedPost.first_seen_at >= day_start,
-            TrackedPost.first_seen_at < day_end
-        ).first()
-
-        engagement_by_day.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "likes": stats[0] or 0,
-            "comments": stats[1] or 0,
-            "shares": stats[2] or 0,
-            "total": (stats[0] or 0) + (stats[1] or 0) + (stats[2] or 0)
-        })
+    engagement_by_day = daily_engagement(db, 7)
 
     return {
         "total_profiles": total_profiles,
@@ -610,47 +705,48 @@ def get_tracker_analytics(db: Session = Depends(get_db)):
         "posts_last_7_days": posts_7d,
         "avg_engagement_rate": float(avg_engagement),
         "top_performers": top_performers,
-        "engagement_by_day": list(reversed(engagement_by_day))
+        "engagement_by_day": engagement_by_day
     }
 
 
+def daily_engagement(db: Session, days: int, profile_id: Optional[int] = None) -> List[dict]:
+    """Likes, commentaires et partages des posts vus chaque jour, du plus ancien au plus recent"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in reversed(range(days))]
+
+    query = db.query(
+        DailyTrackedPostStats.day,
+        func.sum(DailyTrackedPostStats.likes),
+        func.sum(DailyTrackedPostStats.comments),
+        func.sum(DailyTrackedPostStats.shares)
+    ).filter(DailyTrackedPostStats.day >= dates[0])
+    if profile_id:
+        query = query.filter(DailyTrackedPostStats.profile_id == profile_id)
+    by_day = {day: (likes or 0, comments or 0, shares or 0) for day, likes, comments, shares in query.group_by(
+        DailyTrackedPostStats.day
+    )}
+
+    trends = []
+    for date in dates:
+        likes, comments, shares = by_day.get(date, (0, 0, 0))
+        trends.append({
+            "date": date,
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "total": likes + comments + shares
+        })
+    return trends
+
+
 @router.get("/analytics/engagement-trends", response_model=List[EngagementTrend])
 def get_engagement_trends(
     days: int = 30,
     profile_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Tendances d'engagement sur une periode"""
-    trends = []
-
-    for i in range(days):
-        day = datetime.utcnow() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-
-        query = db.query(
-            func.sum(TrackedPost.likes),
-            func.sum(TrackedPost.comments),
-            func.sum(TrackedPost.shares)
-        ).filter(
-            TrackedPost.first_seen_at >= day_start,
-            TrackedPost.first_seen_at < day_end
-        )
-
-        if profile_id:
-            query = query.filter(TrackedPost.profile_id == profile_id)
-
-        stats = query.first()
-
-        trends.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "likes": stats[0] or 0,
-            "comments": stats[1] or 0,
-            "shares": stats[2] or 0,
-            "total": (stats[0] or 0) + (stats[1] or 0) + (stats[2] or 0)
-        })
-
-    return list(reversed(trends))
+    """Tendances d'engagement sur une periode (une requete sur les agregats journaliers)"""
+    return daily_engagement(db, days, profile_id)
 
 
 @router.get("/analytics/top-performers", response_model=List[TopPerformer])
@@ -755,11 +851,12 @@ def get_tracker_stats(db: Session = Depends(get_db)):
         TrackedProfile.is_active == True
     ).count()
 
-    total_posts = db.query(TrackedPost).count()
-
-    posts_today = db.query(TrackedPost).filter(
-        TrackedPost.first_seen_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    ).count()
+    total_posts, posts_today = db.query(
+        func.coalesce(func.sum(DailyTrackedPostStats.count), 0),
+        func.coalesce(func.sum(DailyTrackedPostStats.count).filter(
+            DailyTrackedPostStats.day >= datetime.utcnow().strftime("%Y-%m-%d")
+        ), 0)
+    ).one()
 
     pending_jobs = db.query(ScrapeJob).filter(
         ScrapeJob.status.in_(["pending", "running"])
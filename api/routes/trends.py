@@ -1,116 +1,208 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, case
+from sqlalchemy import func, literal, select, true, union_all
 from typing import Optional
-from datetime import datetime, timedelta
+import asyncio
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Company, Post
-from schemas import DashboardStats, CategoryCount, SentimentCount, CompanyActivity, TrendPoint
+from models import Company, CompanyPostStats as Totals, DailyCollectedPostStats as Collected, DailyPostStats as Daily, Post
+from schemas import PostCategory, Sentiment, DashboardStats, CategoryCount, SentimentCount, CompanyActivity, TrendPoint
+from services.rollups import rebuild_rollups, window_bounds
 
 router = APIRouter(prefix="/api/trends", tags=["trends"])
 
+# Les routes lisent les agregats journaliers, pas la table posts : par date de
+# publication (daily_post_stats) pour les tendances, de collecte
+# (daily_collected_post_stats) pour les compteurs des derniers jours. Les
+# compteurs sur toute la periode lisent les agregats sans jour (company_post_stats).
+CATEGORIES = [category.value for category in PostCategory]
+SENTIMENTS = [sentiment.value for sentiment in Sentiment]
+
+
+def window(timestamp, stats, days: int):
+    """
+    Agregats des posts dont `timestamp` (posted_at ou collected_at) tombe
+    dans les `days` derniers jours, en sous-requete aux colonnes de
+    `stats`, l'agregat journalier de ce timestamp.
+
+    Les jours entiers viennent des agregats ; le premier jour, entame par la
+    fenetre, est relu dans posts (plage indexee) : la fenetre s'arrete a la
+    seconde, comme un filtre sur posts.
+    """
+    cutoff, first_whole_day = window_bounds(days)
+    whole_days = select(
+        stats.day, stats.company_id, stats.category, stats.duplicate,
+        stats.count, stats.likes, stats.comments, stats.shares, stats.confidence_total, stats.confidence_count
+    ).where(stats.day >= first_whole_day.strftime("%Y-%m-%d"))
+    first_day = select(
+        func.date(timestamp),
+        Post.company_id,
+        func.coalesce(Post.category, ""),
+        Post.duplicate_of.isnot(None),
+        literal(1),
+        func.coalesce(Post.likes, 0),
+        func.coalesce(Post.comments, 0),
+        func.coalesce(Post.shares, 0),
+        func.coalesce(Post.confidence_score, 0),
+        Post.confidence_score.isnot(None)
+    ).where(timestamp >= cutoff, timestamp < first_whole_day)
+    return union_all(whole_days, first_day).subquery("window")
+
+
+def published(days: int):
+    """Agregats des posts publies ces `days` derniers jours (voir window)"""
+    return window(Post.posted_at, Daily, days)
+
+
+def collected(days: int):
+    """Agregats des posts collectes ces `days` derniers jours (voir window)"""
+    return window(Post.collected_at, Collected, days)
+
+
+def ratio(total, count) -> float:
+    return (total or 0) / count if count else 0
+
+
+def posts(*conditions):
+    """Nombre de posts des agregats qui remplissent les conditions (FILTER)"""
+    return func.coalesce(func.sum(Totals.count).filter(*conditions), 0)
+
+
+def company_totals(include_duplicates: bool):
+    """
+    Compteurs du dashboard en un passage sur company_post_stats : une ligne
+    par entreprise, categories et sentiments en agregats conditionnels.
+    """
+    counted = true() if include_duplicates else Totals.duplicate == False
+    return select(
+        Totals.company_id,
+        posts(counted),
+        posts(Totals.duplicate == True),
+        func.coalesce(func.sum(Totals.likes + Totals.comments + Totals.shares).filter(counted), 0),
+        posts(counted, Totals.category != ""),
+        posts(counted, Totals.sentiment != ""),
+        *[posts(counted, Totals.category == category) for category in CATEGORIES],
+        *[posts(counted, Totals.sentiment == sentiment) for sentiment in SENTIMENTS]
+    ).group_by(Totals.company_id)
+
+
+# Construites une fois : 16 agregats, trop couteux a recompiler a chaque appel
+COMPANY_TOTALS = {include: company_totals(include) for include in (False, True)}
+
 
 @router.get("", response_model=DashboardStats)
 def get_dashboard_stats(
     days: int = Query(30, description="Nombre de jours pour les tendances"),
+    include_duplicates: bool = Query(False, description="Compter aussi les quasi-doublons (reposts)"),
     db: Session = Depends(get_db)
 ):
-    """Statistiques globales pour le dashboard"""
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    last_7_days = datetime.utcnow() - timedelta(days=7)
+    """
+    Statistiques globales pour le dashboard.
+    Un post repris par plusieurs entreprises compte une fois (le premier du
+    cluster de quasi-doublons), sauf avec include_duplicates.
+    Un passage sur company_post_stats pour les compteurs sur toute la
+    periode, puis une fenetre de daily_post_stats pour les tendances et une
+    de daily_collected_post_stats pour les 7 derniers jours (voir
+    benchmarks/dashboard_stats.py).
+    """
+    counted = true() if include_duplicates else Totals.duplicate == False
+
+    # Entreprises : compteurs et noms en une lecture (table courte)
+    companies = db.query(Company.id, Company.name, Company.is_active).all()
+    names = {c.id: c.name for c in companies}
+
+    # 1. Compteurs sur toute la periode, sommes ensuite sur les entreprises
+    rows = db.execute(COMPANY_TOTALS[include_duplicates]).all()
+    totals = [sum(column) for column in zip(*rows)] or [0] * (6 + len(CATEGORIES) + len(SENTIMENTS))
+    total_posts, duplicate_posts, _, categorized, with_sentiment = totals[1:6]
+    category_counts = dict(zip(CATEGORIES, totals[6:6 + len(CATEGORIES)]))
+    sentiment_counts = dict(zip(SENTIMENTS, totals[6 + len(CATEGORIES):]))
+
+    # Valeurs hors des enums (corrections manuelles) : regroupement complet
+    if categorized != sum(category_counts.values()):
+        category_counts = dict(db.query(Totals.category, func.sum(Totals.count)).filter(
+            Totals.category != "", counted
+        ).group_by(Totals.category).all())
+    if with_sentiment != sum(sentiment_counts.values()):
+        sentiment_counts = dict(db.query(Totals.sentiment, func.sum(Totals.count)).filter(
+            Totals.sentiment != "", counted
+        ).group_by(Totals.sentiment).all())
+
+    # 2. Tendances : jours de publication de la fenetre, par categorie
+    trends = published(days)
+    trend_counts = db.query(
+        trends.c.day.label("date"),
+        trends.c.category,
+        func.sum(trends.c.count).label("count")
+    ).filter(
+        trends.c.category != "",
+        true() if include_duplicates else trends.c.duplicate == False
+    ).group_by(
+        trends.c.day,
+        trends.c.category
+    ).order_by("date").all()
 
-    # Compteurs de base
-    total_companies = db.query(Company).count()
-    active_companies = db.query(Company).filter(Company.is_active == True).count()
-    total_posts = db.query(Post).count()
-    posts_last_7_days = db.query(Post).filter(Post.collected_at >= last_7_days).count()
+    # 3. Posts collectes ces 7 derniers jours
+    last_7_days = collected(7)
+    posts_last_7_days = db.query(func.coalesce(func.sum(last_7_days.c.count), 0)).filter(
+        true() if include_duplicates else last_7_days.c.duplicate == False
+    ).scalar()
 
     # Posts par catégorie
-    category_counts = db.query(
-        Post.category,
-        func.count(Post.id).label("count")
-    ).filter(
-        Post.category.isnot(None)
-    ).group_by(Post.category).all()
-
-    total_categorized = sum(c.count for c in category_counts)
+    total_categorized = sum(category_counts.values())
     posts_by_category = [
         CategoryCount(
-            category=c.category or "unknown",
-            count=c.count,
-            percentage=round((c.count / total_categorized * 100) if total_categorized > 0 else 0, 1)
+            category=category,
+            count=count,
+            percentage=round((count / total_categorized * 100) if total_categorized > 0 else 0, 1)
         )
-        for c in category_counts
+        for category, count in sorted(category_counts.items()) if count
     ]
 
     # Posts par sentiment
-    sentiment_counts = db.query(
-        Post.sentiment,
-        func.count(Post.id).label("count")
-    ).filter(
-        Post.sentiment.isnot(None)
-    ).group_by(Post.sentiment).all()
-
-    total_sentiments = sum(s.count for s in sentiment_counts)
+    total_sentiments = sum(sentiment_counts.values())
     posts_by_sentiment = [
         SentimentCount(
-            sentiment=s.sentiment or "unknown",
-            count=s.count,
-            percentage=round((s.count / total_sentiments * 100) if total_sentiments > 0 else 0, 1)
+            sentiment=sentiment,
+            count=count,
+            percentage=round((count / total_sentiments * 100) if total_sentiments > 0 else 0, 1)
         )
-        for s in sentiment_counts
+        for sentiment, count in sorted(sentiment_counts.items()) if count
     ]
 
     # Top entreprises par activité
-    top_companies_query = db.query(
-        Company.id,
-        Company.name,
-        func.count(Post.id).label("post_count"),
-        func.avg(Post.likes + Post.comments + Post.shares).label("avg_engagement")
-    ).join(Post).group_by(Company.id).order_by(
-        desc("post_count")
-    ).limit(10).all()
-
     top_companies = [
         CompanyActivity(
-            company_id=c.id,
-            company_name=c.name,
-            post_count=c.post_count,
-            avg_engagement=round(c.avg_engagement or 0, 1)
+            company_id=c[0],
+            company_name=names[c[0]],
+            post_count=c[1],
+            avg_engagement=round(ratio(c[3], c[1]), 1)
         )
-        for c in top_companies_query
+        # c : company_id, posts, quasi-doublons, engagement, ...
+        for c in sorted(
+            (c for c in rows if c[0] in names and c[1]),
+            key=lambda c: (-c[1], c[0])
+        )[:10]
     ]
 
     # Tendances récentes (par jour et catégorie)
-    trends_query = db.query(
-        func.date(Post.posted_at).label("date"),
-        Post.category,
-        func.count(Post.id).label("count")
-    ).filter(
-        Post.posted_at >= cutoff_date,
-        Post.category.isnot(None)
-    ).group_by(
-        func.date(Post.posted_at),
-        Post.category
-    ).order_by("date").all()
-
     recent_trends = [
         TrendPoint(
             date=str(t.date) if t.date else "",
-            category=t.category or "unknown",
+            category=t.category,
             count=t.count
         )
-        for t in trends_query
+        for t in trend_counts
     ]
 
     return DashboardStats(
-        total_companies=total_companies,
-        active_companies=active_companies,
+        total_companies=len(companies),
+        active_companies=sum(1 for c in companies if c.is_active),
         total_posts=total_posts,
         posts_last_7_days=posts_last_7_days,
+        duplicate_posts=duplicate_posts,
         posts_by_category=posts_by_category,
         posts_by_sentiment=posts_by_sentiment,
         top_companies=top_companies,
@@ -125,36 +217,35 @@ def get_category_breakdown(
     db: Session = Depends(get_db)
 ):
     """Répartition détaillée par catégorie"""
+    # Avec days : posts collectes sur la periode ; sinon toute la periode
+    stats = collected(days).c if days else Totals.__table__.c
     query = db.query(
-        Post.category,
-        func.count(Post.id).label("count"),
-        func.avg(Post.likes).label("avg_likes"),
-        func.avg(Post.comments).label("avg_comments"),
-        func.avg(Post.shares).label("avg_shares"),
-        func.avg(Post.confidence_score).label("avg_confidence")
+        stats.category,
+        func.sum(stats.count).label("count"),
+        func.sum(stats.likes).label("likes"),
+        func.sum(stats.comments).label("comments"),
+        func.sum(stats.shares).label("shares"),
+        func.sum(stats.confidence_total).label("confidence_total"),
+        func.sum(stats.confidence_count).label("confidence_count")
     )
 
     if company_id:
-        query = query.filter(Post.company_id == company_id)
-
-    if days:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(Post.collected_at >= cutoff)
+        query = query.filter(stats.company_id == company_id)
 
     results = query.filter(
-        Post.category.isnot(None)
-    ).group_by(Post.category).all()
+        stats.category != ""
+    ).group_by(stats.category).all()
 
     return {
         "breakdown": [
             {
                 "category": r.category,
                 "count": r.count,
-                "avg_likes": round(r.avg_likes or 0, 1),
-                "avg_comments": round(r.avg_comments or 0, 1),
-                "avg_shares": round(r.avg_shares or 0, 1),
-                "avg_confidence": round(r.avg_confidence or 0, 1),
-                "avg_engagement": round((r.avg_likes or 0) + (r.avg_comments or 0) + (r.avg_shares or 0), 1)
+                "avg_likes": round(ratio(r.likes, r.count), 1),
+                "avg_comments": round(ratio(r.comments, r.count), 1),
+                "avg_shares": round(ratio(r.shares, r.count), 1),
+                "avg_confidence": round(ratio(r.confidence_total, r.confidence_count), 1),
+                "avg_engagement": round(ratio((r.likes or 0) + (r.comments or 0) + (r.shares or 0), r.count), 1)
             }
             for r in results
         ]
@@ -169,22 +260,21 @@ def get_timeline(
     db: Session = Depends(get_db)
 ):
     """Timeline des posts par jour"""
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
+    stats = published(days).c
     query = db.query(
-        func.date(Post.posted_at).label("date"),
-        func.count(Post.id).label("count"),
-        func.sum(Post.likes).label("total_likes"),
-        func.sum(Post.comments).label("total_comments")
-    ).filter(Post.posted_at >= cutoff)
+        stats.day.label("date"),
+        func.sum(stats.count).label("count"),
+        func.sum(stats.likes).label("total_likes"),
+        func.sum(stats.comments).label("total_comments")
+    )
 
     if category:
-        query = query.filter(Post.category == category)
+        query = query.filter(stats.category == category)
 
     if company_id:
-        query = query.filter(Post.company_id == company_id)
+        query = query.filter(stats.company_id == company_id)
 
-    results = query.group_by(func.date(Post.posted_at)).order_by("date").all()
+    results = query.group_by(stats.day).order_by("date").all()
 
     return {
         "timeline": [
@@ -205,19 +295,17 @@ def get_engagement_stats(
     db: Session = Depends(get_db)
 ):
     """Statistiques d'engagement par catégorie"""
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
+    stats = published(days).c
     results = db.query(
-        Post.category,
-        func.count(Post.id).label("count"),
-        func.sum(Post.likes).label("total_likes"),
-        func.sum(Post.comments).label("total_comments"),
-        func.sum(Post.shares).label("total_shares"),
-        func.avg(Post.likes + Post.comments + Post.shares).label("avg_engagement")
+        stats.category,
+        func.sum(stats.count).label("count"),
+        func.sum(stats.likes).label("total_likes"),
+        func.sum(stats.comments).label("total_comments"),
+        func.sum(stats.shares).label("total_shares"),
+        func.sum(stats.likes + stats.comments + stats.shares).label("total_engagement")
     ).filter(
-        Post.posted_at >= cutoff,
-        Post.category.isnot(None)
-    ).group_by(Post.category).all()
+        stats.category != ""
+    ).group_by(stats.category).all()
 
     return {
         "engagement": [
@@ -227,7 +315,7 @@ def get_engagement_stats(
                 "total_likes": r.total_likes or 0,
                 "total_comments": r.total_comments or 0,
                 "total_shares": r.total_shares or 0,
-                "avg_engagement": round(r.avg_engagement or 0, 1)
+                "avg_engagement": round(ratio(r.total_engagement, r.count), 1)
             }
             for r in results
         ]
@@ -241,39 +329,37 @@ def get_company_trends(
     db: Session = Depends(get_db)
 ):
     """Tendances spécifiques à une entreprise"""
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
         return {"error": "Company not found"}
 
+    stats = published(days).c
+
     # Posts par catégorie
     category_counts = db.query(
-        Post.category,
-        func.count(Post.id).label("count")
+        stats.category,
+        func.sum(stats.count).label("count")
     ).filter(
-        Post.company_id == company_id,
-        Post.posted_at >= cutoff,
-        Post.category.isnot(None)
-    ).group_by(Post.category).all()
+        stats.company_id == company_id,
+        stats.category != ""
+    ).group_by(stats.category).all()
 
     # Timeline
     timeline = db.query(
-        func.date(Post.posted_at).label("date"),
-        func.count(Post.id).label("count")
+        stats.day.label("date"),
+        func.sum(stats.count).label("count")
     ).filter(
-        Post.company_id == company_id,
-        Post.posted_at >= cutoff
-    ).group_by(func.date(Post.posted_at)).order_by("date").all()
+        stats.company_id == company_id
+    ).group_by(stats.day).order_by("date").all()
 
     # Engagement moyen
     engagement = db.query(
-        func.avg(Post.likes).label("avg_likes"),
-        func.avg(Post.comments).label("avg_comments"),
-        func.avg(Post.shares).label("avg_shares")
+        func.sum(stats.count).label("count"),
+        func.sum(stats.likes).label("likes"),
+        func.sum(stats.comments).label("comments"),
+        func.sum(stats.shares).label("shares")
     ).filter(
-        Post.company_id == company_id,
-        Post.posted_at >= cutoff
+        stats.company_id == company_id
     ).first()
 
     return {
@@ -290,8 +376,19 @@ def get_company_trends(
             for t in timeline
         ],
         "avg_engagement": {
-            "likes": round(engagement.avg_likes or 0, 1),
-            "comments": round(engagement.avg_comments or 0, 1),
-            "shares": round(engagement.avg_shares or 0, 1)
+            "likes": round(ratio(engagement.likes, engagement.count), 1),
+            "comments": round(ratio(engagement.comments, engagement.count), 1),
+            "shares": round(ratio(engagement.shares, engagement.count), 1)
         }
     }
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_daily_rollups():
+    """
+    Recalcule les agregats (journaliers et par entreprise) depuis posts et tracked_posts.
+    Les triggers les tiennent a jour ; a utiliser apres une ecriture faite
+    sans triggers (restauration, import SQL brut). Equivalent en ligne de
+    commande : cd api && python services/rollups.py
+    """
+    return {"success": True, "rollups": await asyncio.to_thread(rebuild_rollups)}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -83,11 +83,16 @@ class Post(PostBase):
     linkedin_post_id: Optional[str] = None
     collected_at: datetime
     company_name: Optional[str] = None
+    duplicate_of: Optional[int] = None  # Premier post du cluster de quasi-doublons
 
     class Config:
         from_attributes = True
 
 
+class SimilarPost(Post):
+    similarity: float  # Cosinus TF-IDF approche, 0-1
+
+
 # ============ Collection Schemas ============
 
 class CollectRequest(BaseModel):
@@ -147,6 +152,7 @@ class DashboardStats(BaseModel):
     active_companies: int
     total_posts: int
     posts_last_7_days: int
+    duplicate_posts: int = 0  # Quasi-doublons exclus des compteurs
     posts_by_category: List[CategoryCount]
     posts_by_sentiment: List[SentimentCount]
     top_companies: List[CompanyActivity]
@@ -331,6 +337,13 @@ class ExtractedTheme(ExtractedThemeBase):
         from_attributes = True
 
 
+class ThemePostsPage(BaseModel):
+    theme_id: int
+    total: int
+    items: List[Post]
+    next_after_id: Optional[int] = None  # Curseur de la page suivante, None en fin de liste
+
+
 # Request/Response Schemas
 class AnalyzeRelevanceRequest(BaseModel):
     category: Optional[str] = None
@@ -339,7 +352,11 @@ class AnalyzeRelevanceRequest(BaseModel):
 
 
 class AnalyzeRelevanceResponse(BaseModel):
-    total_posts_analyzed: int
+    job_id: Optional[str] = None  # Suivi sur /api/generator/jobs/{job_id}, None si rien a noter
+    total_posts_analyzed: int  # Posts envoyes au workflow
+    posts_already_scored: int = 0  # Posts deja notes pour la version actuelle du profil
+    posts_prefiltered: int = 0  # Posts ecartes par le pre-filtre local (appels LLM evites)
+    posts_duplicates_skipped: int = 0  # Quasi-doublons non notes (le premier post du cluster l'est)
     relevant_posts: int
     company_specific_posts: int
     adaptable_posts: int
@@ -355,11 +372,61 @@ class GeneratePostsRequest(BaseModel):
 
 
 class GeneratePostsResponse(BaseModel):
-    generated_posts: List[GeneratedPost]
+    job_id: str  # Les posts generes sont dans le resultat du job
+    status: str
+    job_url: str
     inspiration_sources: List[int]
     themes_used: List[str]
 
 
+class SpinBatchRequest(BaseModel):
+    post_ids: List[int] = Field(..., min_length=1, max_length=100)  # Posts trackes a spinner
+    tone: str = "professional"
+    angle_preference: Optional[str] = None
+    include_cta: bool = True
+    force: bool = False  # Ignorer les variantes en cache
+    concurrency: int = Field(2, ge=1, le=8)  # Spins en parallele pour ce batch
+
+
+class SpinBatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    status_url: str
+    events_url: str
+
+
+class OriginalityCheckRequest(BaseModel):
+    content: str = Field(..., min_length=1)  # Brouillon a verifier
+    source_post_id: Optional[int] = None  # Post tracke d'origine (spin)
+    source_text: Optional[str] = None  # Texte d'origine, si ce n'est pas un post tracke
+
+
+class OverlapSpan(BaseModel):
+    start: int  # Offsets en caracteres dans le brouillon
+    end: int
+    text: str
+    source: str  # original, tracked_post
+    post_id: Optional[int] = None
+
+
+class CorpusMatch(BaseModel):
+    post_id: int
+    shared_shingles: int
+    overlap: float  # Part des sequences de 5 mots du brouillon
+
+
+class OriginalityCheckResponse(BaseModel):
+    originality_score: float  # 0-100, part des mots hors passages copies
+    passed: bool
+    source_overlap: float
+    copied_words: int
+    total_words: int
+    spans: List[OverlapSpan]
+    corpus_matches: List[CorpusMatch]
+    elapsed_ms: float
+
+
 # ============ LinkedIn Tracker Schemas ============
 
 class ProfileType(str, Enum):
@@ -371,6 +438,7 @@ class TrackingFrequency(str, Enum):
     hourly = "hourly"
     daily = "daily"
     weekly = "weekly"
+    auto = "auto"  # Intervalle adapte au rythme de publication
 
 
 class ScrapeStatus(str, Enum):
@@ -378,6 +446,7 @@ class ScrapeStatus(str, Enum):
     running = "running"
     completed = "completed"
     failed = "failed"
+    dead = "dead"
 
 
 class JobType(str, Enum):
@@ -438,6 +507,7 @@ class TrackedProfileWithStats(TrackedProfile):
     recent_posts_count: int = 0
     engagement_trend: Optional[str] = None  # "up", "down", "stable"
     last_post_date: Optional[datetime] = None
+    posting_histogram: Optional[List[float]] = None  # 168 poids, index = jour * 24 + heure (UTC)
 
 
 # Profile Snapshot Schemas
@@ -504,6 +574,7 @@ class TrackedPost(TrackedPostBase):
     is_new: bool
     first_seen_at: datetime
     engagement_history: Optional[List[dict]] = None
+    duplicate_of: Optional[int] = None  # First post of the near-duplicate cluster
     # Computed
     total_engagement: Optional[int] = None
     profile_name: Optional[str] = None
@@ -517,6 +588,10 @@ class TrackedPostWithInsights(TrackedPost):
     insights: Optional["PostContentInsight"] = None
 
 
+class SimilarTrackedPost(TrackedPost):
+    similarity: float  # Cosinus TF-IDF approche, 0-1
+
+
 # Post Content Insight Schemas
 class PostContentInsightBase(BaseModel):
     hook_text: Optional[str] = None
@@ -567,6 +642,9 @@ class ScrapeJob(ScrapeJobBase):
     error_message: Optional[str] = None
     retry_count: Optional[int] = 0
     max_retries: Optional[int] = 3
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
     created_at: datetime
     # Computed
     duration_seconds: Optional[int] = None
@@ -590,6 +668,8 @@ class BatchScrapeResponse(BaseModel):
     jobs_created: int
     profile_ids: List[int]
     message: str
+    job_ids: List[int] = []
+    jobs_attached: int = 0  # Profils deja en cours de scrape
 
 
 class TrackerAnalytics(BaseModel):
@@ -7,6 +7,8 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models import Company, Post, CollectionLog
+from services.similarity_index import post_similarity
+from services.near_duplicates import post_duplicates
 
 # URL de l'API TypeScript
 TYPESCRIPT_API_URL = os.getenv("TYPESCRIPT_API_URL", "http://localhost:3001")
@@ -95,6 +97,19 @@ async def collect_company_posts(
 
         db.commit()
 
+        # Indexer les nouveaux posts pour la recherche de similarite
+        # et signaler les quasi-doublons (reposts entre entreprises)
+        if posts_added:
+            try:
+                post_similarity.sync(db)
+            except Exception as e:
+                print(f"[Collector] Similarity index update failed: {e}")
+            try:
+                post_duplicates.sync(db)
+            except Exception as e:
+                db.rollback()
+                print(f"[Collector] Near-duplicate detection failed: {e}")
+
         return {
             "success": True,
             "company_id": company.id,
@@ -0,0 +1,319 @@
+"""
+Embeddings - Offline hashing TF-IDF vectors stored in a memory-mapped float32 matrix
+"""
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-process
+    fcntl = None
+
+logger = logging.getLogger("Embeddings")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+EMBEDDINGS_DIR = os.getenv("EMBEDDINGS_DIR", os.path.join(DATA_DIR, "embeddings"))
+
+HASH_DIM = 1024  # Columns of the matrix, 4 KB per vector
+MIN_TOKEN_LENGTH = 3
+
+STOPWORDS = frozenset("""
+    les des une est pour que qui dans par sur avec pas plus son ses aux ont
+    mais nous vous ils elles leur leurs cette ces tout tous comme etre avoir
+    fait faire sont ete bien aussi entre sans sous vers chez dont elle lui
+    the and for that with this are was were from have has had not but you
+    your our their they them its can will all any more what when who how
+    about into than then there these those out just also been being very
+""".split())
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def fold(text: Optional[str]) -> str:
+    """Lowercase and strip accents (securite == sécurité)"""
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase unaccented words, without stopwords and short tokens"""
+    return [
+        token for token in _TOKEN_RE.findall(fold(text))
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def hashed_term_frequencies(text: Optional[str], dim: int = HASH_DIM) -> Dict[int, float]:
+    """
+    Sublinear term frequencies (1 + log tf) hashed into `dim` columns.
+
+    crc32 is used rather than hash() so columns are stable across
+    processes and restarts.
+    """
+    counts: Dict[int, int] = {}
+    for token in tokenize(text):
+        column = zlib.crc32(token.encode("utf-8")) % dim
+        counts[column] = counts.get(column, 0) + 1
+    return {column: 1.0 + math.log(count) for column, count in counts.items()}
+
+
+def normalize(vector: Dict[int, float]) -> Dict[int, float]:
+    """L2-normalize a sparse vector (empty stays empty)"""
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return {}
+    return {column: value / norm for column, value in vector.items()}
+
+
+class EmbeddingStore:
+    """
+    Hashing TF-IDF vectors of documents, one row per document id.
+
+    Vectors are L2-normalized float32 rows appended to `<name>.f32` and
+    read through mmap, so similarity queries never load the matrix into
+    Python objects. `<name>.json` holds the row of each id and the
+    document frequencies used for IDF.
+
+    IDF weights are taken when a row is written; rows added later use the
+    updated frequencies. rebuild() rewrites every row with the current
+    weights when the corpus has drifted.
+    """
+
+    def __init__(self, name: str, dim: int = HASH_DIM, directory: Optional[str] = None):
+        """
+        Args:
+            name: File name prefix (posts, tracked_posts, ...)
+            dim: Number of hashed columns
+            directory: Storage directory, EMBEDDINGS_DIR by default
+        """
+        self.name = name
+        self.dim = dim
+        self.directory = directory or EMBEDDINGS_DIR
+        self.matrix_path = os.path.join(self.directory, f"{name}.f32")
+        self.meta_path = os.path.join(self.directory, f"{name}.json")
+        self.lock_path = os.path.join(self.directory, f"{name}.lock")
+
+        self._lock = threading.RLock()
+        self._rows: Dict[int, int] = {}
+        self._ids: List[int] = []
+        self._df = [0] * dim
+        self._n_docs = 0
+        self._meta_mtime = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    # ============ Persistence ============
+
+    def _refresh(self):
+        """Reload the index if another process changed it"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dim") != self.dim:
+            logger.warning(f"Embedding store {self.name} has dim {meta.get('dim')}, expected {self.dim}; ignoring it")
+            return
+
+        self._ids = meta["ids"]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._df = meta["df"]
+        self._n_docs = meta["n_docs"]
+        self._meta_mtime = mtime
+        self._remap()
+
+    def _remap(self):
+        """(Re)open the matrix mmap after its size changed"""
+        self._close_map()
+        if not self._ids or not os.path.exists(self.matrix_path):
+            return
+        with open(self.matrix_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap).cast("f")
+
+    def _close_map(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "n_docs": self._n_docs,
+                "df": self._df,
+                "ids": self._ids,
+            }, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def _file_lock(self):
+        """Exclusive lock across processes while the files are written"""
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(self.lock_path, "a")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    # ============ Vectors ============
+
+    def _idf(self) -> List[float]:
+        n = self._n_docs
+        return [math.log((1 + n) / (1 + df)) + 1.0 for df in self._df]
+
+    def query_vector(self, text: str) -> Dict[int, float]:
+        """Normalized TF-IDF vector of a query text, sparse"""
+        with self._lock:
+            self._refresh()
+            idf = self._idf()
+        tf = hashed_term_frequencies(text, self.dim)
+        return normalize({column: value * idf[column] for column, value in tf.items()})
+
+    def __contains__(self, doc_id: int) -> bool:
+        with self._lock:
+            self._refresh()
+            return doc_id in self._rows
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def missing(self, doc_ids: Iterable[int]) -> List[int]:
+        """Ids without a vector yet"""
+        with self._lock:
+            self._refresh()
+            return [doc_id for doc_id in doc_ids if doc_id not in self._rows]
+
+    def add(self, documents: List[Tuple[int, str]]) -> int:
+        """
+        Embed and append documents that are not stored yet.
+
+        Returns:
+            Number of rows written
+        """
+        lock_handle = self._file_lock()
+        try:
+            with self._lock:
+                self._refresh()
+                new_docs = []
+                seen = set()
+                for doc_id, text in documents:
+                    if doc_id in self._rows or doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    new_docs.append((doc_id, hashed_term_frequencies(text, self.dim)))
+                if not new_docs:
+                    return 0
+
+                # Frequencies first, so the new rows use up-to-date IDF
+                for _, tf in new_docs:
+                    for column in tf:
+                        self._df[column] += 1
+                self._n_docs += len(new_docs)
+                idf = self._idf()
+
+                # Truncate a partial row left by an interrupted write
+                self._close_map()
+                with open(self.matrix_path, "ab") as f:
+                    f.truncate(len(self._ids) * self.dim * 4)
+                    for doc_id, tf in new_docs:
+                        f.write(self._dense_row(tf, idf).tobytes())
+                        self._rows[doc_id] = len(self._ids)
+                        self._ids.append(doc_id)
+
+                self._save_meta()
+                self._remap()
+                return len(new_docs)
+        finally:
+            lock_handle.close()
+
+    def rebuild(self, documents: List[Tuple[int, str]]) -> int:
+        """Rewrite the whole matrix with IDF computed over `documents`"""
+        lock_handle = self._file_lock()
+        try:
+            with self._lock:
+                unique = {}
+                for doc_id, text in documents:
+                    unique.setdefault(doc_id, hashed_term_frequencies(text, self.dim))
+
+                self._df = [0] * self.dim
+                for tf in unique.values():
+                    for column in tf:
+                        self._df[column] += 1
+                self._n_docs = len(unique)
+                idf = self._idf()
+
+                self._close_map()
+                tmp_path = self.matrix_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    for tf in unique.values():
+                        f.write(self._dense_row(tf, idf).tobytes())
+                os.replace(tmp_path, self.matrix_path)
+
+                self._ids = list(unique.keys())
+                self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+                self._save_meta()
+                self._remap()
+                return len(self._ids)
+        finally:
+            lock_handle.close()
+
+    def _dense_row(self, tf: Dict[int, float], idf: List[float]) -> array:
+        row = array("f", bytes(self.dim * 4))
+        for column, value in normalize({c: v * idf[c] for c, v in tf.items()}).items():
+            row[column] = value
+        return row
+
+    # ============ Queries ============
+
+    def similarities(self, query: Dict[int, float], doc_ids: Iterable[int]) -> Dict[int, float]:
+        """
+        Cosine similarity between a normalized sparse query and stored rows.
+
+        Only the query's non-zero columns are read from each row. Ids
+        without a vector are left out of the result.
+        """
+        with self._lock:
+            self._refresh()
+            view = self._view
+            items = list(query.items())
+            result = {}
+            for doc_id in doc_ids:
+                row = self._rows.get(doc_id)
+                if row is None or view is None:
+                    continue
+                base = row * self.dim
+                result[doc_id] = sum(value * view[base + column] for column, value in items)
+            return result
+
+    def vector(self, doc_id: int) -> Optional[Dict[int, float]]:
+        """Stored row of a document as a sparse vector"""
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(doc_id)
+            if row is None or self._view is None:
+                return None
+            base = row * self.dim
+            return {
+                column: value
+                for column, value in enumerate(self._view[base:base + self.dim])
+                if value
+            }
@@ -0,0 +1,102 @@
+"""
+Generator Stats - Generator page counters in one aggregate query, cached per profile version
+"""
+import os
+import sys
+import threading
+import time
+from typing import Dict, Tuple
+from sqlalchemy import case, func, select, true
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import ExtractedTheme, GeneratedPost, PostRelevanceScore
+from services.profile_cache import ActiveProfile
+
+# Workflows of another process write scores and drafts without invalidating:
+# a cached summary is recomputed after this delay
+CACHE_TTL = float(os.getenv("GENERATOR_STATS_TTL", "30"))
+# Same thresholds as the relevance summary
+RELEVANT_SCORE = 50
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+class GeneratorStats:
+    """
+    Counters of the generator page for one profile.
+
+    One SELECT of three aggregate subqueries (scores, themes, generated
+    posts), each with conditional sums instead of a COUNT per counter.
+    Results are cached under the profile version (see ActiveProfile), so
+    editing the profile never serves old counters; invalidate() is called
+    after every generator write and workflow run.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        """
+        Args:
+            ttl: Seconds a cached summary is served without invalidation
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+        self._generation = 0
+
+    def get(self, db: Session, profile: ActiveProfile) -> dict:
+        """Counters of the profile, from the cache when still valid"""
+        with self._lock:
+            cached = self._cache.get(profile.version)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return dict(cached[1])
+            generation = self._generation
+
+        stats = self.compute(db, profile.id)
+        with self._lock:
+            # Only the active profile's version is worth keeping
+            if generation == self._generation:
+                self._cache = {profile.version: (time.monotonic(), stats)}
+        return dict(stats)
+
+    @staticmethod
+    def compute(db: Session, profile_id: int) -> dict:
+        scores = select(
+            func.count(PostRelevanceScore.id),
+            _count_where(
+                (PostRelevanceScore.overall_relevance >= RELEVANT_SCORE)
+                & (PostRelevanceScore.is_adaptable == True)
+            )
+        ).where(PostRelevanceScore.profile_id == profile_id).subquery()
+        themes = select(
+            func.count(ExtractedTheme.id)
+        ).where(ExtractedTheme.profile_id == profile_id).subquery()
+        generated = select(
+            func.count(GeneratedPost.id),
+            _count_where(GeneratedPost.status == "used")
+        ).where(GeneratedPost.profile_id == profile_id).subquery()
+
+        # Each subquery returns one row: joined on TRUE, not a cartesian product
+        row = db.execute(
+            select(scores, themes, generated).select_from(
+                scores.join(themes, true()).join(generated, true())
+            )
+        ).one()
+        posts_analyzed, relevant_posts, themes_extracted, posts_generated, posts_used = row
+        return {
+            "posts_analyzed": posts_analyzed,
+            "relevant_posts": relevant_posts,
+            "themes_extracted": themes_extracted,
+            "posts_generated": posts_generated,
+            "posts_used": posts_used,
+        }
+
+    def invalidate(self):
+        """Drop the cached counters after a write"""
+        with self._lock:
+            self._cache = {}
+            self._generation += 1
+
+
+generator_stats = GeneratorStats()
@@ -0,0 +1,306 @@
+"""
+Scrape Job Queue - Durable lease-based queue on the scrape_jobs table
+"""
+import os
+import socket
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import ScrapeJob
+
+logger = logging.getLogger("ScrapeJobQueue")
+
+# Job lifecycle: pending -> running -> completed
+#                           running -> pending (retry with backoff) -> ... -> dead
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class ScrapeJobQueue:
+    """
+    Queue of scrape jobs stored in scrape_jobs.
+
+    Workers claim a job by taking a lease (lease_owner + lease_expires_at)
+    with a compare-and-set UPDATE, so several processes, or several hosts
+    sharing the database, can drain the table in parallel without running
+    the same job twice. A worker extends its lease with heartbeats; a job
+    whose lease expires (worker crashed) is retried like a failed job.
+    Failed jobs are retried with exponential backoff until max_retries,
+    then dead-lettered with status "dead".
+
+    A profile has at most one active (pending or running) job: enqueue is
+    single-flight, a duplicate trigger gets the job already in flight.
+    The partial unique index ix_scrape_jobs_active_profile enforces this
+    across processes, a lock avoids the constraint error within one.
+    """
+
+    _enqueue_lock = threading.Lock()
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        lease_seconds: int = 600,
+        backoff_base: int = 60,
+        backoff_max: int = 3600
+    ):
+        """
+        Args:
+            worker_id: Unique name of this worker (host:pid:random by default)
+            lease_seconds: Lease duration, renewed by heartbeat()
+            backoff_base: Delay before the first retry, doubled on each retry
+            backoff_max: Upper bound for the retry delay
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    # ============ Producer Side ============
+
+    def find_active(self, db: Session, profile_id: int) -> Optional[ScrapeJob]:
+        """Pending or running job for a profile, if any"""
+        return db.query(ScrapeJob).filter(
+            ScrapeJob.profile_id == profile_id,
+            ScrapeJob.status.in_(ACTIVE_STATUSES)
+        ).order_by(ScrapeJob.id).first()
+
+    def enqueue(
+        self,
+        db: Session,
+        profile_id: int,
+        job_type: str = "full",
+        scheduled_at: Optional[datetime] = None,
+        due_at: Optional[datetime] = None
+    ) -> Tuple[ScrapeJob, bool]:
+        """
+        Add a job for a profile, or attach to the one already in flight.
+
+        Args:
+            due_at: When the profile was due (scheduler lag = created_at - due_at)
+
+        Returns:
+            (job, created) - created is False when an active job existed.
+            The job is committed.
+        """
+        with self._enqueue_lock:
+            existing = self.find_active(db, profile_id)
+            if existing:
+                return existing, False
+
+            now = datetime.utcnow()
+            job = ScrapeJob(
+                profile_id=profile_id,
+                job_type=job_type,
+                status="pending",
+                scheduled_at=scheduled_at or now,
+                due_at=due_at,
+                created_at=now
+            )
+            db.add(job)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another process enqueued the same profile in between
+                db.rollback()
+                existing = self.find_active(db, profile_id)
+                if existing is None:
+                    raise
+                return existing, False
+            db.refresh(job)
+            return job, True
+
+    def requeue(self, db: Session, job_id: int) -> Optional[ScrapeJob]:
+        """
+        Put a dead or failed job back in the queue with a fresh retry budget.
+
+        Returns the profile's active job (this one, or the one already in
+        flight), or None if the job cannot be requeued.
+        """
+        job = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.status.in_(("dead", "failed"))
+        ).first()
+        if not job:
+            return None
+
+        if job.profile_id is not None:
+            active = self.find_active(db, job.profile_id)
+            if active:
+                return active
+
+        job.status = "pending"
+        job.retry_count = 0
+        job.scheduled_at = datetime.utcnow()
+        job.lease_owner = None
+        job.lease_expires_at = None
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return self.find_active(db, job.profile_id)
+        db.refresh(job)
+        return job
+
+    # ============ Worker Side ============
+
+    def claim(self, db: Session, limit: int = 1) -> List[ScrapeJob]:
+        """
+        Atomically lease up to `limit` jobs that are ready to run.
+
+        Each candidate is taken with UPDATE ... WHERE status = 'pending';
+        only one worker can win that update, losers simply move on to the
+        next candidate.
+        """
+        self.reap_expired(db)
+
+        now = datetime.utcnow()
+        candidates = db.query(ScrapeJob.id).filter(
+            ScrapeJob.status == "pending",
+            or_(ScrapeJob.scheduled_at == None, ScrapeJob.scheduled_at <= now)
+        ).order_by(ScrapeJob.scheduled_at, ScrapeJob.id).limit(limit * 4).all()
+
+        claimed_ids = []
+        for (job_id,) in candidates:
+            if len(claimed_ids) >= limit:
+                break
+            won = db.query(ScrapeJob).filter(
+                ScrapeJob.id == job_id,
+                ScrapeJob.status == "pending"
+            ).update({
+                "status": "running",
+                "lease_owner": self.worker_id,
+                "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                "heartbeat_at": now,
+                "started_at": now,
+                "completed_at": None,
+                "error_message": None,
+            }, synchronize_session=False)
+            db.commit()
+            if won == 1:
+                claimed_ids.append(job_id)
+
+        if not claimed_ids:
+            return []
+        return db.query(ScrapeJob).filter(ScrapeJob.id.in_(claimed_ids)).all()
+
+    def heartbeat(self, db: Session, job_id: int) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Returns False when this worker no longer owns the job (lease expired
+        and taken over), in which case the work should be abandoned.
+        """
+        now = datetime.utcnow()
+        updated = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.status == "running",
+            ScrapeJob.lease_owner == self.worker_id
+        ).update({
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+            "heartbeat_at": now,
+        }, synchronize_session=False)
+        db.commit()
+        return updated == 1
+
+    def complete(self, db: Session, job_id: int) -> bool:
+        """Mark an owned job as completed"""
+        updated = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.lease_owner == self.worker_id,
+            ScrapeJob.status == "running"
+        ).update({
+            "status": "completed",
+            "completed_at": datetime.utcnow(),
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }, synchronize_session=False)
+        db.commit()
+        return updated == 1
+
+    def fail(self, db: Session, job_id: int, error: str) -> Optional[str]:
+        """
+        Record a failed attempt of an owned job.
+
+        Returns:
+            "pending" if the job will be retried, "dead" if it exhausted
+            its retries, None if this worker did not own the job
+        """
+        job = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.lease_owner == self.worker_id,
+            ScrapeJob.status == "running"
+        ).first()
+        if not job:
+            return None
+
+        status = self._schedule_retry(job, error)
+        db.commit()
+        return status
+
+    def reap_expired(self, db: Session) -> int:
+        """
+        Treat running jobs whose lease expired as failed attempts.
+
+        Running rows without a lease (created by the CLI workflow) are
+        reaped once they are older than a lease, so a crashed run cannot
+        block its profile forever.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self.lease_seconds)
+        expired = db.query(ScrapeJob).filter(
+            ScrapeJob.status == "running",
+            or_(
+                ScrapeJob.lease_expires_at < now,
+                and_(
+                    ScrapeJob.lease_expires_at == None,
+                    or_(ScrapeJob.started_at == None, ScrapeJob.started_at < stale_before)
+                )
+            )
+        ).all()
+
+        reaped = 0
+        for job in expired:
+            previous_owner = job.lease_owner
+            # Compare-and-set on the lease so two reapers don't both count it
+            taken = db.query(ScrapeJob).filter(
+                ScrapeJob.id == job.id,
+                ScrapeJob.status == "running",
+                ScrapeJob.lease_owner == previous_owner,  # IS NULL for CLI rows
+                or_(ScrapeJob.lease_expires_at == None, ScrapeJob.lease_expires_at < now)
+            ).update({
+                "lease_owner": self.worker_id,
+                "lease_expires_at": now,
+            }, synchronize_session=False)
+            if taken != 1:
+                db.rollback()
+                continue
+            db.refresh(job)
+            reason = f"Lease expired (worker {previous_owner})" if previous_owner else "Stale run without lease"
+            status = self._schedule_retry(job, reason)
+            db.commit()
+            logger.warning(f"Job {job.id} lease expired, now {status}")
+            reaped += 1
+        return reaped
+
+    def _schedule_retry(self, job: ScrapeJob, error: str) -> str:
+        """Move a job back to pending with backoff, or to dead"""
+        job.retry_count = (job.retry_count or 0) + 1
+        job.error_message = error
+        job.lease_owner = None
+        job.lease_expires_at = None
+        job.completed_at = datetime.utcnow()
+
+        if job.retry_count >= (job.max_retries if job.max_retries is not None else 3):
+            job.status = "dead"
+        else:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (job.retry_count - 1))
+            job.status = "pending"
+            job.scheduled_at = datetime.utcnow() + timedelta(seconds=delay)
+        return job.status
@@ -0,0 +1,136 @@
+"""
+Leader Election - Single-process ownership through a lease row in the database
+"""
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import SchedulerLease
+
+logger = logging.getLogger("LeaderElection")
+
+
+class LeaderElection:
+    """
+    Lease on a scheduler_leases row shared by every API process.
+
+    A process becomes leader by taking the row with a compare-and-set
+    UPDATE that only matches when it already holds the lease or the lease
+    has expired. The leader renews it every renew_interval seconds; if the
+    leader dies, the lease runs out and the next process to try takes over.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        holder_id: Optional[str] = None,
+        lease_seconds: int = 30
+    ):
+        """
+        Args:
+            name: Lease name, one row per singleton task
+            holder_id: Unique name of this process (host:pid:random by default)
+            lease_seconds: Time without renewal after which another process takes over
+        """
+        self.name = name
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.is_leader = False
+
+    @property
+    def renew_interval(self) -> float:
+        """Renew well before expiry so one slow renewal does not lose the lease"""
+        return self.lease_seconds / 3
+
+    def try_acquire(self, db: Session) -> bool:
+        """
+        Take or renew the lease.
+
+        Returns True if this process is the leader until the next call.
+        """
+        now = datetime.utcnow()
+        self._ensure_row(db)
+
+        updated = db.query(SchedulerLease).filter(
+            SchedulerLease.name == self.name,
+            or_(
+                SchedulerLease.holder == self.holder_id,
+                SchedulerLease.holder == None,
+                SchedulerLease.expires_at == None,
+                SchedulerLease.expires_at < now
+            )
+        ).update({
+            "holder": self.holder_id,
+            "expires_at": now + timedelta(seconds=self.lease_seconds),
+            "heartbeat_at": now,
+        }, synchronize_session=False)
+
+        if updated == 1 and not self.is_leader:
+            db.query(SchedulerLease).filter(
+                SchedulerLease.name == self.name
+            ).update({"acquired_at": now}, synchronize_session=False)
+        db.commit()
+
+        was_leader = self.is_leader
+        self.is_leader = updated == 1
+        if self.is_leader and not was_leader:
+            logger.info(f"{self.holder_id} is now leader of '{self.name}'")
+        elif was_leader and not self.is_leader:
+            logger.warning(f"{self.holder_id} lost leadership of '{self.name}'")
+        return self.is_leader
+
+    def release(self, db: Session):
+        """Give up the lease so another process can take over immediately"""
+        db.query(SchedulerLease).filter(
+            SchedulerLease.name == self.name,
+            SchedulerLease.holder == self.holder_id
+        ).update({"holder": None, "expires_at": None}, synchronize_session=False)
+        db.commit()
+        self.is_leader = False
+
+    def current_holder(self, db: Session) -> Optional[SchedulerLease]:
+        """Lease row, if it exists"""
+        return db.query(SchedulerLease).filter(SchedulerLease.name == self.name).first()
+
+    def request_reload(self, db: Session):
+        """Ask the leader, in whatever process, to resync from the database"""
+        self._ensure_row(db)
+        db.query(SchedulerLease).filter(
+            SchedulerLease.name == self.name
+        ).update({"reload_requested_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+    def reload_requested_since(self, db: Session, since: Optional[datetime]) -> bool:
+        """True if a reload was requested after `since`"""
+        requested_at = db.query(SchedulerLease.reload_requested_at).filter(
+            SchedulerLease.name == self.name
+        ).scalar()
+        if requested_at is None:
+            return False
+        return since is None or requested_at > since
+
+    def publish(self, db: Session, summary: str):
+        """Store the leader's summary (JSON) on the lease row, if this process holds it"""
+        db.query(SchedulerLease).filter(
+            SchedulerLease.name == self.name,
+            SchedulerLease.holder == self.holder_id
+        ).update({"summary": summary, "summary_published_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+    def _ensure_row(self, db: Session):
+        """Create the lease row on first use; concurrent inserts are harmless"""
+        if db.query(SchedulerLease.name).filter(SchedulerLease.name == self.name).first():
+            return
+        db.add(SchedulerLease(name=self.name))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
@@ -0,0 +1,242 @@
+"""
+Near Duplicates - MinHash signatures and LSH buckets to flag reposts and lightly edited copies
+"""
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import zlib
+from array import array
+from typing import List, Optional, Set
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Post, TrackedPost, MinHashBucket
+from services.embeddings import fold
+
+logger = logging.getLogger("NearDuplicates")
+
+NUM_PERM = 64  # Hash functions per signature, 256 bytes stored per post
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows: candidates from ~50% similarity
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3  # Words per shingle
+# Estimated Jaccard similarity from which a candidate is a duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))
+SYNC_BATCH = 1000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: Optional[str]) -> Set[int]:
+    """
+    crc32 of the overlapping SHINGLE_SIZE-word sequences of a text.
+
+    Words are folded (lowercase, no accents) and stopwords are kept:
+    on short posts they carry much of what makes two texts the same.
+    """
+    words = _WORD_RE.findall(fold(text))
+    if not words:
+        return set()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text: Optional[str]) -> Optional[array]:
+    """MinHash signature of a text (NUM_PERM uint32), None for an empty text"""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return array("I", (
+        min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ))
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def band_buckets(signature: array) -> List[int]:
+    """One LSH bucket per band, as signed 64-bit integers (SQLite INTEGER)"""
+    raw = signature.tobytes()
+    width = ROWS_PER_BAND * signature.itemsize
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + raw[band * width:(band + 1) * width], digest_size=8).digest(),
+            "little",
+            signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def load_signature(raw: Optional[bytes]) -> Optional[array]:
+    if not raw:
+        return None
+    signature = array("I")
+    signature.frombytes(raw)
+    return signature
+
+
+class NearDuplicateIndex:
+    """
+    Near-duplicate detection for one posts table.
+
+    Each post gets a MinHash signature (model.minhash) and one row per LSH
+    band in minhash_buckets. A new post is compared only with the posts
+    sharing at least one bucket; when the estimated similarity reaches
+    DUPLICATE_THRESHOLD it is flagged with duplicate_of, the id of the
+    first post of the cluster. Canonical posts keep duplicate_of NULL, so
+    `duplicate_of IS NULL` counts each cluster once.
+
+    An empty signature (b"") marks a post without text as processed.
+    """
+
+    def __init__(self, model, source: str, threshold: float = DUPLICATE_THRESHOLD):
+        """
+        Args:
+            model: Post or TrackedPost (needs id, content, minhash, duplicate_of)
+            source: Key of the table in minhash_buckets
+            threshold: Minimum estimated Jaccard similarity of a duplicate
+        """
+        self.model = model
+        self.source = source
+        self.threshold = threshold
+        # Syncs run in worker threads; two of them would sign the same posts
+        self._sync_lock = threading.Lock()
+
+    def sync(self, db: Session) -> dict:
+        """
+        Sign and bucket the posts without a signature yet, in id order.
+
+        Returns:
+            {"signed": posts processed, "duplicates": posts flagged}
+        """
+        with self._sync_lock:
+            return self._sync(db)
+
+    def _sync(self, db: Session) -> dict:
+        signed = duplicates = 0
+        while True:
+            rows = db.query(self.model).filter(
+                self.model.minhash.is_(None)
+            ).order_by(self.model.id).limit(SYNC_BATCH).all()
+            if not rows:
+                break
+            for row in rows:
+                if self._add(db, row):
+                    duplicates += 1
+            db.commit()
+            signed += len(rows)
+            if len(rows) < SYNC_BATCH:
+                break
+
+        if signed:
+            logger.info(f"Signed {signed} {self.source}, {duplicates} near-duplicates")
+        return {"signed": signed, "duplicates": duplicates}
+
+    def _add(self, db: Session, row) -> bool:
+        """Sign one post, flag it if it matches an earlier one; True if flagged"""
+        signature = minhash(row.content)
+        if signature is None:
+            row.minhash = b""
+            return False
+
+        buckets = band_buckets(signature)
+        canonical = self._find_canonical(db, row.id, signature, buckets)
+        row.minhash = signature.tobytes()
+        if canonical is not None and canonical != row.id:
+            row.duplicate_of = canonical
+        db.add_all(
+            MinHashBucket(source=self.source, bucket=bucket, doc_id=row.id)
+            for bucket in set(buckets)
+        )
+        # Visible to the next post of the batch (the session does not autoflush)
+        db.flush()
+        return row.duplicate_of is not None
+
+    def _find_canonical(self, db: Session, doc_id: int, signature: array, buckets: List[int]) -> Optional[int]:
+        """Id of the cluster a signature belongs to, None if it has no near-duplicate"""
+        candidate_ids = {
+            candidate for (candidate,) in db.query(MinHashBucket.doc_id).filter(
+                MinHashBucket.source == self.source,
+                MinHashBucket.bucket.in_(buckets),
+                MinHashBucket.doc_id != doc_id
+            ).distinct()
+        }
+        if not candidate_ids:
+            return None
+
+        clusters = []
+        for candidate_id, raw, duplicate_of in db.query(
+            self.model.id, self.model.minhash, self.model.duplicate_of
+        ).filter(self.model.id.in_(candidate_ids)):
+            candidate = load_signature(raw)
+            if candidate is not None and similarity(signature, candidate) >= self.threshold:
+                clusters.append(duplicate_of or candidate_id)
+        # The oldest cluster wins when a post bridges two of them
+        return min(clusters) if clusters else None
+
+    def forget(self, db: Session, doc_ids: List[int]):
+        """
+        Drop the buckets of posts about to be deleted, and hand each of
+        their clusters over to its oldest remaining post.
+
+        Does not commit: call it in the transaction that deletes the posts.
+        """
+        if not doc_ids:
+            return
+        deleted = set(doc_ids)
+        db.query(MinHashBucket).filter(
+            MinHashBucket.source == self.source,
+            MinHashBucket.doc_id.in_(deleted)
+        ).delete(synchronize_session=False)
+
+        copies = db.query(self.model).filter(
+            self.model.duplicate_of.in_(deleted),
+            self.model.id.notin_(deleted)
+        ).order_by(self.model.id).all()
+        canonicals = {}
+        for copy in copies:
+            canonical = canonicals.setdefault(copy.duplicate_of, copy.id)
+            copy.duplicate_of = None if canonical == copy.id else canonical
+
+    def cluster(self, db: Session, doc_id: int) -> list:
+        """Every post of the cluster of doc_id, canonical post first"""
+        row = db.query(self.model).filter(self.model.id == doc_id).first()
+        if row is None:
+            return []
+        canonical_id = row.duplicate_of or row.id
+        return db.query(self.model).filter(
+            (self.model.id == canonical_id) | (self.model.duplicate_of == canonical_id)
+        ).order_by(self.model.id).all()
+
+
+post_duplicates = NearDuplicateIndex(Post, "posts")
+tracked_post_duplicates = NearDuplicateIndex(TrackedPost, "tracked_posts")
+
+
+def sync_all(session_factory):
+    """Sign the posts of both tables, used at startup to catch up on existing rows"""
+    for index in (post_duplicates, tracked_post_duplicates):
+        db = session_factory()
+        try:
+            index.sync(db)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Near-duplicate sync of {index.source} failed: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,242 @@
+"""
+Originality - Local plagiarism check of generated drafts by shingled n-gram overlap
+"""
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import TrackedPost, ShingleFingerprint
+from services.embeddings import fold
+
+logger = logging.getLogger("Originality")
+
+SHINGLE_WORDS = 5  # Words per n-gram: a shared 5-word run is a copied phrase
+# Winnowing window: any copied run of SHINGLE_WORDS + WINNOW_WINDOW - 1 words
+# is guaranteed to share a fingerprint with the corpus index
+WINNOW_WINDOW = 4
+# Same threshold as the spin workflow (MIN_ORIGINALITY_SCORE)
+MIN_ORIGINALITY_SCORE = int(os.getenv("ORIGINALITY_MIN_SCORE", "70"))
+MAX_CANDIDATES = 5  # Tracked posts compared word by word after the index lookup
+SYNC_BATCH = 2000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+Token = Tuple[str, int, int]  # (folded word, start, end) in the original text
+
+
+def words(text: Optional[str]) -> List[Token]:
+    """Folded words of a text with their character offsets"""
+    return [(fold(match.group()), match.start(), match.end()) for match in _WORD_RE.finditer(text or "")]
+
+
+def shingle_hashes(tokens: List[Token]) -> List[int]:
+    """crc32 of each SHINGLE_WORDS-word window, indexed by its first word"""
+    folded = [word for word, _, _ in tokens]
+    return [
+        zlib.crc32(" ".join(folded[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(folded) - SHINGLE_WORDS + 1)
+    ]
+
+
+def winnow(hashes: List[int], window: int = WINNOW_WINDOW) -> Set[int]:
+    """
+    Fingerprints of a document (Schleimer et al., "Winnowing"): the minimum
+    hash of every `window` consecutive shingles. Keeps ~2/(window+1) of the
+    shingles while still catching every long enough shared run.
+    """
+    if len(hashes) <= window:
+        return set(hashes)
+    return {min(hashes[i:i + window]) for i in range(len(hashes) - window + 1)}
+
+
+class OriginalityChecker:
+    """
+    Deterministic originality check of a draft against its source post and
+    the tracked corpus.
+
+    Tracked posts are indexed by their winnowed shingle fingerprints in
+    shingle_fingerprints; TrackedPost.fingerprinted marks the indexed
+    ones, so a post id reused after a delete is indexed again. A check looks every shingle of the draft up in
+    that index, compares the few best candidates word by word, and reports
+    the copied spans. originality_score is the share of the draft's words
+    that are not inside a copied span.
+    """
+
+    def __init__(self, min_score: int = MIN_ORIGINALITY_SCORE):
+        """
+        Args:
+            min_score: Minimum originality_score to pass the check
+        """
+        self.min_score = min_score
+        # Checks run in worker threads; two syncs would index the same posts
+        self._sync_lock = threading.Lock()
+
+    # ============ Index ============
+
+    def sync(self, db: Session) -> int:
+        """Index the tracked posts added since the last sync"""
+        with self._sync_lock:
+            return self._sync(db)
+
+    def _sync(self, db: Session) -> int:
+        indexed = 0
+        while True:
+            rows = db.query(TrackedPost.id, TrackedPost.content).filter(
+                TrackedPost.fingerprinted.is_(None)
+            ).order_by(TrackedPost.id).limit(SYNC_BATCH).all()
+            if not rows:
+                break
+            post_ids = [post_id for post_id, _ in rows]
+            # Rows left by a deleted post whose id was reused
+            self.forget(db, post_ids)
+            fingerprints = [
+                {"fingerprint": fingerprint, "post_id": post_id}
+                for post_id, content in rows
+                for fingerprint in winnow(shingle_hashes(words(content)))
+            ]
+            if fingerprints:
+                db.execute(insert(ShingleFingerprint), fingerprints)
+            db.query(TrackedPost).filter(TrackedPost.id.in_(post_ids)).update(
+                {"fingerprinted": True}, synchronize_session=False
+            )
+            db.commit()
+            indexed += len(rows)
+            if len(rows) < SYNC_BATCH:
+                break
+
+        if indexed:
+            logger.info(f"Indexed fingerprints of {indexed} tracked posts")
+        return indexed
+
+    def forget(self, db: Session, post_ids: List[int]):
+        """
+        Drop the fingerprints of tracked posts about to be deleted.
+
+        Does not commit: call it in the transaction that deletes the posts.
+        """
+        if post_ids:
+            db.query(ShingleFingerprint).filter(
+                ShingleFingerprint.post_id.in_(post_ids)
+            ).delete(synchronize_session=False)
+
+    def _candidates(self, db: Session, hashes: List[int], exclude_ids: Set[int]) -> List[int]:
+        """Tracked posts sharing the most fingerprints with the draft"""
+        if not hashes:
+            return []
+        hits = func.count(ShingleFingerprint.fingerprint).label("hits")
+        query = db.query(ShingleFingerprint.post_id, hits).filter(
+            ShingleFingerprint.fingerprint.in_(set(hashes))
+        )
+        if exclude_ids:
+            query = query.filter(ShingleFingerprint.post_id.notin_(exclude_ids))
+        rows = query.group_by(ShingleFingerprint.post_id).order_by(hits.desc()).limit(MAX_CANDIDATES)
+        return [post_id for post_id, _ in rows]
+
+    # ============ Check ============
+
+    def check(
+        self,
+        db: Session,
+        draft: str,
+        source_text: Optional[str] = None,
+        exclude_ids: Iterable[int] = ()
+    ) -> dict:
+        """
+        Copied spans of a draft and its originality score.
+
+        Args:
+            draft: Generated text to check
+            source_text: Post the draft was written from
+            exclude_ids: Tracked posts not to count as corpus matches
+                (the source post itself)
+        """
+        started = time.perf_counter()
+        self.sync(db)
+
+        tokens = words(draft)
+        hashes = shingle_hashes(tokens)
+        # Origin of each copied shingle: ("original", None) or ("tracked_post", id)
+        origins: List[Optional[Tuple[str, Optional[int]]]] = [None] * len(hashes)
+
+        source_shingles = set(shingle_hashes(words(source_text)))
+        for i, shingle in enumerate(hashes):
+            if shingle in source_shingles:
+                origins[i] = ("original", None)
+        source_overlap = sum(1 for origin in origins if origin) / len(hashes) if hashes else 0.0
+
+        matches = []
+        candidate_ids = self._candidates(db, hashes, set(exclude_ids))
+        if candidate_ids:
+            contents = dict(db.query(TrackedPost.id, TrackedPost.content).filter(
+                TrackedPost.id.in_(candidate_ids)
+            ).all())
+            for post_id in candidate_ids:
+                shared = set(shingle_hashes(words(contents.get(post_id)))).intersection(hashes)
+                if not shared:
+                    continue
+                positions = [i for i, shingle in enumerate(hashes) if shingle in shared]
+                for i in positions:
+                    origins[i] = origins[i] or ("tracked_post", post_id)
+                matches.append({
+                    "post_id": post_id,
+                    "shared_shingles": len(positions),
+                    "overlap": round(len(positions) / len(hashes), 3),
+                })
+
+        spans = self._spans(draft, tokens, origins)
+        copied_words = set()
+        for span in spans:
+            copied_words.update(range(span.pop("first_word"), span.pop("last_word") + 1))
+        originality = 100 * (1 - len(copied_words) / len(tokens)) if tokens else 100.0
+
+        return {
+            "originality_score": round(originality, 1),
+            "passed": originality >= self.min_score,
+            "source_overlap": round(source_overlap, 3),
+            "copied_words": len(copied_words),
+            "total_words": len(tokens),
+            "spans": spans,
+            "corpus_matches": matches,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _spans(draft: str, tokens: List[Token], origins: list) -> List[dict]:
+        """Merge consecutive copied shingles of the same origin into character spans"""
+        spans = []
+        current = None
+        for i, origin in enumerate(origins):
+            if origin is None:
+                continue
+            last_word = i + SHINGLE_WORDS - 1
+            if current and current["origin"] == origin and i <= current["last_word"] + 1:
+                current["last_word"] = max(current["last_word"], last_word)
+                continue
+            current = {"origin": origin, "first_word": i, "last_word": last_word}
+            spans.append(current)
+
+        result = []
+        for span in spans:
+            source, post_id = span["origin"]
+            start, end = tokens[span["first_word"]][1], tokens[span["last_word"]][2]
+            result.append({
+                "start": start,
+                "end": end,
+                "text": draft[start:end],
+                "source": source,
+                "post_id": post_id,
+                "first_word": span["first_word"],
+                "last_word": span["last_word"],
+            })
+        return result
+
+
+originality_checker = OriginalityChecker()
@@ -0,0 +1,161 @@
+"""
+Profile Cache - In-process cache of the active company profile, JSON fields parsed once
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import UserCompanyProfile
+
+logger = logging.getLogger("ProfileCache")
+
+# Columns holding JSON text (lists, target_audience is an object)
+JSON_FIELDS = (
+    "tone_of_voice", "key_messages", "values", "differentiators",
+    "target_audience", "audience_pain_points", "preferred_categories",
+    "excluded_topics", "hashtag_preferences",
+)
+# Another API process may change the profile: the cache is re-read after this delay
+CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "30"))
+
+
+def _freeze(value):
+    """Read-only copy of a parsed JSON value (lists become tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Plain dicts and lists again, for JSON responses and workflow payloads"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _parse(raw: Optional[str]):
+    if not raw:
+        return None
+    try:
+        return _freeze(json.loads(raw))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid JSON in profile field: {raw[:50]!r}")
+        return None
+
+
+@dataclass(frozen=True)
+class ActiveProfile:
+    """
+    Immutable snapshot of the active UserCompanyProfile.
+
+    `version` is a hash of every field: it changes with any profile edit
+    and is stable across processes and restarts, so generator caches can
+    use it as part of their key.
+    """
+    id: int
+    version: str
+    company_name: str
+    industry: str
+    sub_industry: Optional[str]
+    company_size: Optional[str]
+    tone_of_voice: Optional[Tuple[str, ...]]
+    key_messages: Optional[Tuple[str, ...]]
+    values: Optional[Tuple[str, ...]]
+    differentiators: Optional[Tuple[str, ...]]
+    target_audience: Optional[Mapping[str, Any]]
+    audience_pain_points: Optional[Tuple[str, ...]]
+    preferred_categories: Optional[Tuple[str, ...]]
+    excluded_topics: Optional[Tuple[str, ...]]
+    hashtag_preferences: Optional[Tuple[str, ...]]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    is_active: bool
+
+    @classmethod
+    def from_model(cls, profile: UserCompanyProfile) -> "ActiveProfile":
+        fields = {
+            "id": profile.id,
+            "company_name": profile.company_name,
+            "industry": profile.industry,
+            "sub_industry": profile.sub_industry,
+            "company_size": profile.company_size,
+            "created_at": profile.created_at,
+            "updated_at": profile.updated_at,
+            "is_active": bool(profile.is_active),
+        }
+        fields.update({name: _parse(getattr(profile, name)) for name in JSON_FIELDS})
+        payload = json.dumps(
+            {name: _thaw(value) for name, value in fields.items()},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return cls(version=hashlib.sha256(payload.encode("utf-8")).hexdigest(), **fields)
+
+    def to_dict(self) -> dict:
+        """Same shape as routes.profile.serialize_profile (mutable copy)"""
+        return {
+            name: _thaw(getattr(self, name))
+            for name in self.__dataclass_fields__ if name != "version"
+        }
+
+
+class ProfileCache:
+    """
+    Active profile kept in memory between requests.
+
+    Every write of routes/profile.py calls invalidate(); CACHE_TTL bounds
+    how long a change made by another process can go unseen.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        """
+        Args:
+            ttl: Seconds before the cached profile is read again
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._profile: Optional[ActiveProfile] = None
+        self._loaded_at: Optional[float] = None
+        self._generation = 0  # Incremented by invalidate()
+
+    def get(self, db: Session) -> Optional[ActiveProfile]:
+        """Active profile, None if there is none"""
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._profile
+            generation = self._generation
+
+        profile = db.query(UserCompanyProfile).filter(
+            UserCompanyProfile.is_active == True
+        ).first()
+        snapshot = ActiveProfile.from_model(profile) if profile else None
+
+        with self._lock:
+            # A write committed during the read: keep the cache empty
+            if generation == self._generation:
+                self._profile = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def invalidate(self):
+        """Drop the cached profile, the next get() reads the database"""
+        with self._lock:
+            self._profile = None
+            self._loaded_at = None
+            self._generation += 1
+
+
+active_profile_cache = ProfileCache()
@@ -0,0 +1,202 @@
+"""
+Relevance Prefilter - Drops posts lexically unrelated to the company profile before LLM scoring
+"""
+import os
+import sys
+from typing import Dict, List, Mapping, Optional, Tuple
+from sqlalchemy import and_, exists, insert
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Post, PostRelevanceScore, PrefilteredPost
+from services.embeddings import EmbeddingStore
+from services.profile_cache import ActiveProfile
+
+logger = logging.getLogger("RelevancePrefilter")
+
+# Cosine similarity below which a post is not sent to the LLM
+PREFILTER_CUTOFF = float(os.getenv("RELEVANCE_PREFILTER_CUTOFF", "0.03"))
+# Cutoffs evaluated by report() to help tune PREFILTER_CUTOFF
+REPORT_CUTOFFS = [0.0, 0.01, 0.02, 0.03, 0.05, 0.08, 0.12]
+# An LLM score at or above this counts as relevant (same threshold as the summary)
+RELEVANT_SCORE = 50
+
+
+def profile_text(profile: ActiveProfile) -> str:
+    """Text of the profile fields that describe what the company talks about"""
+    parts = [profile.company_name, profile.industry, profile.sub_industry]
+    for field in (
+        profile.key_messages, profile.values, profile.differentiators,
+        profile.target_audience, profile.audience_pain_points,
+        profile.preferred_categories, profile.hashtag_preferences
+    ):
+        parts.extend(_flatten(field))
+    return " ".join(part.replace("#", " ").replace("_", " ") for part in parts if part)
+
+
+def _flatten(value) -> List[str]:
+    if isinstance(value, Mapping):
+        return [text for item in value.values() for text in _flatten(item)]
+    if isinstance(value, (list, tuple)):
+        return [text for item in value for text in _flatten(item)]
+    return [str(value)] if value is not None else []
+
+
+class RelevancePrefilter:
+    """
+    Local pre-filter for the relevance workflow.
+
+    Posts are embedded once with hashing TF-IDF (see EmbeddingStore) and
+    compared with the active profile; posts under the cutoff share almost
+    no vocabulary with the profile and are not worth an LLM call. The
+    cutoff is deliberately low: the goal is to skip obvious misses, the
+    LLM still decides for everything else. report() measures the recall
+    of a cutoff against the posts the LLM already scored.
+
+    Dropped posts are recorded in prefiltered_posts with their similarity,
+    so they are not proposed again for the same profile version; they
+    come back when the profile changes or the cutoff rises above them.
+    """
+
+    def __init__(self, store: EmbeddingStore, cutoff: float = PREFILTER_CUTOFF):
+        """
+        Args:
+            store: Vectors of the collected posts
+            cutoff: Minimum cosine similarity to keep a post
+        """
+        self.store = store
+        self.cutoff = cutoff
+        # Totals since the process started
+        self.candidates_seen = 0
+        self.llm_calls_avoided = 0
+        # Query vector of the profile, keyed by (profile version, stored documents)
+        self._profile_query: Optional[Tuple[tuple, Dict[int, float]]] = None
+
+    def ensure_embedded(self, db: Session, post_ids: List[int]) -> int:
+        """Embed the posts that have no vector yet"""
+        missing = self.store.missing(post_ids)
+        if not missing:
+            return 0
+        rows = db.query(Post.id, Post.content).filter(Post.id.in_(missing)).all()
+        return self.store.add([(post_id, content or "") for post_id, content in rows])
+
+    def similarities(self, db: Session, profile: ActiveProfile, post_ids: List[int]) -> Dict[int, float]:
+        """Cosine similarity of each post with the profile"""
+        self.ensure_embedded(db, post_ids)
+        return self.store.similarities(self.profile_query(profile), post_ids)
+
+    def profile_query(self, profile: ActiveProfile) -> Dict[int, float]:
+        """TF-IDF vector of the profile, recomputed when the profile or the IDF changes"""
+        key = (profile.version, len(self.store))
+        if self._profile_query is None or self._profile_query[0] != key:
+            self._profile_query = (key, self.store.query_vector(profile_text(profile)))
+        return self._profile_query[1]
+
+    def filter(
+        self,
+        db: Session,
+        profile: ActiveProfile,
+        post_ids: List[int],
+        cutoff: Optional[float] = None
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Split candidates into posts to send to the LLM and posts to skip.
+
+        Returns:
+            (kept_ids, dropped_ids), both in the order of post_ids
+        """
+        cutoff = self.cutoff if cutoff is None else cutoff
+        scores = self.similarities(db, profile, post_ids)
+
+        kept, dropped = [], []
+        for post_id in post_ids:
+            # A post without a vector is kept: the filter only removes sure misses
+            if scores.get(post_id, cutoff) >= cutoff:
+                kept.append(post_id)
+            else:
+                dropped.append(post_id)
+        self._record_skips(db, profile, {post_id: scores[post_id] for post_id in dropped})
+
+        self.candidates_seen += len(post_ids)
+        self.llm_calls_avoided += len(dropped)
+        logger.info(f"Prefilter kept {len(kept)}/{len(post_ids)} posts (cutoff {cutoff})")
+        return kept, dropped
+
+    def _record_skips(self, db: Session, profile: ActiveProfile, similarities: Dict[int, float]):
+        """Remember the dropped posts for this profile version (replaces older skips)"""
+        if not similarities:
+            return
+        db.query(PrefilteredPost).filter(
+            PrefilteredPost.profile_id == profile.id,
+            PrefilteredPost.post_id.in_(similarities)
+        ).delete(synchronize_session=False)
+        db.execute(insert(PrefilteredPost), [
+            {"profile_id": profile.id, "post_id": post_id, "profile_version": profile.version, "similarity": similarity}
+            for post_id, similarity in similarities.items()
+        ])
+        db.commit()
+
+    def skipped(self, profile: ActiveProfile):
+        """
+        SQL condition: the post was dropped for this profile version and
+        is still under the cutoff (to exclude it from the candidates)
+        """
+        return exists().where(and_(
+            PrefilteredPost.post_id == Post.id,
+            PrefilteredPost.profile_id == profile.id,
+            PrefilteredPost.profile_version == profile.version,
+            PrefilteredPost.similarity < self.cutoff
+        ))
+
+    def report(self, db: Session, profile: ActiveProfile, cutoffs: Optional[List[float]] = None) -> dict:
+        """
+        Recall and avoided LLM calls of each cutoff, measured on the posts
+        the LLM already scored for this profile.
+        """
+        cutoffs = sorted(set((cutoffs or REPORT_CUTOFFS) + [self.cutoff]))
+        scored = db.query(
+            PostRelevanceScore.post_id,
+            PostRelevanceScore.overall_relevance
+        ).filter(
+            PostRelevanceScore.profile_id == profile.id
+        ).all()
+
+        scores = self.similarities(db, profile, [post_id for post_id, _ in scored])
+        relevant = [post_id for post_id, score in scored if score is not None and score >= RELEVANT_SCORE]
+
+        by_cutoff = []
+        for cutoff in cutoffs:
+            kept = {post_id for post_id, similarity in scores.items() if similarity >= cutoff}
+            relevant_kept = sum(1 for post_id in relevant if post_id in kept)
+            by_cutoff.append({
+                "cutoff": cutoff,
+                "recall": round(relevant_kept / len(relevant), 3) if relevant else None,
+                "relevant_missed": len(relevant) - relevant_kept,
+                "llm_calls_avoided": len(scores) - len(kept),
+                "avoided_ratio": round((len(scores) - len(kept)) / len(scores), 3) if scores else None,
+            })
+
+        return {
+            "cutoff": self.cutoff,
+            "scored_posts": len(scored),
+            "relevant_posts": len(relevant),
+            "by_cutoff": by_cutoff,
+            "since_start": {
+                "candidates_seen": self.candidates_seen,
+                "llm_calls_avoided": self.llm_calls_avoided,
+            },
+            "embedded_posts": len(self.store),
+        }
+
+    def rebuild(self, db: Session) -> int:
+        """Re-embed every collected post with IDF over the whole corpus"""
+        rows = db.query(Post.id, Post.content).all()
+        embedded = self.store.rebuild([(post_id, content or "") for post_id, content in rows])
+        # Similarities change with the new IDF: every post gets a new chance
+        db.query(PrefilteredPost).delete(synchronize_session=False)
+        db.commit()
+        return embedded
+
+
+relevance_prefilter = RelevancePrefilter(EmbeddingStore("posts"))
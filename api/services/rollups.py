@@ -0,0 +1,229 @@
+"""
+Rollups - Daily and all-time aggregates of posts and tracked posts, maintained by SQLite triggers
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Base, engine
+
+logger = logging.getLogger("Rollups")
+
+# Key columns a rollup can group by: source column and SQL expression, `{r}` is the row alias
+DIMENSIONS = {
+    "category": ("category", "coalesce({r}.category, '')"),
+    "sentiment": ("sentiment", "coalesce({r}.sentiment, '')"),
+    "duplicate": ("duplicate_of", "({r}.duplicate_of IS NOT NULL)"),
+}
+# Columns whose change changes the sums of a rollup row
+VALUE_COLUMNS = ("likes", "comments", "shares", "confidence_score")
+SUM_COLUMNS = ("count", "likes", "comments", "shares", "confidence_total", "confidence_count")
+
+
+class Rollup:
+    """
+    Aggregate table of one posts table, per day(s) or over the whole period.
+
+    Triggers on the source table add a new row to its rollup row, subtract
+    a deleted one, and move an updated one (subtract the old values, add
+    the new ones). The workflows (TypeScript) and the API write the posts
+    tables directly, so triggers are the only place that sees every write.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        target: str,
+        group: str,
+        days: Optional[Dict[str, str]] = None,
+        day_columns: tuple = (),
+        dimensions: tuple = tuple(DIMENSIONS)
+    ):
+        """
+        Args:
+            source: Posts table (posts, tracked_posts)
+            target: Rollup table
+            group: Grouping column (company_id, profile_id)
+            days: Day columns of the rollup and the SQL date expression of
+                each, `{r}` stands for the row alias; none for a rollup over
+                the whole period
+            day_columns: Source columns the days are computed from
+            dimensions: Other key columns (see DIMENSIONS); each one
+                multiplies the number of rows, keep only what is read
+        """
+        self.source = source
+        self.target = target
+        self.group = group
+        self.days = days or {}
+        self.dimensions = dimensions
+        self.watched = day_columns + (group,) + tuple(DIMENSIONS[d][0] for d in dimensions) + VALUE_COLUMNS
+        self.key_columns = tuple(self.days) + (group,) + dimensions
+        self.columns = ", ".join(self.key_columns + SUM_COLUMNS)
+
+    def _key(self, r: str) -> List[str]:
+        days = [f"coalesce({day.format(r=r)}, '')" for day in self.days.values()]
+        return days + [f"{r}.{self.group}"] + [DIMENSIONS[d][1].format(r=r) for d in self.dimensions]
+
+    def _values(self, r: str, sign: str = "") -> List[str]:
+        return [
+            f"{sign}1",
+            f"{sign}coalesce({r}.likes, 0)",
+            f"{sign}coalesce({r}.comments, 0)",
+            f"{sign}coalesce({r}.shares, 0)",
+            f"{sign}coalesce({r}.confidence_score, 0)",
+            f"{sign}({r}.confidence_score IS NOT NULL)",
+        ]
+
+    def _upsert(self, r: str, sign: str = "") -> str:
+        """Add (or with sign "-", subtract) one row to its rollup row"""
+        sums = ", ".join(f"{column} = {column} + excluded.{column}" for column in SUM_COLUMNS)
+        return (
+            f"INSERT INTO {self.target} ({self.columns}) "
+            f"VALUES ({', '.join(self._key(r) + self._values(r, sign))}) "
+            f"ON CONFLICT ({', '.join(self.key_columns)}) DO UPDATE SET {sums};"
+        )
+
+    def _prune(self, r: str) -> str:
+        """Drop the rollup row of r once it counts no post"""
+        conditions = " AND ".join(
+            f"{column} = {value}" for column, value in zip(self.key_columns, self._key(r))
+        )
+        return f"DELETE FROM {self.target} WHERE {conditions} AND count <= 0;"
+
+    def trigger_ddl(self) -> List[str]:
+        changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in self.watched)
+        return [
+            f"DROP TRIGGER IF EXISTS {self.target}_insert",
+            f"DROP TRIGGER IF EXISTS {self.target}_delete",
+            f"DROP TRIGGER IF EXISTS {self.target}_update",
+            f"CREATE TRIGGER {self.target}_insert AFTER INSERT ON {self.source} BEGIN "
+            f"{self._upsert('NEW')} END",
+            f"CREATE TRIGGER {self.target}_delete AFTER DELETE ON {self.source} BEGIN "
+            f"{self._upsert('OLD', '-')} {self._prune('OLD')} END",
+            f"CREATE TRIGGER {self.target}_update AFTER UPDATE OF {', '.join(self.watched)} "
+            f"ON {self.source} WHEN {changed} BEGIN "
+            f"{self._upsert('OLD', '-')} {self._prune('OLD')} {self._upsert('NEW')} END",
+        ]
+
+    def install(self, conn: Connection):
+        """(Re)create the triggers, so a changed definition replaces the old one"""
+        for statement in self.trigger_ddl():
+            conn.execute(text(statement))
+
+    def recreate_if_rekeyed(self, conn: Connection) -> bool:
+        """
+        Drop and recreate, empty, a rollup table whose primary key is not
+        the current key (a key column added or removed since it was created).
+        ALTER TABLE cannot change a primary key; the rows are derived data.
+        """
+        key = {row[1] for row in conn.execute(text(f"PRAGMA table_info({self.target})")) if row[5]}
+        if key == set(self.key_columns):
+            return False
+        conn.execute(text(f"DROP TABLE {self.target}"))
+        Base.metadata.tables[self.target].create(conn)
+        return True
+
+    def rebuild(self, conn: Connection) -> int:
+        """Recompute the whole rollup from the source table"""
+        key = self._key(self.source)
+        conn.execute(text(f"DELETE FROM {self.target}"))
+        conn.execute(text(
+            f"INSERT INTO {self.target} ({self.columns}) "
+            f"SELECT {', '.join(key)}, count(*), "
+            f"sum(coalesce(likes, 0)), sum(coalesce(comments, 0)), sum(coalesce(shares, 0)), "
+            f"sum(coalesce(confidence_score, 0)), count(confidence_score) "
+            f"FROM {self.source} GROUP BY {', '.join(str(i + 1) for i in range(len(key)))}"
+        ))
+        return conn.execute(text(f"SELECT count(*) FROM {self.target}")).scalar()
+
+
+ROLLUPS = [
+    # Day of publication for the trends, of collection for the "last days"
+    # counters: two tables, one day each (both days in one key would give
+    # about one row per post). No sentiment, the day windows do not read it.
+    Rollup(
+        "posts", "daily_post_stats", "company_id",
+        days={"day": "date({r}.posted_at)"},
+        day_columns=("posted_at",),
+        dimensions=("category", "duplicate")
+    ),
+    Rollup(
+        "posts", "daily_collected_post_stats", "company_id",
+        days={"day": "date({r}.collected_at)"},
+        day_columns=("collected_at",),
+        dimensions=("category", "duplicate")
+    ),
+    # Counters of the dashboard, which cover the whole period
+    Rollup("posts", "company_post_stats", "company_id"),
+    Rollup(
+        "tracked_posts", "daily_tracked_post_stats", "profile_id",
+        days={"day": "date({r}.first_seen_at)"},
+        day_columns=("first_seen_at",)
+    ),
+]
+
+
+def window_bounds(days: int) -> Tuple[datetime, datetime]:
+    """
+    Start of the window of the last `days` days, to the second, and the
+    start of its first whole day.
+
+    The rollups answer for the whole days; the rows between the two bounds
+    are read from the source table, so a window matches a filter on the
+    timestamp itself.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return cutoff, datetime.combine(cutoff.date() + timedelta(days=1), datetime.min.time())
+
+
+def install_rollups():
+    """
+    Install the triggers at startup. A rollup still empty while its source
+    has rows (first start after the upgrade) is built from scratch.
+    """
+    with engine.begin() as conn:
+        for rollup in ROLLUPS:
+            if rollup.recreate_if_rekeyed(conn):
+                print(f"[Database] Recreated {rollup.target} with its new key")
+            rollup.install(conn)
+            empty = conn.execute(text(f"SELECT 1 FROM {rollup.target} LIMIT 1")).first() is None
+            if empty and conn.execute(text(f"SELECT 1 FROM {rollup.source} LIMIT 1")).first():
+                rows = rollup.rebuild(conn)
+                print(f"[Database] Built {rollup.target}: {rows} rows")
+
+
+def rebuild_rollups(targets: Optional[List[str]] = None) -> dict:
+    """
+    Recompute rollups from their source tables, in one transaction each
+    (writers wait, so no post is counted twice or missed).
+
+    Args:
+        targets: Rollup tables to rebuild, all by default
+    """
+    result = {}
+    for rollup in ROLLUPS:
+        if targets and rollup.target not in targets:
+            continue
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            rollup.recreate_if_rekeyed(conn)
+            rollup.install(conn)
+            rows = rollup.rebuild(conn)
+        result[rollup.target] = {"rows": rows, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        logger.info(f"Rebuilt {rollup.target}: {rows} rows")
+    return result
+
+
+if __name__ == "__main__":
+    # cd api && python services/rollups.py [daily_post_stats|daily_collected_post_stats|company_post_stats|...]
+    from database import init_db
+
+    init_db()
+    for target, stats in rebuild_rollups(sys.argv[1:] or None).items():
+        print(f"[Rollups] {target}: {stats['rows']} rows in {stats['elapsed_ms']} ms")
@@ -0,0 +1,230 @@
+"""
+Scheduler Metrics - Rolling in-memory histograms for scheduler lag and scrape outcomes
+"""
+import bisect
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the histogram buckets; values above the last
+# bound go to an overflow bucket
+LAG_BUCKETS = [
+    0, 60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400
+]
+DURATION_BUCKETS = [5, 10, 20, 30, 45, 60, 90, 120, 180, 240, 300, 600]
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class RollingHistogram:
+    """
+    Fixed-bucket histogram over a sliding time window.
+
+    The window is split into `slots` sub-histograms; observations go to
+    the slot of the current time and slots older than the window are
+    reset lazily, so memory is O(slots * buckets) whatever the traffic.
+    """
+
+    def __init__(self, bounds: List[float], window_seconds: int = 86400, slots: int = 24):
+        """
+        Args:
+            bounds: Sorted upper bounds of the buckets
+            window_seconds: Length of the rolling window
+            slots: Number of sub-histograms the window is split into
+        """
+        self.bounds = bounds
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self._counts = [[0] * (len(bounds) + 1) for _ in range(slots)]
+        self._sums = [0.0] * slots
+        self._maxima: List[Optional[float]] = [None] * slots
+        self._epochs = [-1] * slots
+
+    def _slot(self, now: datetime) -> int:
+        """Index of the slot for `now`, clearing it if it belongs to an old window"""
+        epoch = int(now.timestamp() // self.slot_seconds)
+        index = epoch % len(self._epochs)
+        if self._epochs[index] != epoch:
+            self._counts[index] = [0] * (len(self.bounds) + 1)
+            self._sums[index] = 0.0
+            self._maxima[index] = None
+            self._epochs[index] = epoch
+        return index
+
+    def observe(self, value: float, now: Optional[datetime] = None):
+        """Record one value"""
+        index = self._slot(now or datetime.utcnow())
+        self._counts[index][bisect.bisect_left(self.bounds, value)] += 1
+        self._sums[index] += value
+        current_max = self._maxima[index]
+        self._maxima[index] = value if current_max is None else max(current_max, value)
+
+    def _live_slots(self, now: datetime) -> List[int]:
+        """Slots whose data is still inside the window"""
+        epoch = int(now.timestamp() // self.slot_seconds)
+        oldest = epoch - len(self._epochs) + 1
+        return [i for i, e in enumerate(self._epochs) if oldest <= e <= epoch]
+
+    def summary(self, now: Optional[datetime] = None) -> dict:
+        """Count, mean, max and p50/p90/p99 over the window"""
+        now = now or datetime.utcnow()
+        live = self._live_slots(now)
+
+        counts = [0] * (len(self.bounds) + 1)
+        total_sum = 0.0
+        maximum = None
+        for index in live:
+            for bucket, count in enumerate(self._counts[index]):
+                counts[bucket] += count
+            total_sum += self._sums[index]
+            if self._maxima[index] is not None:
+                maximum = self._maxima[index] if maximum is None else max(maximum, self._maxima[index])
+
+        total = sum(counts)
+        result = {
+            "count": total,
+            "mean": round(total_sum / total, 1) if total else None,
+            "max": round(maximum, 1) if maximum is not None else None,
+        }
+        for q in PERCENTILES:
+            value = self._percentile(counts, total, q, maximum)
+            result[f"p{int(q * 100)}"] = round(value, 1) if value is not None else None
+        return result
+
+    def _percentile(self, counts: List[int], total: int, q: float, maximum: Optional[float]) -> Optional[float]:
+        """Estimate a percentile by linear interpolation inside its bucket"""
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bucket, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if bucket == len(self.bounds):
+                    return maximum
+                lower = self.bounds[bucket - 1] if bucket > 0 else min(0.0, self.bounds[0])
+                upper = self.bounds[bucket]
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(estimate, maximum) if maximum is not None else estimate
+            seen += count
+        return maximum
+
+
+class RollingCounter:
+    """Named event counts over a sliding time window, same slotting as RollingHistogram"""
+
+    def __init__(self, window_seconds: int = 86400, slots: int = 24):
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self._counts: List[Dict[str, int]] = [{} for _ in range(slots)]
+        self._epochs = [-1] * slots
+
+    def add(self, name: str, now: Optional[datetime] = None):
+        """Count one event"""
+        now = now or datetime.utcnow()
+        epoch = int(now.timestamp() // self.slot_seconds)
+        index = epoch % len(self._epochs)
+        if self._epochs[index] != epoch:
+            self._counts[index] = {}
+            self._epochs[index] = epoch
+        self._counts[index][name] = self._counts[index].get(name, 0) + 1
+
+    def totals(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Event counts over the window"""
+        now = now or datetime.utcnow()
+        epoch = int(now.timestamp() // self.slot_seconds)
+        oldest = epoch - len(self._epochs) + 1
+        totals: Dict[str, int] = {}
+        for index, slot_epoch in enumerate(self._epochs):
+            if oldest <= slot_epoch <= epoch:
+                for name, count in self._counts[index].items():
+                    totals[name] = totals.get(name, 0) + count
+        return totals
+
+
+class SchedulerMetrics:
+    """
+    Rolling metrics fed by the scheduler.
+
+    Durations and outcomes are recorded when a queue worker of this
+    process finishes a job. Lag is recorded by the leader when it enqueues
+    a due profile, and published with the rest of the schedule summary
+    (see TrackerScheduler.schedule_summary). Everything lives in memory
+    for the last window_seconds.
+    """
+
+    def __init__(self, window_seconds: int = 86400, slots: int = 24):
+        """
+        Args:
+            window_seconds: Length of the rolling window
+            slots: Number of sub-windows, the window advances by window/slots
+        """
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.durations = RollingHistogram(DURATION_BUCKETS, window_seconds, slots)
+        self.outcomes = RollingCounter(window_seconds, slots)
+        self.lags: Dict[str, RollingHistogram] = {}
+
+    def record_lag(self, tier: str, lag_seconds: float, enqueued_at: Optional[datetime] = None):
+        """
+        Record the lag of an enqueued job.
+
+        Args:
+            tier: Tracking frequency of the profile
+            lag_seconds: Seconds between due_at and enqueue
+        """
+        histogram = self.lags.get(tier)
+        if histogram is None:
+            histogram = RollingHistogram(LAG_BUCKETS, self.window_seconds, self.slots)
+            self.lags[tier] = histogram
+        histogram.observe(max(0.0, lag_seconds), enqueued_at)
+
+    def reset_lags(self, lags: List[Tuple[str, float, datetime]] = ()):
+        """
+        Replace the lag histograms, e.g. when this process becomes leader.
+
+        Args:
+            lags: (tier, lag seconds, enqueued_at) of the jobs already
+                enqueued during the window
+        """
+        self.lags = {}
+        for tier, lag_seconds, enqueued_at in lags:
+            self.record_lag(tier, lag_seconds, enqueued_at)
+
+    def lag_summary(self, now: Optional[datetime] = None) -> dict:
+        """Lag per tier over the window"""
+        return {tier: histogram.summary(now) for tier, histogram in sorted(self.lags.items())}
+
+    def record_scrape(self, duration_seconds: float, outcome: str, now: Optional[datetime] = None):
+        """
+        Record a finished job.
+
+        Args:
+            duration_seconds: Wall time of the workflow
+            outcome: "completed", "retried", "dead" or "lease_lost"
+        """
+        self.durations.observe(duration_seconds, now)
+        self.outcomes.add(outcome, now)
+
+    def snapshot(self, now: Optional[datetime] = None) -> dict:
+        """Duration percentiles and success ratio of this process's workers"""
+        now = now or datetime.utcnow()
+        outcomes = self.outcomes.totals(now)
+        finished = sum(outcomes.values())
+        return {
+            "window_seconds": self.window_seconds,
+            "scrape_duration_seconds": self.durations.summary(now),
+            "outcomes": outcomes,
+            "success_ratio": (
+                round(outcomes.get("completed", 0) / finished, 3) if finished else None
+            ),
+        }
+
+
+def percentile_of(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of a small in-memory list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,374 @@
+"""
+Scrape Planning - Helpers to decide when tracked profiles are scraped
+"""
+import bisect
+import hashlib
+import json
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import TrackedPost, TrackedProfile, ProfileSnapshot
+
+# Reference point for phase slots (a Monday, 00:00 UTC)
+PHASE_EPOCH = datetime(2024, 1, 1)
+
+FREQUENCY_INTERVALS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+# Adaptive ("auto") frequency
+AUTO_LOOKBACK = timedelta(days=90)  # Posts considered for the rate estimate
+AUTO_TARGET_HIT_RATIO = 0.5  # Wanted probability that a scrape finds a new post
+AUTO_PRIOR_POSTS = 0.25  # Prior of one post per week, weighted as ~2 days of history
+AUTO_PRIOR_HOURS = 42.0
+AUTO_BASELINE_FREQUENCY = "daily"  # Static schedule used to report savings
+
+# (min priority, shortest interval, longest interval)
+AUTO_BOUNDS_BY_PRIORITY = [
+    (8, timedelta(hours=1), timedelta(days=1)),
+    (4, timedelta(hours=3), timedelta(days=3)),
+    (1, timedelta(hours=12), timedelta(weeks=1)),
+]
+
+
+def frequency_interval(frequency: Optional[str]) -> timedelta:
+    """Interval between two scrapes for a tracking frequency (daily by default)"""
+    return FREQUENCY_INTERVALS.get(frequency, FREQUENCY_INTERVALS["daily"])
+
+
+def profile_phase(profile_id: int, interval: timedelta) -> timedelta:
+    """
+    Deterministic offset of a profile inside its scrape interval.
+
+    The offset is derived from a hash of the profile id so profiles added
+    together land on different slots, and a profile keeps its slot across
+    restarts.
+    """
+    digest = hashlib.sha1(str(profile_id).encode("utf-8")).digest()
+    fraction = int.from_bytes(digest[:8], "big") / 2 ** 64
+    return timedelta(seconds=int(interval.total_seconds() * fraction))
+
+
+def next_phase_slot(
+    profile_id: int,
+    interval: timedelta,
+    now: datetime,
+    min_gap_ratio: float = 0.5
+) -> datetime:
+    """
+    Next slot of the profile's phase grid at least min_gap_ratio * interval
+    after now.
+
+    Slots are PHASE_EPOCH + phase + k * interval, so the gap between two
+    scrapes stays between 0.5 and 1.5 intervals while the profile drifts
+    onto its own phase, then settles at exactly one interval.
+    """
+    earliest = now + interval * min_gap_ratio
+    first_slot = PHASE_EPOCH + profile_phase(profile_id, interval)
+    elapsed = (earliest - first_slot).total_seconds()
+    step = interval.total_seconds()
+    periods = max(0, -(-elapsed // step))  # ceil
+    return first_slot + timedelta(seconds=periods * step)
+
+
+def spread_overdue(
+    overdue: List[Tuple[int, int, Optional[datetime]]],
+    now: datetime,
+    window: timedelta
+) -> Dict[int, datetime]:
+    """
+    Spread overdue profiles evenly across a catch-up window.
+
+    Args:
+        overdue: (profile_id, priority, next_scrape_at) tuples
+        now: Start of the window
+        window: Duration over which the backlog is drained
+
+    Returns:
+        Dict profile_id -> effective due time, highest priority and most
+        overdue profiles first
+    """
+    ordered = sorted(
+        overdue,
+        key=lambda entry: (-(entry[1] or 5), entry[2] or datetime.min)
+    )
+    if not ordered:
+        return {}
+
+    step = window / len(ordered)
+    return {
+        profile_id: now + step * index
+        for index, (profile_id, _, _) in enumerate(ordered)
+    }
+
+
+# ============ Adaptive ("auto") frequency ============
+
+def auto_interval_bounds(priority: Optional[int]) -> Tuple[timedelta, timedelta]:
+    """Shortest and longest auto interval allowed for a priority (1-10)"""
+    priority = priority or 5
+    for min_priority, shortest, longest in AUTO_BOUNDS_BY_PRIORITY:
+        if priority >= min_priority:
+            return shortest, longest
+    return AUTO_BOUNDS_BY_PRIORITY[-1][1], AUTO_BOUNDS_BY_PRIORITY[-1][2]
+
+
+def estimate_posting_rate(timestamps: List[datetime], now: datetime) -> float:
+    """
+    Posts per hour over the lookback window.
+
+    Uses a weak prior (AUTO_PRIOR_POSTS over AUTO_PRIOR_HOURS) so a profile
+    with little history is neither scraped constantly nor forgotten.
+    """
+    since = now - AUTO_LOOKBACK
+    recent = [ts for ts in timestamps if ts and since <= ts <= now]
+    if recent:
+        observed_hours = (now - min(recent)).total_seconds() / 3600
+    else:
+        observed_hours = 0.0
+    return (len(recent) + AUTO_PRIOR_POSTS) / (observed_hours + AUTO_PRIOR_HOURS)
+
+
+def adaptive_interval(
+    rate_per_hour: float,
+    priority: Optional[int],
+    target_hit_ratio: float = AUTO_TARGET_HIT_RATIO
+) -> timedelta:
+    """
+    Longest interval at which a scrape still has target_hit_ratio chance
+    of finding a new post, assuming Poisson arrivals at rate_per_hour.
+
+    Solves 1 - exp(-rate * T) = target, then clamps T to the priority bounds.
+    """
+    shortest, longest = auto_interval_bounds(priority)
+    if rate_per_hour <= 0:
+        return longest
+
+    hours = -math.log(1 - target_hit_ratio) / rate_per_hour
+    interval = timedelta(hours=hours)
+    return max(shortest, min(longest, interval))
+
+
+def scrapes_per_week(interval: timedelta) -> float:
+    """Number of scrapes a fixed interval costs per week"""
+    return timedelta(weeks=1) / interval
+
+
+def load_posting_timestamps(db: Session, profile_id: int, now: datetime) -> List[datetime]:
+    """
+    Publication times of a profile's posts within the lookback window.
+
+    posted_at is preferred. Bright Data rarely returns it, so first_seen_at
+    is used as a fallback, except for the posts of the very first scrape
+    (the backfill), which would otherwise all share one timestamp.
+    """
+    first_seen = db.query(func.min(TrackedPost.first_seen_at)).filter(
+        TrackedPost.profile_id == profile_id
+    ).scalar()
+    if first_seen is None:
+        return []
+
+    backfill_end = first_seen + timedelta(hours=1)
+    rows = db.query(TrackedPost.posted_at, TrackedPost.first_seen_at).filter(
+        TrackedPost.profile_id == profile_id,
+        func.coalesce(TrackedPost.posted_at, TrackedPost.first_seen_at) >= now - AUTO_LOOKBACK
+    ).all()
+
+    timestamps = []
+    for posted_at, seen_at in rows:
+        if posted_at:
+            timestamps.append(posted_at)
+        elif seen_at and seen_at > backfill_end:
+            timestamps.append(seen_at)
+    return timestamps
+
+
+def plan_auto_frequency(db: Session, profile_id: int, priority: Optional[int], now: datetime) -> dict:
+    """
+    Estimate a profile's posting rate and the resulting auto interval.
+
+    Returns the interval along with the weekly scrape count compared to the
+    static AUTO_BASELINE_FREQUENCY schedule.
+    """
+    rate = estimate_posting_rate(load_posting_timestamps(db, profile_id, now), now)
+    interval = adaptive_interval(rate, priority)
+    auto_scrapes = scrapes_per_week(interval)
+    baseline_scrapes = scrapes_per_week(frequency_interval(AUTO_BASELINE_FREQUENCY))
+
+    return {
+        "profile_id": profile_id,
+        "posts_per_day": round(rate * 24, 3),
+        "interval": interval,
+        "interval_hours": round(interval.total_seconds() / 3600, 2),
+        "scrapes_per_week": round(auto_scrapes, 2),
+        "baseline_scrapes_per_week": round(baseline_scrapes, 2),
+        "scrapes_saved_per_week": round(baseline_scrapes - auto_scrapes, 2),
+    }
+
+
+# ============ Posting-hour histogram ============
+
+HISTOGRAM_BUCKETS = 7 * 24
+HISTOGRAM_MIN_POSTS = 5  # Below this the histogram is ignored
+HISTOGRAM_MAX_SPREAD = timedelta(days=7)  # Wider detection windows carry no timing info
+HISTOGRAM_STEP = timedelta(minutes=15)  # Resolution of candidate scrape times
+HISTOGRAM_WINDOW_RATIO = 0.25  # Candidates within +/- 25% of the interval
+
+
+def histogram_bucket(moment: datetime) -> int:
+    """Bucket index of a UTC datetime (weekday * 24 + hour)"""
+    return moment.weekday() * 24 + moment.hour
+
+
+def parse_histogram(raw: Optional[str]) -> List[float]:
+    """Decode a posting_histogram column (empty histogram when missing)"""
+    if raw:
+        try:
+            values = json.loads(raw)
+            if len(values) == HISTOGRAM_BUCKETS:
+                return [float(v) for v in values]
+        except (ValueError, TypeError):
+            pass
+    return [0.0] * HISTOGRAM_BUCKETS
+
+
+def add_to_histogram(histogram: List[float], start: datetime, end: datetime, weight: float = 1.0):
+    """
+    Spread `weight` over the hour buckets between start and end,
+    proportionally to the time spent in each hour.
+    """
+    total = (end - start).total_seconds()
+    if total <= 0:
+        histogram[histogram_bucket(end)] += weight
+        return
+
+    cursor = start
+    while cursor < end:
+        hour_end = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        segment_end = min(hour_end, end)
+        histogram[histogram_bucket(cursor)] += weight * (segment_end - cursor).total_seconds() / total
+        cursor = segment_end
+
+
+def update_posting_histogram(db: Session, profile_id: int) -> int:
+    """
+    Add the posts ingested since the last update to the profile histogram.
+
+    A post with posted_at counts fully in its hour. Otherwise it was
+    published between the previous scrape (from profile_snapshots) and its
+    first_seen_at, so its weight is spread over that window. The posts of
+    the first scrape have no previous scrape and are skipped. The caller
+    commits.
+
+    Returns:
+        Number of posts added to the histogram
+    """
+    profile = db.query(TrackedProfile).filter(TrackedProfile.id == profile_id).first()
+    if not profile:
+        return 0
+
+    query = db.query(TrackedPost.posted_at, TrackedPost.first_seen_at).filter(
+        TrackedPost.profile_id == profile_id,
+        TrackedPost.first_seen_at != None
+    )
+    if profile.histogram_updated_at:
+        query = query.filter(TrackedPost.first_seen_at > profile.histogram_updated_at)
+    posts = query.all()
+    if not posts:
+        return 0
+
+    earliest = min(seen_at for _, seen_at in posts)
+    scrape_times = sorted(
+        scraped_at for (scraped_at,) in db.query(ProfileSnapshot.scraped_at).filter(
+            ProfileSnapshot.profile_id == profile_id,
+            ProfileSnapshot.scraped_at >= earliest - HISTOGRAM_MAX_SPREAD
+        ).all()
+        if scraped_at
+    )
+
+    histogram = parse_histogram(profile.posting_histogram)
+    counted = 0
+    for posted_at, seen_at in posts:
+        if posted_at:
+            histogram[histogram_bucket(posted_at)] += 1
+            counted += 1
+            continue
+
+        # Snapshot of the same scrape is written just before the posts
+        index = bisect.bisect_left(scrape_times, seen_at - timedelta(minutes=1))
+        if index == 0:
+            continue
+        previous_scrape = scrape_times[index - 1]
+        if seen_at - previous_scrape > HISTOGRAM_MAX_SPREAD:
+            continue
+        add_to_histogram(histogram, previous_scrape, seen_at)
+        counted += 1
+
+    profile.posting_histogram = json.dumps([round(v, 3) for v in histogram])
+    profile.histogram_updated_at = max(seen_at for _, seen_at in posts)
+    return counted
+
+
+def expected_detection_delay(
+    histogram: List[float],
+    interval: timedelta,
+    scrape_at: datetime
+) -> float:
+    """
+    Average delay (seconds) between publication and detection if the
+    profile is scraped at scrape_at and then every interval.
+
+    Posts of a bucket are taken at the end of their hour, so a scrape just
+    after the hour catches all of them. The delay of a post published at p
+    is (scrape_at - p) mod interval, exact when interval divides a week.
+    """
+    week = 7 * 24 * 3600
+    period = interval.total_seconds()
+    scrape_offset = (
+        scrape_at.weekday() * 86400 + scrape_at.hour * 3600
+        + scrape_at.minute * 60 + scrape_at.second
+    )
+
+    total, weighted = 0.0, 0.0
+    for bucket, weight in enumerate(histogram):
+        if not weight:
+            continue
+        age = (scrape_offset - (bucket + 1) * 3600) % week
+        weighted += weight * (age % period)
+        total += weight
+    return weighted / total if total else 0.0
+
+
+def best_scrape_time(
+    histogram: List[float],
+    interval: timedelta,
+    target: datetime
+) -> datetime:
+    """
+    Move a planned scrape time to the moment that minimises the expected
+    detection delay of the profile's posts.
+
+    Candidates lie within +/- HISTOGRAM_WINDOW_RATIO * interval of target,
+    so the average interval (and the scrape count) is unchanged. A
+    histogram with fewer than HISTOGRAM_MIN_POSTS posts is ignored.
+    """
+    if sum(histogram) < HISTOGRAM_MIN_POSTS:
+        return target
+
+    steps = int(interval * HISTOGRAM_WINDOW_RATIO / HISTOGRAM_STEP)
+    best_time, best_key = target, None
+    for offset in range(-steps, steps + 1):
+        candidate = target + HISTOGRAM_STEP * offset
+        # Lowest delay first, then the candidate closest to target
+        key = (expected_detection_delay(histogram, interval, candidate), abs(offset))
+        if best_key is None or key < best_key:
+            best_time, best_key = candidate, key
+    return best_time
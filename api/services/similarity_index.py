@@ -0,0 +1,414 @@
+"""
+Similarity Index - Approximate nearest-neighbour search over post contents, persisted on disk
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Post, TrackedPost
+from services.embeddings import EMBEDDINGS_DIR, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-process
+    fcntl = None
+
+logger = logging.getLogger("SimilarityIndex")
+
+NUM_KEYS = 1 << 18  # Hashed terms, finer than the 1024 prefilter columns
+TERMS_PER_DOC = 16  # A document is indexed under its top terms only
+MAX_POSTINGS_PER_TERM = 2000  # Highest-weight postings scanned per query term
+COMPACT_AFTER = 100_000  # Minimum log entries before merging into the segment
+SYNC_BATCH = 5000
+
+_LOG_RECORD = struct.Struct("<IIf")  # key, row, weight
+
+
+def term_frequencies(text: Optional[str]) -> Dict[int, float]:
+    """Sublinear term frequencies keyed by hashed term"""
+    counts: Dict[int, int] = {}
+    for token in tokenize(text):
+        key = zlib.crc32(token.encode("utf-8")) % NUM_KEYS
+        counts[key] = counts.get(key, 0) + 1
+    return {key: 1.0 + math.log(count) for key, count in counts.items()}
+
+
+class SimilarityIndex:
+    """
+    Impact-pruned inverted index over TF-IDF term vectors.
+
+    Each document is indexed under its TERMS_PER_DOC highest TF-IDF terms,
+    with the weight of the term in the L2-normalized truncated vector. A
+    query scores documents by the dot product over the terms they share
+    with the query's own top terms, reading at most MAX_POSTINGS_PER_TERM
+    postings per term, so its cost does not grow with the corpus.
+
+    Storage (in EMBEDDINGS_DIR):
+    - <name>.seg: compacted postings, mmapped - offsets per key, then
+      rows (uint32) and weights (float32) grouped by key, each key's
+      postings by decreasing weight
+    - <name>.log: postings added since the last compaction, replayed in
+      memory on load and merged into the segment past COMPACT_AFTER entries
+    - <name>.ids: document id of each row (int64, append-only)
+    - <name>.df, <name>.json: document frequencies and counters
+
+    A query reads the first postings of each key in the segment and the
+    highest-weight ones of the log: the documents where the term weighs
+    most, whatever their age. A segment written before postings were
+    ordered by weight is read from its end (newest) until the next add
+    compacts it.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.name = name
+        self.directory = directory or EMBEDDINGS_DIR
+        base = os.path.join(self.directory, name)
+        self.segment_path = base + ".seg"
+        self.log_path = base + ".log"
+        self.ids_path = base + ".ids"
+        self.df_path = base + ".df"
+        self.meta_path = base + ".json"
+        self.lock_path = base + ".lock"
+
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self._ids = array("q")
+        self._df = array("I", bytes(4 * NUM_KEYS))
+        self.n_docs = 0
+        self.last_id = 0
+        self.log_entries = 0
+        self._delta: Dict[int, Tuple[array, array]] = {}
+        self._segment: Optional[mmap.mmap] = None
+        self._offsets: Optional[memoryview] = None
+        self._segment_entries = 0
+        self.weight_ordered = True  # Segment postings sorted by weight within each key
+
+    # ============ Persistence ============
+
+    def _refresh(self):
+        """Load the index, or reload it if another process changed it"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("num_keys") != NUM_KEYS or meta.get("terms_per_doc") != TERMS_PER_DOC:
+            logger.warning(f"Similarity index {self.name} built with other settings; ignoring it")
+            return
+
+        self.n_docs = meta["n_docs"]
+        self.last_id = meta["last_id"]
+        self.log_entries = meta["log_entries"]
+
+        self._ids = array("q")
+        with open(self.ids_path, "rb") as f:
+            self._ids.frombytes(f.read(8 * meta["rows"]))
+        self._df = array("I")
+        with open(self.df_path, "rb") as f:
+            self._df.frombytes(f.read())
+
+        # Replay only the entries recorded in the meta (a write may be in progress)
+        self._delta = {}
+        if self.log_entries:
+            with open(self.log_path, "rb") as f:
+                raw = f.read(self.log_entries * _LOG_RECORD.size)
+            for key, row, weight in _LOG_RECORD.iter_unpack(raw):
+                self._add_to_delta(key, row, weight)
+
+        self._map_segment()
+        self.weight_ordered = meta.get("weight_ordered", self._segment is None)
+        self._meta_mtime = mtime
+
+    def _map_segment(self):
+        self._close_segment()
+        if not os.path.exists(self.segment_path):
+            return
+        with open(self.segment_path, "rb") as f:
+            self._segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._segment)[:4 * (NUM_KEYS + 1)].cast("I")
+        self._segment_entries = self._offsets[NUM_KEYS]
+
+    def _close_segment(self):
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        self._segment_entries = 0
+
+    def _save_meta(self):
+        with open(self.df_path + ".tmp", "wb") as f:
+            f.write(self._df.tobytes())
+        os.replace(self.df_path + ".tmp", self.df_path)
+
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "num_keys": NUM_KEYS,
+                "terms_per_doc": TERMS_PER_DOC,
+                "n_docs": self.n_docs,
+                "rows": len(self._ids),
+                "last_id": self.last_id,
+                "log_entries": self.log_entries,
+                "weight_ordered": self.weight_ordered,
+            }, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(self.lock_path, "a")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _add_to_delta(self, key: int, row: int, weight: float):
+        postings = self._delta.get(key)
+        if postings is None:
+            postings = (array("I"), array("f"))
+            self._delta[key] = postings
+        postings[0].append(row)
+        postings[1].append(weight)
+
+    # ============ Vectors ============
+
+    def _top_terms(self, tf: Dict[int, float], limit: int = TERMS_PER_DOC) -> List[Tuple[int, float]]:
+        """Highest TF-IDF terms, L2-normalized over the kept terms"""
+        n = self.n_docs
+        weighted = [
+            (key, value * (math.log((1 + n) / (1 + self._df[key])) + 1.0))
+            for key, value in tf.items()
+        ]
+        top = heapq.nlargest(limit, weighted, key=lambda item: item[1])
+        norm = math.sqrt(sum(weight * weight for _, weight in top))
+        return [(key, weight / norm) for key, weight in top] if norm else []
+
+    # ============ Writes ============
+
+    def add(self, documents: List[Tuple[int, Optional[str]]]) -> int:
+        """
+        Index documents with an id above last_id, in id order.
+
+        Returns:
+            Number of documents indexed
+        """
+        lock_handle = self._file_lock()
+        try:
+            with self._lock:
+                self._refresh()
+                texts = {doc_id: text for doc_id, text in documents if doc_id > self.last_id}
+                new_docs = [(doc_id, term_frequencies(texts[doc_id])) for doc_id in sorted(texts)]
+                if not new_docs:
+                    return 0
+
+                # Frequencies first, so the new postings use up-to-date IDF
+                for _, tf in new_docs:
+                    for key in tf:
+                        self._df[key] += 1
+                self.n_docs += len(new_docs)
+
+                records = bytearray()
+                new_ids = array("q")
+                for doc_id, tf in new_docs:
+                    row = len(self._ids) + len(new_ids)
+                    new_ids.append(doc_id)
+                    for key, weight in self._top_terms(tf):
+                        records += _LOG_RECORD.pack(key, row, weight)
+                        self._add_to_delta(key, row, weight)
+
+                with open(self.ids_path, "ab") as f:
+                    f.truncate(8 * len(self._ids))
+                    f.write(new_ids.tobytes())
+                with open(self.log_path, "ab") as f:
+                    f.truncate(self.log_entries * _LOG_RECORD.size)
+                    f.write(records)
+
+                self._ids.extend(new_ids)
+                self.log_entries += len(records) // _LOG_RECORD.size
+                self.last_id = new_docs[-1][0]
+                self._save_meta()
+
+                # Compaction rewrites the whole segment: let the log grow
+                # with it so the rewrite cost stays proportional to ingest
+                if self.log_entries >= max(COMPACT_AFTER, self._segment_entries // 8) or not self.weight_ordered:
+                    self._compact()
+                return len(new_docs)
+        finally:
+            lock_handle.close()
+
+    def _compact(self):
+        """Merge the log into a new segment, postings by decreasing weight (caller holds both locks)"""
+        offsets = array("I", [0])
+        rows = array("I")
+        weights = array("f")
+        segment_rows_at = 4 * (NUM_KEYS + 1)
+        segment_weights_at = segment_rows_at + 4 * self._segment_entries
+
+        for key in range(NUM_KEYS):
+            key_rows = array("I")
+            key_weights = array("f")
+            if self._segment is not None:
+                start, end = self._offsets[key], self._offsets[key + 1]
+                if end > start:
+                    key_rows.frombytes(self._segment[segment_rows_at + 4 * start:segment_rows_at + 4 * end])
+                    key_weights.frombytes(self._segment[segment_weights_at + 4 * start:segment_weights_at + 4 * end])
+            delta = self._delta.get(key)
+            if delta is not None:
+                key_rows.extend(delta[0])
+                key_weights.extend(delta[1])
+            if key_rows:
+                # Newest first among equal weights (stable sort of reversed rows)
+                order = sorted(range(len(key_rows) - 1, -1, -1), key=lambda i: -key_weights[i])
+                rows.extend(key_rows[i] for i in order)
+                weights.extend(key_weights[i] for i in order)
+            offsets.append(len(rows))
+
+        self._close_segment()
+        tmp_path = self.segment_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(offsets.tobytes())
+            f.write(rows.tobytes())
+            f.write(weights.tobytes())
+        os.replace(tmp_path, self.segment_path)
+
+        with open(self.log_path, "wb"):
+            pass
+        self._delta = {}
+        self.log_entries = 0
+        self.weight_ordered = True
+        self._save_meta()
+        self._map_segment()
+        logger.info(f"Compacted similarity index {self.name}: {len(rows)} postings")
+
+    # ============ Queries ============
+
+    def search(
+        self,
+        text: Optional[str],
+        limit: int = 10,
+        exclude_ids: Optional[Set[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Documents most similar to `text`.
+
+        Each query term reads its MAX_POSTINGS_PER_TERM highest-weight
+        postings; a document that shares only terms where it weighs less
+        than that many others can be missed (impact pruning).
+
+        Returns:
+            [(doc_id, score)] by decreasing score; the score is the cosine
+            of the truncated TF-IDF vectors, in [0, 1]
+        """
+        exclude_ids = exclude_ids or set()
+        with self._lock:
+            self._refresh()
+            query = self._top_terms(term_frequencies(text))
+            segment_rows_at = 4 * (NUM_KEYS + 1)
+            segment_weights_at = segment_rows_at + 4 * self._segment_entries
+
+            scores: Dict[int, float] = {}
+            for key, query_weight in query:
+                budget = MAX_POSTINGS_PER_TERM
+                postings: List[Tuple[int, float]] = []
+
+                # Log: unsorted, keep its highest weights
+                delta = self._delta.get(key)
+                if delta is not None:
+                    postings.extend(zip(*delta))
+                    if len(postings) > budget:
+                        postings = heapq.nlargest(budget, postings, key=lambda posting: posting[1])
+
+                # Segment: its first postings are the highest weights of the key
+                if self._segment is not None:
+                    first, end = self._offsets[key], self._offsets[key + 1]
+                    if self.weight_ordered:
+                        end = min(end, first + budget)
+                    else:
+                        first = max(first, end - budget)
+                    if end > first:
+                        segment_rows = array("I")
+                        segment_rows.frombytes(self._segment[segment_rows_at + 4 * first:segment_rows_at + 4 * end])
+                        segment_weights = array("f")
+                        segment_weights.frombytes(self._segment[segment_weights_at + 4 * first:segment_weights_at + 4 * end])
+                        postings.extend(zip(segment_rows, segment_weights))
+
+                if len(postings) > budget:
+                    postings = heapq.nlargest(budget, postings, key=lambda posting: posting[1])
+                for row, weight in postings:
+                    scores[row] = scores.get(row, 0.0) + query_weight * weight
+
+            ids = self._ids
+            best = heapq.nlargest(limit + len(exclude_ids), scores.items(), key=lambda item: item[1])
+            results = [(ids[row], min(1.0, score)) for row, score in best if ids[row] not in exclude_ids]
+            return results[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "documents": len(self._ids),
+                "last_id": self.last_id,
+                "segment_postings": self._segment_entries,
+                "log_postings": self.log_entries,
+            }
+
+
+class ContentSimilarity:
+    """Similarity index kept in sync with the content of a posts table"""
+
+    def __init__(self, model, index: SimilarityIndex):
+        """
+        Args:
+            model: Post or TrackedPost (needs id and content)
+            index: Index storing the vectors of that table
+        """
+        self.model = model
+        self.index = index
+
+    def sync(self, db: Session) -> int:
+        """Index the rows added since the last sync (ids above index.last_id)"""
+        added = 0
+        while True:
+            rows = db.query(self.model.id, self.model.content).filter(
+                self.model.id > self.index.last_id
+            ).order_by(self.model.id).limit(SYNC_BATCH).all()
+            if not rows:
+                return added
+            added += self.index.add(rows)
+            if len(rows) < SYNC_BATCH:
+                return added
+
+    def similar(self, db: Session, post, limit: int = 10) -> List[Tuple[object, float]]:
+        """
+        Posts most similar to `post`, with their score.
+        Posts deleted since they were indexed are skipped.
+        """
+        self.sync(db)
+        # A few extra hits to make up for deleted posts
+        hits = self.index.search(post.content, limit + 5, exclude_ids={post.id})
+        if not hits:
+            return []
+        found = {
+            row.id: row for row in
+            db.query(self.model).filter(self.model.id.in_([doc_id for doc_id, _ in hits]))
+        }
+        return [(found[doc_id], score) for doc_id, score in hits if doc_id in found][:limit]
+
+
+post_similarity = ContentSimilarity(Post, SimilarityIndex("posts_similar"))
+tracked_post_similarity = ContentSimilarity(TrackedPost, SimilarityIndex("tracked_posts_similar"))
@@ -0,0 +1,174 @@
+"""
+Spin Cache - Stored spin variants and original-post analyses, size-bounded LRU in the database
+"""
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import SpinAnalysisCache, SpinResultCache
+
+logger = logging.getLogger("SpinCache")
+
+
+def content_hash(content: Optional[str]) -> str:
+    """Hash of a post content, insensitive to surrounding whitespace"""
+    return hashlib.sha256((content or "").strip().encode("utf-8")).hexdigest()
+
+
+class SpinCache:
+    """
+    Cache of the spin workflow, in two levels.
+
+    - Results: the final variant for (post content, profile version, tone,
+      angle_preference, include_cta). The version is ActiveProfile.version:
+      any profile edit gives a new one, so variants written for an older
+      profile are never served. A hit skips the whole workflow.
+    - Analyses: the original-post analysis for a post content. It does
+      not depend on the profile or the options, so a spin with another
+      tone still skips the analysis stage.
+
+    Each table keeps at most max_* rows; the least recently used rows are
+    evicted when a new entry is stored.
+    """
+
+    def __init__(self, max_results: int = 500, max_analyses: int = 2000):
+        """
+        Args:
+            max_results: Spin variants kept
+            max_analyses: Post analyses kept
+        """
+        self.max_results = max_results
+        self.max_analyses = max_analyses
+
+    @staticmethod
+    def result_key(spin_request: dict, profile_version: str) -> dict:
+        """
+        Cache key fields of a spin request (see build_spin_request).
+
+        Args:
+            profile_version: ActiveProfile.version of the profile the request was built from
+        """
+        options = spin_request["spin_options"]
+        fields = {
+            "content_hash": content_hash(spin_request["original_post"]["content"]),
+            "profile_version": profile_version,
+            "tone": options.get("tone") or "professional",
+            "angle_preference": options.get("angle_preference") or None,
+            "include_cta": bool(options.get("include_cta", True)),
+        }
+        raw = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        fields["cache_key"] = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return fields
+
+    # ============ Results ============
+
+    def get_result(self, db: Session, spin_request: dict, profile_version: str) -> Optional[SpinResultCache]:
+        """Stored variant for this request and profile version, marked as used"""
+        key = self.result_key(spin_request, profile_version)
+        entry = db.query(SpinResultCache).filter(
+            SpinResultCache.cache_key == key["cache_key"]
+        ).first()
+        if entry:
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_used_at = datetime.utcnow()
+            db.commit()
+        return entry
+
+    def store_result(
+        self,
+        db: Session,
+        spin_request: dict,
+        profile_version: str,
+        result: dict,
+        generated_post_id: Optional[int]
+    ) -> SpinResultCache:
+        """Store (or replace) the variant for this request and evict the overflow"""
+        key = self.result_key(spin_request, profile_version)
+        now = datetime.utcnow()
+        entry = db.merge(SpinResultCache(
+            **key,
+            result=json.dumps(result, ensure_ascii=False),
+            generated_post_id=generated_post_id,
+            hit_count=0,
+            created_at=now,
+            last_used_at=now
+        ))
+        db.commit()
+        self._evict(db, SpinResultCache, SpinResultCache.cache_key, self.max_results)
+        return entry
+
+    # ============ Analyses ============
+
+    def get_analysis(self, db: Session, content: str) -> Optional[dict]:
+        """Stored analysis of a post content, marked as used"""
+        entry = db.query(SpinAnalysisCache).filter(
+            SpinAnalysisCache.content_hash == content_hash(content)
+        ).first()
+        if not entry:
+            return None
+        entry.last_used_at = datetime.utcnow()
+        db.commit()
+        return json.loads(entry.analysis)
+
+    def store_analysis(self, db: Session, content: str, analysis: dict):
+        """Store the analysis of a post content and evict the overflow"""
+        now = datetime.utcnow()
+        db.merge(SpinAnalysisCache(
+            content_hash=content_hash(content),
+            analysis=json.dumps(analysis, ensure_ascii=False),
+            created_at=now,
+            last_used_at=now
+        ))
+        db.commit()
+        self._evict(db, SpinAnalysisCache, SpinAnalysisCache.content_hash, self.max_analyses)
+
+    # ============ Maintenance ============
+
+    def _evict(self, db: Session, model, key_column, max_entries: int) -> int:
+        """Delete the least recently used rows above max_entries"""
+        overflow = db.query(func.count(key_column)).scalar() - max_entries
+        if overflow <= 0:
+            return 0
+        oldest = [
+            key for (key,) in db.query(key_column)
+            .order_by(model.last_used_at, key_column)
+            .limit(overflow)
+        ]
+        db.query(model).filter(key_column.in_(oldest)).delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"Evicted {len(oldest)} entries from {model.__tablename__}")
+        return len(oldest)
+
+    def clear(self, db: Session) -> dict:
+        """Drop every cached variant and analysis"""
+        results = db.query(SpinResultCache).delete(synchronize_session=False)
+        analyses = db.query(SpinAnalysisCache).delete(synchronize_session=False)
+        db.commit()
+        return {"results": results, "analyses": analyses}
+
+    def stats(self, db: Session) -> dict:
+        results, hits = db.query(
+            func.count(SpinResultCache.cache_key),
+            func.coalesce(func.sum(SpinResultCache.hit_count), 0)
+        ).one()
+        analyses = db.query(func.count(SpinAnalysisCache.content_hash)).scalar()
+        return {
+            "results": results,
+            "max_results": self.max_results,
+            "result_hits": int(hits),
+            "analyses": analyses,
+            "max_analyses": self.max_analyses,
+        }
+
+
+spin_cache = SpinCache(
+    max_results=int(os.getenv("SPIN_CACHE_MAX_RESULTS", "500")),
+    max_analyses=int(os.getenv("SPIN_CACHE_MAX_ANALYSES", "2000"))
+)
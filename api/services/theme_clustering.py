@@ -0,0 +1,274 @@
+"""
+Theme Clustering - Online mini-batch k-means of relevant posts into ExtractedTheme clusters
+"""
+import math
+import os
+import sys
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import ExtractedTheme, Post, PostRelevanceScore, ThemePost
+from services.relevance_prefilter import relevance_prefilter
+
+logger = logging.getLogger("ThemeClustering")
+
+# Cosine similarity to the closest centroid under which a post starts a new theme
+NEW_THEME_SIMILARITY = float(os.getenv("THEME_CLUSTER_SIMILARITY", "0.2"))
+# Beyond this many themes per profile, posts always join the closest one
+MAX_THEMES = int(os.getenv("THEME_CLUSTER_MAX_THEMES", "30"))
+# A named theme is sent to the LLM again once it has grown by this factor
+RENAME_GROWTH = 1.5
+# Posts of a cluster described to the LLM when it is named
+NAMING_SAMPLE = 20
+
+
+def _dot(vector: Dict[int, float], centroid: array) -> float:
+    return sum(value * centroid[column] for column, value in vector.items())
+
+
+def _norm(centroid: array) -> float:
+    return math.sqrt(sum(value * value for value in centroid))
+
+
+class ThemeClusterer:
+    """
+    Incremental clustering of the posts scored relevant for a profile.
+
+    Every ExtractedTheme row of the profile is a cluster: its centroid is
+    the mean TF-IDF vector of its posts (see EmbeddingStore), stored as
+    float32 next to the theme. Posts that are not in a theme yet are
+    assigned in one mini-batch (Sculley, "Web-scale k-means clustering"):
+    each joins the closest centroid, which moves towards it with a
+    per-cluster learning rate of 1/size; a post far from every centroid
+    starts a new theme. Occurrence count and averages are updated in
+    place, so previously extracted themes are never regenerated.
+
+    Only clusters that are new or have grown by RENAME_GROWTH since they
+    were named need the LLM (see naming_payload).
+    """
+
+    def __init__(self, similarity: float = NEW_THEME_SIMILARITY, max_themes: int = MAX_THEMES):
+        """
+        Args:
+            similarity: Minimum cosine similarity to join an existing theme
+            max_themes: Maximum number of themes per profile
+        """
+        self.similarity = similarity
+        self.max_themes = max_themes
+        self.store = relevance_prefilter.store
+        self._lock = threading.Lock()
+
+    def update(self, db: Session, profile_id: int, scores: List[PostRelevanceScore]) -> dict:
+        """
+        Assign the relevant posts that are in no theme yet.
+
+        Args:
+            scores: Relevant and adaptable scores of the profile
+
+        Returns:
+            Assignment counts and the ids of the themes to (re)name
+        """
+        with self._lock:
+            themes = db.query(ExtractedTheme).filter(ExtractedTheme.profile_id == profile_id).all()
+            assigned = {
+                post_id for (post_id,) in db.query(ThemePost.post_id).join(ExtractedTheme).filter(
+                    ExtractedTheme.profile_id == profile_id
+                )
+            }
+            new_scores = {score.post_id: score for score in scores if score.post_id not in assigned}
+
+            relevance_prefilter.ensure_embedded(db, list(new_scores) + list(assigned))
+            centroids = {}
+            for theme in themes:
+                centroid = self._centroid(theme)
+                if centroid is not None:
+                    centroids[theme.id] = centroid
+
+            engagement = dict(db.query(
+                Post.id, Post.likes + Post.comments + Post.shares
+            ).filter(Post.id.in_(list(new_scores))).all()) if new_scores else {}
+
+            by_id = {theme.id: theme for theme in themes}
+            batch = []
+            for post_id, score in new_scores.items():
+                vector = self.store.vector(post_id)
+                if vector:
+                    batch.append((post_id, vector, score))
+
+            # 1. Nearest theme of each post, against the centroids before the batch
+            norms = {theme_id: _norm(centroid) for theme_id, centroid in centroids.items()}
+            nearest = [self._closest(centroids, norms, vector) for _, vector, _ in batch]
+
+            # 2. Gradient step of each assigned post; the others seed new
+            #    themes one at a time so that close posts end up together
+            created = 0
+            new_ids: List[int] = []
+            for (post_id, vector, score), theme_id in zip(batch, nearest):
+                if theme_id is None:
+                    candidates = {new_id: centroids[new_id] for new_id in new_ids}
+                    theme_id = self._closest(candidates, norms, vector)
+                if theme_id is None and len(by_id) >= self.max_themes:
+                    theme_id = self._closest(centroids, norms, vector, full=True)
+                if theme_id is None:
+                    theme = self._new_theme(db, profile_id, score)
+                    by_id[theme.id] = theme
+                    centroids[theme.id] = array("f", bytes(self.store.dim * 4))
+                    theme_id = theme.id
+                    new_ids.append(theme_id)
+                    created += 1
+                self._add_post(
+                    by_id[theme_id], centroids[theme_id], post_id, vector, score, engagement.get(post_id) or 0
+                )
+                norms[theme_id] = _norm(centroids[theme_id])
+
+            for theme_id, centroid in centroids.items():
+                by_id[theme_id].centroid = centroid.tobytes()
+            db.commit()
+
+            to_name = [
+                theme.id for theme in by_id.values()
+                if theme.centroid is not None and (
+                    not theme.named_size
+                    or (theme.occurrence_count or 0) >= theme.named_size * RENAME_GROWTH
+                )
+            ]
+            logger.info(
+                f"Profile {profile_id}: {len(new_scores)} new posts, {created} new themes, "
+                f"{len(to_name)} to name"
+            )
+            return {
+                "posts_assigned": len(new_scores),
+                "themes_created": created,
+                "themes_total": len(by_id),
+                "themes_to_name": to_name,
+            }
+
+    def _centroid(self, theme: ExtractedTheme) -> Optional[array]:
+        """Stored centroid, or the mean of the theme's posts for a theme named before clustering"""
+        if theme.centroid:
+            centroid = array("f")
+            centroid.frombytes(theme.centroid)
+            return centroid
+
+        post_ids = [link.post_id for link in theme.post_links]
+        vectors = [vector for vector in (self.store.vector(post_id) for post_id in post_ids) if vector]
+        if not vectors:
+            return None
+        centroid = array("f", bytes(self.store.dim * 4))
+        for vector in vectors:
+            for column, value in vector.items():
+                centroid[column] += value / len(vectors)
+        # Already named by the previous extraction: only growth triggers a rename
+        theme.occurrence_count = len(post_ids)
+        theme.named_size = len(post_ids)
+        return centroid
+
+    def _closest(
+        self,
+        centroids: Dict[int, array],
+        norms: Dict[int, float],
+        vector: Dict[int, float],
+        full: bool = False
+    ) -> Optional[int]:
+        """Id of the closest centroid, None if it is under the similarity threshold (unless full)"""
+        best_id, best_similarity = None, -1.0
+        for theme_id, centroid in centroids.items():
+            norm = norms.get(theme_id)
+            similarity = _dot(vector, centroid) / norm if norm else 0.0
+            if similarity > best_similarity:
+                best_id, best_similarity = theme_id, similarity
+        if best_id is not None and (full or best_similarity >= self.similarity):
+            return best_id
+        return None
+
+    def _new_theme(self, db: Session, profile_id: int, score: PostRelevanceScore) -> ExtractedTheme:
+        """Empty theme, provisionally named after the post's universal theme"""
+        theme = ExtractedTheme(
+            profile_id=profile_id,
+            theme_name=score.universal_theme or "Nouveau theme",
+            occurrence_count=0,
+            named_size=None
+        )
+        db.add(theme)
+        db.flush()
+        return theme
+
+    @staticmethod
+    def _add_post(
+        theme: ExtractedTheme,
+        centroid: array,
+        post_id: int,
+        vector: Dict[int, float],
+        score: PostRelevanceScore,
+        engagement: int
+    ):
+        """Move the centroid towards the post and update the running statistics"""
+        size = (theme.occurrence_count or 0) + 1
+        rate = 1.0 / size
+        for column in range(len(centroid)):
+            centroid[column] *= 1.0 - rate
+        for column, value in vector.items():
+            centroid[column] += rate * value
+
+        theme.avg_engagement = ((theme.avg_engagement or 0) * (size - 1) + engagement) / size
+        theme.avg_relevance_score = (
+            (theme.avg_relevance_score or 0) * (size - 1) + (score.overall_relevance or 0)
+        ) / size
+        theme.occurrence_count = size
+        theme.post_links.append(ThemePost(post_id=post_id))
+        theme.last_seen_at = datetime.utcnow()
+
+    def naming_payload(self, db: Session, profile_id: int, theme_ids: List[int]) -> List[dict]:
+        """
+        Clusters to send to the LLM for naming: their posts' categories and
+        universal themes (never the raw content, as in the full extraction).
+        """
+        themes = db.query(ExtractedTheme).filter(
+            ExtractedTheme.profile_id == profile_id,
+            ExtractedTheme.id.in_(theme_ids)
+        ).all()
+
+        payload = []
+        for theme in themes:
+            rows = db.query(
+                PostRelevanceScore.post_id,
+                Post.category,
+                PostRelevanceScore.universal_theme,
+                PostRelevanceScore.overall_relevance,
+                Post.likes + Post.comments + Post.shares
+            ).join(Post, Post.id == PostRelevanceScore.post_id).join(
+                ThemePost, ThemePost.post_id == PostRelevanceScore.post_id
+            ).filter(
+                ThemePost.theme_id == theme.id,
+                PostRelevanceScore.profile_id == profile_id
+            ).order_by(PostRelevanceScore.overall_relevance.desc()).limit(NAMING_SAMPLE).all()
+
+            payload.append({
+                "theme_id": theme.id,
+                "current_name": theme.theme_name if theme.named_size else None,
+                "occurrence_count": theme.occurrence_count,
+                "avg_engagement": round(theme.avg_engagement or 0, 1),
+                "top_universal_themes": [
+                    name for name, _ in Counter(row[2] for row in rows if row[2]).most_common(5)
+                ],
+                "posts": [
+                    {
+                        "post_id": post_id,
+                        "category": category,
+                        "universal_theme": universal_theme or "theme non identifie",
+                        "relevance": relevance,
+                        "engagement": engagement or 0
+                    }
+                    for post_id, category, universal_theme, relevance, engagement in rows
+                ],
+            })
+        return payload
+
+
+theme_clusterer = ThemeClusterer()
@@ -2,15 +2,31 @@
 Tracker Scheduler - Background service for automated profile scraping
 """
 import asyncio
+import heapq
+import threading
 import subprocess
 import os
+import sys
 import json
 from datetime import datetime, timedelta
-from typing import List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Set, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import TrackedProfile, ScrapeJob
+from services.job_queue import ScrapeJobQueue
+from services.leader_election import LeaderElection
+from services.scheduler_metrics import SchedulerMetrics, percentile_of
+from services.similarity_index import tracked_post_similarity
+from services.workflow_executor import WorkflowExecutor
+from services.near_duplicates import tracked_post_duplicates
+from services.originality import originality_checker
+from services.scrape_planning import (
+    frequency_interval, next_phase_slot, spread_overdue, plan_auto_frequency,
+    parse_histogram, update_posting_histogram, best_scrape_time
+)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("TrackerScheduler")
@@ -18,8 +34,20 @@ logger = logging.getLogger("TrackerScheduler")
 
 class TrackerScheduler:
     """
-    Background scheduler that periodically checks for profiles
-    that need to be scraped and triggers the TypeScript workflow.
+    Background scheduler that keeps an in-memory min-heap of
+    next_scrape_at and sleeps exactly until the next profile is due,
+    then enqueues a scrape job (see services/job_queue.py). Worker tasks
+    claim jobs from the queue under a lease and run the TypeScript
+    workflow, so jobs enqueued by any process are drained by all of them.
+
+    With several API processes (uvicorn --workers N) only the leader,
+    elected through a lease row (see services/leader_election.py), plans
+    scrapes; profile changes seen by other processes reach it through
+    that same row.
+
+    The heap is resynchronised from the database every reload_interval
+    seconds, and individual profiles are reloaded when the API notifies
+    a change (create, update, delete, manual scrape).
     """
 
     def __init__(self, db_factory: Callable[[], Session]):
@@ -31,151 +59,729 @@ class TrackerScheduler:
         """
         self.db_factory = db_factory
         self.running = False
-        self.check_interval = 300  # 5 minutes between checks
+        self.reload_interval = 900  # Full DB resync every 15 minutes
         self.batch_size = 10  # Max profiles per batch
+        self.catchup_window = 1800  # Spread an overdue backlog over 30 minutes
+        self.workers = int(os.getenv("TRACKER_WORKERS", "1"))  # Concurrent scrapes per process
+        self.heartbeat_interval = 60  # Lease renewal while a scrape runs
+        self.queue_poll_interval = 30  # Workers also poll for jobs enqueued elsewhere
+        self.queue = ScrapeJobQueue(lease_seconds=300)
+        self.sla_factor = float(os.getenv("TRACKER_SLA_FACTOR", "1.5"))  # Max data age, in intervals
+        self.metrics = SchedulerMetrics()
+        self.summary_interval = 60  # The leader publishes its schedule summary this often
+        self._summary_at: Optional[datetime] = None
+        self.election = LeaderElection(
+            "tracker-scheduler",
+            holder_id=self.queue.worker_id,
+            lease_seconds=int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+        )
         self.project_root = os.path.dirname(
             os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         )
 
+        # Heap of (due_at, profile_id); stale entries are skipped lazily
+        self._heap: List[Tuple[datetime, int]] = []
+        self._due_at: Dict[int, datetime] = {}
+        self._profiles: Dict[int, dict] = {}
+        self._last_reload: Optional[datetime] = None
+
+        # Last auto-frequency plan per profile (rate, interval, savings)
+        self.auto_plans: Dict[int, dict] = {}
+
+        # Change notifications may come from API threads
+        self._lock = threading.Lock()
+        self._dirty: Set[int] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._jobs_ready: Optional[asyncio.Event] = None
+
     async def start(self):
-        """Start the scheduler loop"""
+        """
+        Start the queue workers and the leader election loop.
+
+        Every process runs queue workers, but only the process holding
+        the scheduler lease plans scrapes. The others keep retrying the
+        lease and take over when the leader stops renewing it.
+        """
         self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._jobs_ready = asyncio.Event()
         logger.info("TrackerScheduler started")
 
+        workers = [
+            asyncio.create_task(self._worker_loop(i)) for i in range(self.workers)
+        ]
+        planner: Optional[asyncio.Task] = None
+
+        try:
+            while self.running:
+                # Built here, the heap is only touched from the event loop
+                summary = self._due_summary()
+                is_leader = await asyncio.to_thread(self._election_tick, summary)
+
+                if is_leader and planner is None:
+                    # The heap of a former follower is stale
+                    self._last_reload = None
+                    self._summary_at = None
+                    await asyncio.to_thread(self._load_lags)
+                    planner = asyncio.create_task(self._planning_loop())
+                elif not is_leader and planner is not None:
+                    planner.cancel()
+                    await asyncio.gather(planner, return_exceptions=True)
+                    planner = None
+
+                await asyncio.sleep(self.election.renew_interval)
+        finally:
+            tasks = workers + ([planner] if planner else [])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._release_leadership()
+
+    async def _planning_loop(self):
+        """Leader-only loop: enqueue due profiles, sleeping until the next one"""
+        logger.info("Scrape planning started in this process")
         while self.running:
             try:
                 await self.check_and_run_scrapes()
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {e}")
 
-            await asyncio.sleep(self.check_interval)
+            await self._sleep_until_next_due()
+
+    def _election_tick(self, summary: Optional[str] = None) -> bool:
+        """
+        Take or renew the scheduler lease, and relay profile changes and
+        the leader's schedule summary between processes through the lease row.
+        """
+        db = self.db_factory()
+        try:
+            is_leader = self.election.try_acquire(db)
+
+            if is_leader:
+                if summary is not None:
+                    self.election.publish(db, summary)
+                if self.election.reload_requested_since(db, self._last_reload):
+                    self.request_reload()
+            else:
+                with self._lock:
+                    dirty = self._dirty
+                    self._dirty = set()
+                if dirty:
+                    self.election.request_reload(db)
+            return is_leader
+        except Exception as e:
+            logger.error(f"Leader election failed: {e}")
+            db.rollback()
+            # Without a working DB the lease will lapse anyway
+            return False
+        finally:
+            db.close()
+
+    def _release_leadership(self):
+        """Hand the lease over on shutdown instead of waiting for it to expire"""
+        if not self.election.is_leader:
+            return
+        db = self.db_factory()
+        try:
+            self.election.release(db)
+        except Exception as e:
+            logger.error(f"Could not release scheduler lease: {e}")
+        finally:
+            db.close()
+
+    @property
+    def is_leader(self) -> bool:
+        """True if this process currently plans scrapes"""
+        return self.election.is_leader
 
     def stop(self):
         """Stop the scheduler"""
         self.running = False
+        self.wake()
+        self.wake_workers()
         logger.info("TrackerScheduler stopped")
 
+    def wake(self):
+        """Wake the scheduler loop early (safe to call from any thread)"""
+        if self._loop is None or self._wakeup is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def notify_profile_changed(self, profile_id: int):
+        """
+        Mark a profile for reload from the DB and wake the loop.
+
+        Called by the API when a profile is created, updated, deleted
+        or manually scraped.
+        """
+        with self._lock:
+            self._dirty.add(profile_id)
+        self.wake()
+
+    def request_reload(self):
+        """Force a full resync of the heap on the next iteration"""
+        self._last_reload = None
+        self.wake()
+
+    async def _sleep_until_next_due(self):
+        """Sleep until the next profile is due, a reload is needed or a wake-up"""
+        now = datetime.utcnow()
+        timeout = float(self.reload_interval)
+
+        if self._last_reload is not None:
+            reload_at = self._last_reload + timedelta(seconds=self.reload_interval)
+            timeout = min(timeout, (reload_at - now).total_seconds())
+
+        next_due = self.next_due_at()
+        if next_due is not None:
+            timeout = min(timeout, (next_due - now).total_seconds())
+
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wakeup.clear()
+
+    # ============ Heap Management ============
+
+    def _push(self, profile_id: int, due_at: datetime):
+        """Insert or reschedule a profile in the heap"""
+        self._due_at[profile_id] = due_at
+        heapq.heappush(self._heap, (due_at, profile_id))
+
+    def _discard(self, profile_id: int):
+        """Remove a profile (its heap entries become stale)"""
+        self._due_at.pop(profile_id, None)
+        self._profiles.pop(profile_id, None)
+
+    def _load_row(self, row, now: datetime, due_at: Optional[datetime] = None):
+        """Load one tracked_profiles row into the heap"""
+        self._profiles[row.id] = {
+            "display_name": row.display_name,
+            "tracking_frequency": row.tracking_frequency,
+            "priority": row.priority or 5,
+            "last_scraped_at": row.last_scraped_at,
+            "next_scrape_at": row.next_scrape_at,
+            "posting_histogram": parse_histogram(row.posting_histogram),
+        }
+        self._push(row.id, due_at or row.next_scrape_at or now)
+
+    def _profile_query(self, db: Session):
+        return db.query(
+            TrackedProfile.id,
+            TrackedProfile.display_name,
+            TrackedProfile.tracking_frequency,
+            TrackedProfile.priority,
+            TrackedProfile.last_scraped_at,
+            TrackedProfile.next_scrape_at,
+            TrackedProfile.posting_histogram,
+        ).filter(TrackedProfile.is_active == True)
+
+    def sync_from_db(self, db: Session):
+        """
+        Bring the heap in line with the database.
+
+        Does a full reload every reload_interval seconds, otherwise only
+        reloads the profiles flagged through notify_profile_changed.
+        """
+        now = datetime.utcnow()
+
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+
+        needs_reload = (
+            self._last_reload is None
+            or now - self._last_reload >= timedelta(seconds=self.reload_interval)
+        )
+
+        if needs_reload:
+            self._heap = []
+            self._due_at = {}
+            self._profiles = {}
+            rows = self._profile_query(db).all()
+            catchup = self.plan_catchup(rows, now)
+            for row in rows:
+                self._load_row(row, now, catchup.get(row.id))
+            self._last_reload = now
+            logger.debug(f"Scheduler heap reloaded with {len(self._due_at)} profiles")
+            return
+
+        if not dirty:
+            return
+
+        for profile_id in dirty:
+            self._discard(profile_id)
+        rows = self._profile_query(db).filter(TrackedProfile.id.in_(dirty)).all()
+        for row in rows:
+            self._load_row(row, now)
+
+    def plan_catchup(self, rows, now: datetime) -> Dict[int, datetime]:
+        """
+        Spread overdue profiles over catchup_window after downtime.
+
+        When more profiles are overdue than a single batch can take, they
+        would otherwise all be due at the same instant. Their effective due
+        time is staggered in memory only; next_scrape_at is rewritten once
+        each profile has actually been scraped.
+        """
+        overdue = [
+            (row.id, row.priority, row.next_scrape_at)
+            for row in rows
+            if row.next_scrape_at is None or row.next_scrape_at <= now
+        ]
+        if len(overdue) <= self.batch_size:
+            return {}
+
+        logger.info(
+            f"Catch-up mode: spreading {len(overdue)} overdue profiles "
+            f"over {self.catchup_window}s"
+        )
+        return spread_overdue(overdue, now, timedelta(seconds=self.catchup_window))
+
+    def next_due_at(self) -> Optional[datetime]:
+        """Earliest next_scrape_at in the heap"""
+        while self._heap:
+            due_at, profile_id = self._heap[0]
+            if self._due_at.get(profile_id) == due_at:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: datetime, limit: int) -> List[int]:
+        """
+        Pop the profiles due at `now`, highest priority first.
+
+        Due profiles beyond `limit` stay in the heap for the next round.
+        """
+        due: List[Tuple[datetime, int]] = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, profile_id = heapq.heappop(self._heap)
+            if self._due_at.get(profile_id) == due_at:
+                due.append((due_at, profile_id))
+
+        def sort_key(entry):
+            meta = self._profiles.get(entry[1], {})
+            return (-meta.get("priority", 5), meta.get("last_scraped_at") or datetime.min)
+
+        due.sort(key=sort_key)
+
+        for due_at, profile_id in due[limit:]:
+            heapq.heappush(self._heap, (due_at, profile_id))
+
+        selected = [profile_id for _, profile_id in due[:limit]]
+        for profile_id in selected:
+            self._due_at.pop(profile_id, None)
+        return selected
+
+    # ============ Planning Loop ============
+
     async def check_and_run_scrapes(self):
-        """Check for due profiles and trigger scraping"""
+        """Enqueue a scrape job for each profile due now"""
         # db_factory is SessionLocal, call it to get a session
         db = self.db_factory()
         try:
-            # Find profiles that need scraping
+            self.sync_from_db(db)
+
             now = datetime.utcnow()
-            profiles = db.execute(text("""
-                SELECT id, display_name, tracking_frequency
-                FROM tracked_profiles
-                WHERE is_active = 1
-                  AND (next_scrape_at IS NULL OR next_scrape_at <= :now)
-                ORDER BY priority DESC, last_scraped_at ASC NULLS FIRST
-                LIMIT :limit
-            """), {"now": now.isoformat(), "limit": self.batch_size}).fetchall()
-
-            if not profiles:
+            profile_ids = self.pop_due(now, self.batch_size)
+
+            if not profile_ids:
                 logger.debug("No profiles due for scraping")
                 return
 
-            profile_ids = [p[0] for p in profiles]
-            profile_names = [p[1] for p in profiles]
+            profile_names = [self._profiles[pid]["display_name"] for pid in profile_ids]
+            logger.info(f"Found {len(profile_ids)} profiles to scrape: {profile_names}")
+
+            for profile_id in profile_ids:
+                meta = self._profiles[profile_id]
+                job, created = self.queue.enqueue(db, profile_id, due_at=meta["next_scrape_at"])
+                if created and meta["next_scrape_at"] is not None:
+                    self.metrics.record_lag(
+                        meta["tracking_frequency"] or "daily",
+                        (job.created_at - meta["next_scrape_at"]).total_seconds(),
+                        job.created_at
+                    )
+
+                # Provisional slot so the profile is not re-enqueued; refined
+                # once the job has run (see after_scrape)
+                next_scrape = self.calculate_next_scrape(
+                    meta["tracking_frequency"], profile_id,
+                    self._auto_interval(profile_id), meta["posting_histogram"]
+                )
+                db.query(TrackedProfile).filter(
+                    TrackedProfile.id == profile_id
+                ).update({"next_scrape_at": next_scrape}, synchronize_session=False)
+                db.commit()
+                meta["next_scrape_at"] = next_scrape
+                self._push(profile_id, next_scrape)
+                if created:
+                    logger.debug(f"Profile {profile_id} queued as job {job.id}")
+                else:
+                    logger.debug(f"Profile {profile_id} already in flight as job {job.id}")
+
+            self.wake_workers()
+
+        except Exception as e:
+            logger.error(f"Error checking for scrapes: {e}")
+            db.rollback()
+            # Resync on the next iteration so popped profiles are not lost
+            self._last_reload = None
+        finally:
+            db.close()
+
+    def after_scrape(self, db: Session, profile_id: int):
+        """
+        Refresh the posting histogram and auto frequency of a scraped
+        profile, then write its final next_scrape_at.
+        """
+        profile = db.query(TrackedProfile).filter(TrackedProfile.id == profile_id).first()
+        if not profile:
+            return
+
+        update_posting_histogram(db, profile_id)
+        histogram = parse_histogram(profile.posting_histogram)
+
+        interval = None
+        if profile.tracking_frequency == "auto":
+            plan = plan_auto_frequency(db, profile_id, profile.priority, datetime.utcnow())
+            self.auto_plans[profile_id] = plan
+            interval = plan["interval"]
+            logger.info(
+                f"Auto frequency for profile {profile_id}: every "
+                f"{plan['interval_hours']}h, {plan['scrapes_saved_per_week']} scrapes/week saved"
+            )
 
-            logger.info(f"Found {len(profiles)} profiles to scrape: {profile_names}")
+        profile.next_scrape_at = self.calculate_next_scrape(
+            profile.tracking_frequency, profile_id, interval, histogram
+        )
+        db.commit()
+        self.notify_profile_changed(profile_id)
 
-            # Run batch scrape
-            await self.run_batch_scrape(profile_ids)
+    def sync_post_indexes(self):
+        """
+        Put the posts written by the workflow into the similarity and
+        originality indexes and flag their near-duplicates now rather than
+        on the next query. Runs in a worker thread with its own session.
+        """
+        db = self.db_factory()
+        try:
+            try:
+                tracked_post_similarity.sync(db)
+            except Exception as e:
+                logger.warning(f"Similarity index update failed: {e}")
+            try:
+                tracked_post_duplicates.sync(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Near-duplicate detection failed: {e}")
+            try:
+                originality_checker.sync(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Originality index update failed: {e}")
+        finally:
+            db.close()
 
-            # Update next_scrape_at for each profile
-            for profile_id, display_name, frequency in profiles:
-                next_scrape = self.calculate_next_scrape(frequency)
-                db.execute(text("""
-                    UPDATE tracked_profiles
-                    SET next_scrape_at = :next_scrape
-                    WHERE id = :id
-                """), {"next_scrape": next_scrape.isoformat(), "id": profile_id})
+    def _auto_interval(self, profile_id: int) -> Optional[timedelta]:
+        """Last auto interval computed for a profile, if any"""
+        plan = self.auto_plans.get(profile_id)
+        return plan["interval"] if plan else None
 
-            db.commit()
-            logger.info(f"Updated next_scrape_at for {len(profiles)} profiles")
+    # ============ Metrics ============
 
+    def _load_lags(self):
+        """
+        Refill the lag histograms of a new leader from the jobs enqueued
+        during the window (indexed range on scrape_jobs.created_at).
+        """
+        window_start = datetime.utcnow() - timedelta(seconds=self.metrics.window_seconds)
+        db = self.db_factory()
+        try:
+            jobs = db.query(
+                TrackedProfile.tracking_frequency, ScrapeJob.created_at, ScrapeJob.due_at
+            ).join(TrackedProfile, TrackedProfile.id == ScrapeJob.profile_id).filter(
+                ScrapeJob.created_at >= window_start,
+                ScrapeJob.due_at != None
+            ).order_by(ScrapeJob.created_at).all()
+            self.metrics.reset_lags([
+                (tier or "daily", (created_at - due_at).total_seconds(), created_at)
+                for tier, created_at, due_at in jobs
+            ])
         except Exception as e:
-            logger.error(f"Error checking for scrapes: {e}")
-            db.rollback()
+            logger.error(f"Could not load scheduler lag history: {e}")
+            self.metrics.reset_lags()
         finally:
             db.close()
 
-    def calculate_next_scrape(self, frequency: str) -> datetime:
-        """Calculate the next scrape time based on frequency"""
+    def _due_summary(self) -> Optional[str]:
+        """Schedule summary to publish (JSON), if this leader is due to publish one"""
         now = datetime.utcnow()
+        if not self.is_leader or self._last_reload is None:
+            return None  # Heap not loaded yet
+        if self._summary_at is not None and (now - self._summary_at).total_seconds() < self.summary_interval:
+            return None
+        self._summary_at = now
+        return json.dumps(self.schedule_summary(now))
+
+    def schedule_summary(self, now: Optional[datetime] = None) -> dict:
+        """
+        Due-queue depth, current lag of overdue profiles, profiles whose
+        data is older than sla_factor times their interval and the lag
+        histogram, from the leader's heap and rolling histograms.
+        """
+        now = now or datetime.utcnow()
+        overdue_by_tier: Dict[str, List[float]] = {}
+        breaches = []
+        for profile_id, meta in self._profiles.items():
+            tier = meta["tracking_frequency"] or "daily"
+            last_scraped_at, next_scrape_at = meta["last_scraped_at"], meta["next_scrape_at"]
+            if next_scrape_at is None or next_scrape_at <= now:
+                overdue_by_tier.setdefault(tier, []).append(
+                    max(0.0, (now - (next_scrape_at or now)).total_seconds())
+                )
+
+            interval = frequency_interval(tier)
+            if tier == "auto" and last_scraped_at and next_scrape_at and next_scrape_at > last_scraped_at:
+                # Interval chosen by the leader, as written to the database
+                interval = next_scrape_at - last_scraped_at
+            allowed = interval * self.sla_factor
+            if last_scraped_at is not None:
+                age = now - last_scraped_at
+            elif next_scrape_at is not None:
+                # Never scraped: judge it from when it first became due
+                age = now - next_scrape_at + interval
+            else:
+                continue
+            if age > allowed:
+                breaches.append({
+                    "profile_id": profile_id,
+                    "display_name": meta["display_name"],
+                    "tracking_frequency": tier,
+                    "age_hours": round(age.total_seconds() / 3600, 1),
+                    "sla_hours": round(allowed.total_seconds() / 3600, 1),
+                })
+
+        breaches.sort(key=lambda b: b["age_hours"] / b["sla_hours"], reverse=True)
+        return {
+            "lag_seconds_by_tier": self.metrics.lag_summary(now),
+            "profiles_tracked": len(self._profiles),
+            "due_queue_depth": sum(len(lags) for lags in overdue_by_tier.values()),
+            "current_lag_seconds_by_tier": {
+                tier: {
+                    "count": len(lags),
+                    "p50": percentile_of(lags, 0.5),
+                    "p90": percentile_of(lags, 0.9),
+                    "max": max(lags),
+                }
+                for tier, lags in sorted(overdue_by_tier.items())
+            },
+            "sla_breaches": len(breaches),
+            "sla_breach_profiles": breaches[:50],
+        }
+
+    def metrics_snapshot(self, db: Session) -> dict:
+        """
+        Scheduler health, the same whichever process answers.
 
-        if frequency == "hourly":
-            return now + timedelta(hours=1)
-        elif frequency == "daily":
-            return now + timedelta(days=1)
-        elif frequency == "weekly":
-            return now + timedelta(weeks=1)
-        else:
-            # Default to daily
-            return now + timedelta(days=1)
-
-    async def run_batch_scrape(self, profile_ids: List[int]):
-        """Execute the TypeScript workflow for batch scraping"""
-        try:
-            ids_str = ' '.join(map(str, profile_ids))
-            cmd = f'npx tsx src/workflow-tracker.ts batch {ids_str}'
+        Queue, lag and SLA come from the summary the leader publishes on
+        the lease row every summary_interval seconds (one row read).
+        Durations and outcomes cover the queue workers of this process.
+        """
+        now = datetime.utcnow()
+        snapshot = self.metrics.snapshot(now)
+
+        lease = self.election.current_holder(db)
+        summary = json.loads(lease.summary) if lease and lease.summary else {}
+        snapshot.update({
+            "is_leader": self.is_leader,
+            "process": self.election.holder_id,
+            "summary_published_at": lease.summary_published_at if lease else None,
+            "lag_seconds_by_tier": summary.get("lag_seconds_by_tier", {}),
+            "profiles_tracked": summary.get("profiles_tracked"),
+            "due_queue_depth": summary.get("due_queue_depth"),
+            "current_lag_seconds_by_tier": summary.get("current_lag_seconds_by_tier", {}),
+            "sla_factor": self.sla_factor,
+            "sla_breaches": summary.get("sla_breaches"),
+            "sla_breach_profiles": summary.get("sla_breach_profiles", []),
+        })
+        return snapshot
+
+    def calculate_next_scrape(
+        self,
+        frequency: str,
+        profile_id: Optional[int] = None,
+        interval: Optional[timedelta] = None,
+        histogram: Optional[List[float]] = None
+    ) -> datetime:
+        """
+        Calculate the next scrape time based on frequency.
+
+        With a profile_id the time is snapped to the profile's deterministic
+        phase slot, so profiles sharing a frequency are spread across the
+        interval instead of staying in lockstep. An explicit interval (used
+        by the "auto" frequency) overrides the frequency, and a posting
+        histogram shifts the slot to just after the profile's usual
+        posting hours.
+        """
+        now = datetime.utcnow()
+        interval = interval or frequency_interval(frequency)
 
-            logger.info(f"Running batch scrape: {cmd}")
+        if profile_id is None:
+            return now + interval
 
-            # Run in a separate thread to not block the event loop
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=self.project_root,
-                env=os.environ.copy()
-            )
+        next_scrape = next_phase_slot(profile_id, interval, now)
+        if histogram:
+            next_scrape = best_scrape_time(histogram, interval, next_scrape)
+        return max(next_scrape, now + interval * 0.5)
 
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=600  # 10 minute timeout
-            )
+    # ============ Queue Workers ============
 
-            if process.returncode != 0:
-                logger.error(f"Batch scrape failed: {stderr.decode('utf-8', errors='replace')}")
-            else:
-                output = stdout.decode('utf-8', errors='replace')
-                logger.info(f"Batch scrape completed: {output[:500] if output else 'No output'}")
+    def wake_workers(self):
+        """Tell the workers of this process that jobs may be available"""
+        if self._loop is None or self._jobs_ready is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._jobs_ready.set)
 
-        except asyncio.TimeoutError:
-            logger.error("Batch scrape timed out after 10 minutes")
+    async def _worker_loop(self, index: int):
+        """Claim and run scrape jobs until the scheduler stops"""
+        logger.info(f"Scrape worker {index} started ({self.queue.worker_id})")
+
+        while self.running:
+            db = self.db_factory()
+            try:
+                jobs = self.queue.claim(db, limit=1)
+                job = jobs[0] if jobs else None
+                job_id = job.id if job else None
+                profile_id = job.profile_id if job else None
+            except Exception as e:
+                logger.error(f"Worker {index} failed to claim a job: {e}")
+                db.rollback()
+                job_id = None
+            finally:
+                db.close()
+
+            if job_id is None:
+                # Other processes may enqueue too, so poll as a fallback
+                try:
+                    await asyncio.wait_for(
+                        self._jobs_ready.wait(), timeout=self.queue_poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self._jobs_ready.clear()
+                continue
+
+            await self.run_job(job_id, profile_id)
+
+    async def run_job(self, job_id: int, profile_id: int):
+        """Run a claimed job and record its outcome in the queue"""
+        started = datetime.utcnow()
+        result = await self.run_single_scrape(profile_id, job_id)
+        duration = (datetime.utcnow() - started).total_seconds()
+
+        scraped = False
+        db = self.db_factory()
+        try:
+            if result.get("lease_lost"):
+                logger.warning(f"Job {job_id} lost its lease, result discarded")
+                self.metrics.record_scrape(duration, "lease_lost")
+                return
+
+            if result.get("success"):
+                self.queue.complete(db, job_id)
+                self.metrics.record_scrape(duration, "completed")
+                logger.info(f"Job {job_id} completed for profile {profile_id}")
+                self.after_scrape(db, profile_id)
+                scraped = True
+            else:
+                status = self.queue.fail(db, job_id, result.get("error") or "Unknown error")
+                self.metrics.record_scrape(duration, "dead" if status == "dead" else "retried")
+                logger.warning(f"Job {job_id} failed for profile {profile_id}, now {status}")
+                if status == "dead":
+                    self.after_scrape(db, profile_id)
+                    scraped = True
         except Exception as e:
-            logger.error(f"Error running batch scrape: {e}")
+            logger.error(f"Error recording job {job_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+        if scraped:
+            await asyncio.to_thread(self.sync_post_indexes)
+
+    async def _heartbeat(self, job_id: int, process) -> None:
+        """Renew the job lease while the workflow runs; kill it if the lease is lost"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            db = self.db_factory()
+            try:
+                owned = self.queue.heartbeat(db, job_id)
+            except Exception as e:
+                logger.error(f"Heartbeat failed for job {job_id}: {e}")
+                owned = True  # Transient DB error, the lease still has time left
+            finally:
+                db.close()
+
+            if not owned:
+                logger.error(f"Lease lost for job {job_id}, stopping workflow")
+                WorkflowExecutor._kill(process)
+                return
 
-    async def run_single_scrape(self, profile_id: int):
-        """Execute scrape for a single profile (for manual triggers)"""
+    async def run_single_scrape(self, profile_id: int, job_id: Optional[int] = None):
+        """Execute scrape for a single profile, renewing the job lease if given"""
+        heartbeat = None
         try:
             cmd = f'npx tsx src/workflow-tracker.ts scrape {profile_id}'
+            if job_id is not None:
+                cmd += f' --job {job_id}'
 
             logger.info(f"Running single scrape for profile {profile_id}")
 
+            # Own process group: killing it stops npx and node, not only the shell
             process = await asyncio.create_subprocess_shell(
                 cmd,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 cwd=self.project_root,
-                env=os.environ.copy()
+                env=os.environ.copy(),
+                start_new_session=os.name == "posix"
             )
 
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=300  # 5 minute timeout
-            )
+            if job_id is not None:
+                heartbeat = asyncio.create_task(self._heartbeat(job_id, process))
+
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(),
+                    timeout=300  # 5 minute timeout
+                )
+            except asyncio.TimeoutError:
+                WorkflowExecutor._kill(process)
+                await process.wait()
+                raise
+
+            if heartbeat is not None and heartbeat.done():
+                return {"success": False, "lease_lost": True, "error": "Lease lost"}
 
             if process.returncode != 0:
                 error_msg = stderr.decode('utf-8', errors='replace')
                 logger.error(f"Single scrape failed for profile {profile_id}: {error_msg}")
                 return {"success": False, "error": error_msg}
-            else:
-                output = stdout.decode('utf-8', errors='replace')
-                logger.info(f"Single scrape completed for profile {profile_id}")
-                return {"success": True, "output": output}
+
+            # The workflow records its own failures on the job row
+            if job_id is not None:
+                error_msg = self._job_error(job_id)
+                if error_msg:
+                    logger.error(f"Single scrape failed for profile {profile_id}: {error_msg}")
+                    return {"success": False, "error": error_msg}
+
+            output = stdout.decode('utf-8', errors='replace')
+            logger.info(f"Single scrape completed for profile {profile_id}")
+            return {"success": True, "output": output}
 
         except asyncio.TimeoutError:
             logger.error(f"Single scrape timed out for profile {profile_id}")
@@ -183,6 +789,17 @@ class TrackerScheduler:
         except Exception as e:
             logger.error(f"Error running single scrape for profile {profile_id}: {e}")
             return {"success": False, "error": str(e)}
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+    def _job_error(self, job_id: int) -> Optional[str]:
+        """error_message written by the workflow on a managed job"""
+        db = self.db_factory()
+        try:
+            return db.query(ScrapeJob.error_message).filter(ScrapeJob.id == job_id).scalar()
+        finally:
+            db.close()
 
     async def run_content_analysis(self, limit: int = 50):
         """Run content analysis on unanalyzed posts"""
@@ -196,13 +813,19 @@ class TrackerScheduler:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 cwd=self.project_root,
-                env=os.environ.copy()
+                env=os.environ.copy(),
+                start_new_session=os.name == "posix"
             )
 
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=600  # 10 minute timeout
-            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(),
+                    timeout=600  # 10 minute timeout
+                )
+            except asyncio.TimeoutError:
+                WorkflowExecutor._kill(process)
+                await process.wait()
+                raise
 
             if process.returncode != 0:
                 logger.error(f"Content analysis failed: {stderr.decode('utf-8', errors='replace')}")
@@ -0,0 +1,246 @@
+"""
+Workflow Executor - Bounded admission queue for the TypeScript workflow subprocesses
+"""
+import asyncio
+import json
+import os
+import signal
+from collections import deque
+from typing import Awaitable, Callable, Optional, Set
+import logging
+
+logger = logging.getLogger("WorkflowExecutor")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must match src/result-channel.ts
+FRAME_PREFIX = "\u001eWF "
+FRAME_LIMIT = 64 * 1024 * 1024  # Max size of one frame or log line
+OUTPUT_TAIL_LINES = 200  # Console lines kept for error reporting
+
+
+class WorkflowQueueFull(Exception):
+    """Raised when the admission queue cannot take another workflow"""
+
+
+class WorkflowExecutor:
+    """
+    Runs heavy workflows (relevance analysis, theme extraction, generation,
+    spin) on the event loop as asyncio subprocesses, at most max_concurrent
+    at a time.
+
+    Workflows waiting for a slot form the admission queue; when it holds
+    max_queued entries, submit() refuses new work instead of letting the
+    backlog grow. No thread is held while a subprocess runs, so the anyio
+    threadpool stays free for sync endpoints.
+
+    Other fire-and-forget work (spin batches, startup catch-up) goes through
+    spawn(): nobody awaits these tasks, so their failures are logged here and
+    shutdown() cancels whatever is still running.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queued: int = 20):
+        """
+        Args:
+            max_concurrent: Workflows running at the same time
+            max_queued: Workflows waiting for a slot before submit() refuses
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: Set[asyncio.Task] = set()
+        self._background: Set[asyncio.Task] = set()
+        self.running = 0
+
+    @property
+    def queued(self) -> int:
+        """Workflows admitted but still waiting for a slot"""
+        return len(self._tasks) - self.running
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+        }
+
+    def submit(self, label: str, work: Awaitable) -> asyncio.Task:
+        """
+        Admit a workflow and schedule it on the running event loop.
+
+        Must be called from the event loop (async endpoints).
+
+        Raises:
+            WorkflowQueueFull: if max_queued workflows are already waiting
+        """
+        if len(self._tasks) >= self.max_concurrent + self.max_queued:
+            if asyncio.iscoroutine(work):
+                work.close()
+            raise WorkflowQueueFull(
+                f"{self.queued} workflows already waiting, try again later"
+            )
+
+        task = asyncio.get_running_loop().create_task(self._run_admitted(label, work))
+        self._watch(label, task, self._tasks)
+        return task
+
+    def spawn(self, label: str, work: Awaitable) -> asyncio.Task:
+        """
+        Schedule background work that takes no workflow slot.
+
+        Must be called from the event loop.
+        """
+        task = asyncio.ensure_future(work)
+        self._watch(label, task, self._background)
+        return task
+
+    async def shutdown(self):
+        """Cancel admitted workflows and background work, and wait for them to end"""
+        tasks = self._tasks | self._background
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _watch(label: str, task: asyncio.Task, tasks: Set[asyncio.Task]):
+        """Keep a reference to the task until it ends, then log its failure if any"""
+        def done(task: asyncio.Task):
+            tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"'{label}' failed: {task.exception()}", exc_info=task.exception())
+
+        tasks.add(task)
+        task.add_done_callback(done)
+
+    async def _run_admitted(self, label: str, work: Awaitable):
+        async with self._semaphore:
+            self.running += 1
+            logger.info(f"Workflow '{label}' started ({self.running} running, {self.queued} queued)")
+            try:
+                return await work
+            finally:
+                self.running -= 1
+
+    async def run_workflow(
+        self,
+        cmd: str,
+        payload=None,
+        timeout: Optional[float] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+        log_prefix: str = "[Workflow]"
+    ) -> dict:
+        """
+        Run a workflow command from the project root over the result channel.
+
+        The payload is sent as JSON on stdin. The workflow answers with
+        NDJSON frames on stdout, prefixed with FRAME_PREFIX (see
+        src/result-channel.ts); progress frames go to on_event, the
+        "result" frame becomes the return value. Other stdout lines and
+        stderr are logged line by line and kept as a short tail for errors.
+
+        A child that exits without reading stdin, or writes a line over
+        FRAME_LIMIT, makes the run fail (the process group is killed): the
+        failure is returned like any other, never raised.
+
+        Returns:
+            Dict with success, result, returncode, output and timed_out
+        """
+        process = await asyncio.create_subprocess_shell(
+            cmd,
+            stdin=asyncio.subprocess.PIPE if payload is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=PROJECT_ROOT,
+            limit=FRAME_LIMIT,
+            start_new_session=os.name == "posix"
+        )
+
+        result_box = {}
+        output_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        failed = []  # I/O errors that make the run fail whatever the exit code
+
+        def handle_frame(raw: str):
+            try:
+                frame = json.loads(raw)
+            except json.JSONDecodeError:
+                logger.warning(f"Malformed workflow frame: {raw[:200]}")
+                return
+            if frame.get("type") == "result":
+                result_box["result"] = frame.get("data")
+            elif on_event is not None:
+                on_event(frame)
+
+        async def feed_stdin():
+            if payload is None:
+                return
+            try:
+                process.stdin.write(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # The child exited (or closed stdin) first: its exit code tells why
+                output_tail.append("[stdin closed by the workflow before the payload was read]")
+            finally:
+                process.stdin.close()
+
+        async def read_output(stream, frames: bool):
+            # stderr has its own pipe: nothing can be written inside a frame line
+            try:
+                async for raw_line in stream:
+                    line = raw_line.decode("utf-8", errors="replace").rstrip("\n")
+                    if frames and line.startswith(FRAME_PREFIX):
+                        handle_frame(line[len(FRAME_PREFIX):])
+                        continue
+                    output_tail.append(line)
+                    print(f"{log_prefix} {line}")
+            except (ValueError, asyncio.LimitOverrunError):
+                # The rest of the stream cannot be read: stop the workflow
+                output_tail.append(f"[Output line over {FRAME_LIMIT} bytes, workflow stopped]")
+                result_box.pop("result", None)
+                failed.append("line too long")
+                self._kill(process)
+
+        timed_out = False
+        io = asyncio.gather(
+            feed_stdin(), read_output(process.stdout, True), read_output(process.stderr, False), process.wait()
+        )
+        try:
+            await asyncio.wait_for(io, timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            self._kill(process)
+            await process.wait()
+        except asyncio.CancelledError:
+            self._kill(process)
+            raise
+        except Exception as e:
+            logger.error(f"Workflow I/O failed: {e}", exc_info=True)
+            output_tail.append(f"[Workflow I/O failed: {type(e).__name__}: {e}]")
+            failed.append(str(e))
+            io.cancel()
+            self._kill(process)
+            await process.wait()
+
+        return {
+            "success": process.returncode == 0 and not timed_out and not failed and "result" in result_box,
+            "result": result_box.get("result"),
+            "returncode": process.returncode,
+            "output": "\n".join(output_tail),
+            "timed_out": timed_out,
+        }
+
+    @staticmethod
+    def _kill(process):
+        """Kill the shell and the node process it started"""
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+workflow_executor = WorkflowExecutor(
+    max_concurrent=int(os.getenv("WORKFLOW_CONCURRENCY", "2")),
+    max_queued=int(os.getenv("WORKFLOW_QUEUE_SIZE", "20"))
+)
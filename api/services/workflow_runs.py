@@ -0,0 +1,265 @@
+"""
+Workflow Runs - Registry of background workflow runs and their progress events, status shared through the database
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import SessionLocal
+from models import WorkflowRunRecord
+
+logger = logging.getLogger("WorkflowRuns")
+
+# Finished runs are kept this long so clients can still read their result
+RUN_RETENTION = timedelta(hours=1)
+MAX_RUNS = 500
+# Long-poll on a run executed by another API process: database read interval
+STORED_POLL_INTERVAL = 1.0
+
+
+def _dumps(value) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(
+        value, ensure_ascii=False,
+        default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v)
+    )
+
+
+def _loads(raw: Optional[str]):
+    return json.loads(raw) if raw else None
+
+
+class WorkflowRun:
+    """
+    One background workflow execution.
+
+    Progress events are appended as the workflow reports them; follow()
+    replays the events already published and then waits for new ones, so
+    a client that connects late (or reconnects) still sees every phase.
+    Must only be used from the event loop.
+
+    on_change is called when the status changes (started, finished), so
+    the registry can store it for the other API processes.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        params: Optional[dict] = None,
+        on_change: Optional[Callable[["WorkflowRun"], None]] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"  # queued, running, completed, failed
+        self.events: List[dict] = []
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._changed = asyncio.Event()
+        self._on_change = on_change
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def publish(self, event: dict):
+        """Append a progress event and wake the followers"""
+        started = self.status == "queued"
+        if started:
+            self.status = "running"
+        self.events.append({**event, "seq": len(self.events)})
+        self._notify()
+        if started and self._on_change is not None:
+            self._on_change(self)
+
+    def finish(self, result=None, error: Optional[str] = None):
+        """Record the outcome and wake the followers one last time"""
+        self.result = result
+        self.error = error
+        self.status = "failed" if error else "completed"
+        self.finished_at = datetime.utcnow()
+        self._notify()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def _notify(self):
+        # Waiters hold the previous Event, setting it wakes all of them
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, start: int = 0, timeout: Optional[float] = None) -> AsyncIterator[dict]:
+        """
+        Yield events from index `start` until the run is done.
+
+        With a timeout, stop after that many seconds without a new event
+        (the caller can resume from the last seq it received).
+        """
+        index = start
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until the run is done or `timeout` seconds have passed; True if done"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.done:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        return self.done
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "events": len(self.events),
+            "last_event": self.events[-1] if self.events else None,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class WorkflowRunRegistry:
+    """
+    Runs by id, pruning finished runs after RUN_RETENTION.
+
+    Runs live in the memory of the process that executes them (events,
+    followers). Their status, last event and result are also written to
+    workflow_runs, so another API process (uvicorn --workers N) can answer
+    a status poll: see load() and wait_stored().
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal):
+        self._runs: Dict[str, WorkflowRun] = {}
+        self.session_factory = session_factory
+        # A single writer thread: rows are written in the order of the changes
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow-runs")
+
+    def create(self, kind: str, params: Optional[dict] = None) -> WorkflowRun:
+        self._prune()
+        run = WorkflowRun(kind, params, on_change=self._store)
+        self._runs[run.id] = run
+        self._store(run)
+        return run
+
+    def get(self, run_id: str) -> Optional[WorkflowRun]:
+        return self._runs.get(run_id)
+
+    def _store(self, run: WorkflowRun):
+        """Write the run's current state in the background (off the event loop)"""
+        self._writer.submit(self._write, run.to_dict())
+
+    def _write(self, state: dict):
+        db = self.session_factory()
+        try:
+            db.merge(WorkflowRunRecord(
+                id=state["id"],
+                kind=state["kind"],
+                status=state["status"],
+                params=_dumps(state["params"]),
+                events=state["events"],
+                last_event=_dumps(state["last_event"]),
+                result=_dumps(state["result"]),
+                error=state["error"],
+                created_at=state["created_at"],
+                finished_at=state["finished_at"],
+            ))
+            if state["status"] == "queued":
+                db.query(WorkflowRunRecord).filter(
+                    WorkflowRunRecord.finished_at < datetime.utcnow() - RUN_RETENTION
+                ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not store workflow run {state['id']}: {e}")
+        finally:
+            db.close()
+
+    def load(self, run_id: str) -> Optional[dict]:
+        """Stored state of a run (same shape as WorkflowRun.to_dict), blocking"""
+        db = self.session_factory()
+        try:
+            record = db.get(WorkflowRunRecord, run_id)
+            if record is None:
+                return None
+            return {
+                "id": record.id,
+                "kind": record.kind,
+                "status": record.status,
+                "params": _loads(record.params) or {},
+                "events": record.events or 0,
+                "last_event": _loads(record.last_event),
+                "result": _loads(record.result),
+                "error": record.error,
+                "created_at": record.created_at,
+                "finished_at": record.finished_at,
+            }
+        finally:
+            db.close()
+
+    async def wait_stored(self, run_id: str, timeout: float = 0) -> Optional[dict]:
+        """
+        Stored state of a run executed by another process, read again every
+        STORED_POLL_INTERVAL until it is done or `timeout` seconds have passed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            state = await asyncio.to_thread(self.load, run_id)
+            if state is None or state["status"] in ("completed", "failed"):
+                return state
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return state
+            await asyncio.sleep(min(STORED_POLL_INTERVAL, remaining))
+
+    def list(self, kind: Optional[str] = None) -> List[WorkflowRun]:
+        runs = [r for r in self._runs.values() if kind is None or r.kind == kind]
+        return sorted(runs, key=lambda r: r.created_at, reverse=True)
+
+    def _prune(self):
+        now = datetime.utcnow()
+        expired = [
+            run_id for run_id, run in self._runs.items()
+            if run.done and now - run.finished_at > RUN_RETENTION
+        ]
+        for run_id in expired:
+            del self._runs[run_id]
+
+        # Hard cap: drop the oldest finished runs first
+        if len(self._runs) >= MAX_RUNS:
+            finished = sorted(
+                (r for r in self._runs.values() if r.done),
+                key=lambda r: r.finished_at
+            )
+            for run in finished[:len(self._runs) - MAX_RUNS + 1]:
+                del self._runs[run.id]
+
+
+workflow_runs = WorkflowRunRegistry()
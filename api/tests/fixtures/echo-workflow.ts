@@ -0,0 +1,12 @@
+import { emitProgress, emitResult, readStdinJson } from "../../../src/result-channel.js";
+
+/**
+ * Workflow minimal pour les tests du result channel : relit le payload et
+ * le renvoie, avec des logs sur stdout et stderr autour des frames
+ */
+const payload = await readStdinJson<{ value: number }>();
+console.log("echo: payload read");
+console.error("echo: on stderr");
+emitProgress("echo", "Payload lu", { value: payload?.value ?? null });
+emitResult({ echoed: payload?.value ?? null });
+process.exit(0);
@@ -0,0 +1,94 @@
+"""
+Workflow Executor - Result channel through the real workflow launchers
+"""
+import asyncio
+import os
+import shutil
+import sys
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.workflow_executor import PROJECT_ROOT, WorkflowExecutor
+
+TSX = os.path.join(PROJECT_ROOT, "node_modules", ".bin", "tsx")
+
+
+def run(cmd: str, payload=None):
+    events = []
+    result = asyncio.run(WorkflowExecutor().run_workflow(
+        cmd, payload, timeout=120, on_event=events.append, log_prefix="[Test]"
+    ))
+    return result, events
+
+
+@pytest.mark.skipif(not (shutil.which("npx") and os.path.exists(TSX)), reason="npm install not run")
+def test_production_launcher_delivers_frames():
+    """Same command shape as the generator routes: sh -c 'npx tsx ... --stdin'"""
+    result, events = run("npx tsx api/tests/fixtures/echo-workflow.ts --stdin", {"value": 42})
+
+    assert result["success"], result["output"]
+    assert result["result"] == {"echoed": 42}
+    assert events == [{"type": "progress", "phase": "echo", "message": "Payload lu", "data": {"value": 42}}]
+    assert "echo: payload read" in result["output"]
+    assert "echo: on stderr" in result["output"]
+
+
+@pytest.mark.skipif(not shutil.which("node"), reason="node not installed")
+def test_frames_cross_an_intermediate_node_process(tmp_path):
+    """npx and the tsx CLI each start a new node process between the shell and the workflow"""
+    child = tmp_path / "child.mjs"
+    child.write_text(textwrap.dedent("""
+        import { writeSync } from "fs";
+        // Same writer as src/result-channel.ts
+        const pause = new Int32Array(new SharedArrayBuffer(4));
+        const frame = (f) => {
+          const line = Buffer.from("\\u001eWF " + JSON.stringify(f) + "\\n");
+          for (let offset = 0; offset < line.length;) {
+            try { offset += writeSync(1, line, offset); }
+            catch (error) { if (error.code !== "EAGAIN") throw error; Atomics.wait(pause, 0, 0, 5); }
+          }
+        };
+        console.log("child log");
+        frame({ type: "progress", phase: "child", message: "started", data: null });
+        frame({ type: "result", data: { big: "x".repeat(200000) } });
+        process.exit(0);
+    """))
+    parent = tmp_path / "parent.mjs"
+    parent.write_text(textwrap.dedent(f"""
+        import {{ spawn }} from "child_process";
+        const c = spawn(process.execPath, [{str(child)!r}], {{ stdio: "inherit" }});
+        c.on("exit", (code) => process.exit(code ?? 1));
+    """))
+
+    result, events = run(f"node {parent}")
+
+    assert result["success"], result["output"]
+    assert len(result["result"]["big"]) == 200000
+    assert [event["phase"] for event in events] == ["child"]
+    assert result["output"] == "child log"
+
+
+def test_child_exiting_before_reading_stdin_is_a_failure():
+    """The payload write hits a closed pipe: the run fails, it does not raise"""
+    result, events = run(
+        f"{sys.executable} -c \"import sys; print('bye', file=sys.stderr); sys.exit(3)\"",
+        {"blob": "x" * (4 * 1024 * 1024)}
+    )
+
+    assert not result["success"]
+    assert result["returncode"] == 3
+    assert "bye" in result["output"]
+
+
+def test_line_over_the_frame_limit_stops_the_workflow(monkeypatch):
+    """The stream iterator gives up on the line: the child is killed, the tail is kept"""
+    monkeypatch.setattr("services.workflow_executor.FRAME_LIMIT", 1024)
+    script = "import sys, time; print('before'); sys.stdout.flush(); print('y' * 5000); sys.stdout.flush(); time.sleep(60)"
+    result, events = run(f"{sys.executable} -c \"{script}\"")
+
+    assert not result["success"]
+    assert not result["timed_out"]
+    assert "before" in result["output"]
+    assert "over 1024 bytes" in result["output"]
@@ -53,6 +53,7 @@ export default function AnalysisStep({ profile, onComplete }: AnalysisStepProps)
       setError(null);
       const result = await api.generator.analyzeRelevance({ days: 30 });
       setAnalysisResult(result);
+      if (result.job_id) await api.generator.waitForJob(result.job_id);
       await loadScores();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Erreur d\'analyse');
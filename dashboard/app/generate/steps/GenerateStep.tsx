@@ -57,7 +57,8 @@ export default function GenerateStep({ profile, onComplete }: GenerateStepProps)
         category: selectedCategory || undefined,
         target_emotion: selectedEmotion || undefined,
       });
-      setGeneratedPosts(result.generated_posts || []);
+      const job = await api.generator.waitForJob<{ generated_posts: GeneratedPost[] }>(result.job_id);
+      setGeneratedPosts(job.result?.generated_posts || []);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Erreur de generation');
     } finally {
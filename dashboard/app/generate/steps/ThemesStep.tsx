@@ -39,7 +39,8 @@ export default function ThemesStep({ profile, onComplete }: ThemesStepProps) {
     try {
       setExtracting(true);
       setError(null);
-      await api.generator.extractThemes();
+      const result = await api.generator.extractThemes();
+      if (result.job_id) await api.generator.waitForJob(result.job_id);
       await loadThemes();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Erreur d\'extraction');
@@ -1,9 +1,9 @@
 'use client';
 
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useParams, useRouter } from 'next/navigation';
 import Link from 'next/link';
-import { api, TrackedProfile, ProfileSnapshot, TrackedPost, PostContentInsight } from '@/lib/api';
+import { api, TrackedProfile, ProfileSnapshot, TrackedPost, PostContentInsight, SpinProgressEvent, SpinResponse } from '@/lib/api';
 import { formatDate } from '@/lib/utils';
 import { LinkedInPostCard } from '@/components/LinkedInPostCard';
 import {
@@ -27,7 +27,7 @@ export default function TrackerProfileDetailPage() {
   const [editData, setEditData] = useState<{
     display_name?: string;
     headline?: string;
-    tracking_frequency?: 'hourly' | 'daily' | 'weekly';
+    tracking_frequency?: 'hourly' | 'daily' | 'weekly' | 'auto';
     priority?: number;
     is_active?: boolean;
   }>({});
@@ -274,7 +274,7 @@ export default function TrackerProfileDetailPage() {
           <InfoItem
             icon={<Calendar className="w-4 h-4" />}
             label="Frequence"
-            value={profile.tracking_frequency === 'hourly' ? 'Toutes les heures' : profile.tracking_frequency === 'daily' ? 'Quotidien' : 'Hebdomadaire'}
+            value={profile.tracking_frequency === 'hourly' ? 'Toutes les heures' : profile.tracking_frequency === 'daily' ? 'Quotidien' : profile.tracking_frequency === 'auto' ? 'Automatique' : 'Hebdomadaire'}
           />
         </div>
 
@@ -308,6 +308,7 @@ export default function TrackerProfileDetailPage() {
                 <option value="hourly">Toutes les heures</option>
                 <option value="daily">Quotidien</option>
                 <option value="weekly">Hebdomadaire</option>
+                <option value="auto">Automatique</option>
               </select>
             </div>
             <div>
@@ -732,6 +733,8 @@ function SpinModal({
   const [error, setError] = useState<string | null>(null);
   const [step, setStep] = useState<'config' | 'processing' | 'result'>('config');
   const [currentPhase, setCurrentPhase] = useState('');
+  // Apres "Regenerer", le prochain spin ignore la variante en cache
+  const [forceNext, setForceNext] = useState(false);
 
   // Result state
   const [result, setResult] = useState<{
@@ -755,6 +758,30 @@ function SpinModal({
     iterations: number;
   } | null>(null);
 
+  // Progress stream of the running spin, closed on completion or unmount
+  const eventsRef = useRef<EventSource | null>(null);
+  useEffect(() => () => eventsRef.current?.close(), []);
+
+  const SPIN_PHASE_LABELS: Record<string, string> = {
+    started: 'Analyse du post original...',
+    analysis: 'Analyse du post original...',
+    analysis_done: 'Extraction du theme universel...',
+    angles: 'Generation des angles creatifs...',
+    angles_done: 'Redaction du post...',
+    writing: 'Redaction du post...',
+    checks: 'Verification anti-AI patterns...',
+    humanizing: 'Verification anti-AI patterns...',
+    done: 'Finalisation...'
+  };
+
+  const failSpin = (message: string) => {
+    eventsRef.current?.close();
+    eventsRef.current = null;
+    setError(message);
+    setStep('config');
+    setSpinning(false);
+  };
+
   const handleSpin = async () => {
     setSpinning(true);
     setError(null);
@@ -762,33 +789,30 @@ function SpinModal({
     setCurrentPhase('Analyse du post original...');
 
     try {
-      // Simulate phases for UX (real processing happens on backend)
-      const phases = [
-        'Analyse du post original...',
-        'Extraction du theme universel...',
-        'Generation des angles creatifs...',
-        'Redaction du post...',
-        'Verification anti-AI patterns...',
-        'Finalisation...'
-      ];
-
-      let phaseIndex = 0;
-      const phaseInterval = setInterval(() => {
-        phaseIndex++;
-        if (phaseIndex < phases.length) {
-          setCurrentPhase(phases[phaseIndex]);
-        }
-      }, 3000);
-
-      const response = await api.generator.spin({
+      const { spin_id } = await api.generator.startSpin({
         post_id: post.id,
         tone,
-        include_cta: includeCta
+        include_cta: includeCta,
+        force: forceNext
       });
 
-      clearInterval(phaseInterval);
+      eventsRef.current?.close();
+      const events = api.generator.spinEvents(spin_id);
+      eventsRef.current = events;
+
+      events.addEventListener('progress', (e) => {
+        const event: SpinProgressEvent = JSON.parse((e as MessageEvent).data);
+        setCurrentPhase(SPIN_PHASE_LABELS[event.phase] || event.message);
+      });
 
-      if (response.success && response.generated_post) {
+      events.addEventListener('result', (e) => {
+        const response: SpinResponse = JSON.parse((e as MessageEvent).data);
+        events.close();
+        eventsRef.current = null;
+        if (!response.success || !response.generated_post) {
+          failSpin('Spin failed - no content generated');
+          return;
+        }
         setResult({
           content: response.generated_post.content,
           hashtags: response.generated_post.hashtags || [],
@@ -801,15 +825,24 @@ function SpinModal({
           iterations: response.iterations
         });
         setStep('result');
-      } else {
-        throw new Error('Spin failed - no content generated');
-      }
+        setSpinning(false);
+        setForceNext(false);
+      });
+
+      // Server 'error' event carries data; a bare error is a dropped connection,
+      // which EventSource retries on its own (resuming with Last-Event-ID)
+      events.addEventListener('error', (e) => {
+        const data = (e as MessageEvent).data;
+        if (data) {
+          console.error('Spin error:', data);
+          failSpin(JSON.parse(data).error || 'Une erreur est survenue');
+        } else if (events.readyState === EventSource.CLOSED) {
+          failSpin('Connexion perdue avec le serveur');
+        }
+      });
     } catch (err) {
       console.error('Spin error:', err);
-      setError(err instanceof Error ? err.message : 'Une erreur est survenue');
-      setStep('config');
-    } finally {
-      setSpinning(false);
+      failSpin(err instanceof Error ? err.message : 'Une erreur est survenue');
     }
   };
 
@@ -825,6 +858,7 @@ function SpinModal({
     setResult(null);
     setStep('config');
     setError(null);
+    setForceNext(true);
   };
 
   return (
@@ -390,7 +390,7 @@ function AddProfileForm({
     profile_type: 'person' as 'person' | 'company',
     display_name: '',
     headline: '',
-    tracking_frequency: 'daily' as 'hourly' | 'daily' | 'weekly',
+    tracking_frequency: 'daily' as 'hourly' | 'daily' | 'weekly' | 'auto',
     priority: 5,
     tags: '',
     notes: '',
@@ -496,12 +496,13 @@ function AddProfileForm({
             </label>
             <select
               value={formData.tracking_frequency}
-              onChange={e => setFormData({ ...formData, tracking_frequency: e.target.value as 'hourly' | 'daily' | 'weekly' })}
+              onChange={e => setFormData({ ...formData, tracking_frequency: e.target.value as 'hourly' | 'daily' | 'weekly' | 'auto' })}
               className="w-full px-3.5 py-2.5 text-sm border border-neutral-200 rounded-lg bg-white focus:border-primary-500 focus:ring-2 focus:ring-primary-500/20 transition-all"
             >
               <option value="hourly">Toutes les heures</option>
               <option value="daily">Quotidien</option>
               <option value="weekly">Hebdomadaire</option>
+              <option value="auto">Automatique</option>
             </select>
           </div>
           <div>
@@ -31,6 +31,7 @@ export interface Post {
   url: string | null;
   collected_at: string;
   company_name?: string;
+  duplicate_of: number | null;
 }
 
 export interface CategoryCount {
@@ -44,6 +45,7 @@ export interface DashboardStats {
   active_companies: number;
   total_posts: number;
   posts_last_7_days: number;
+  duplicate_posts: number;
   posts_by_category: CategoryCount[];
   posts_by_sentiment: { sentiment: string; count: number; percentage: number }[];
   top_companies: { company_id: number; company_name: string; post_count: number; avg_engagement: number }[];
@@ -148,7 +150,11 @@ export interface GeneratedPost {
 }
 
 export interface AnalyzeRelevanceResponse {
+  job_id: string | null;  // null when every post was already scored
   total_posts_analyzed: number;
+  posts_already_scored: number;
+  posts_prefiltered: number;
+  posts_duplicates_skipped: number;
   relevant_posts: number;
   company_specific_posts: number;
   adaptable_posts: number;
@@ -156,6 +162,17 @@ export interface AnalyzeRelevanceResponse {
   top_themes: string[];
 }
 
+// Background run of analyze-relevance, extract-themes or generate
+export interface GeneratorJob<R = unknown> {
+  id: string;
+  kind: 'relevance' | 'themes' | 'generate';
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  events: number;
+  last_event: { phase: string; message: string; seq: number } | null;
+  result: R | null;
+  error: string | null;
+}
+
 export interface GeneratorStats {
   has_profile: boolean;
   profile_name?: string;
@@ -180,7 +197,7 @@ export interface TrackedProfile {
   connection_count: number | null;
   profile_image_url: string | null;
   about: string | null;
-  tracking_frequency: 'hourly' | 'daily' | 'weekly';
+  tracking_frequency: 'hourly' | 'daily' | 'weekly' | 'auto';
   is_active: boolean;
   priority: number;
   tags: string[] | null;
@@ -197,7 +214,7 @@ export interface TrackedProfileCreate {
   profile_type: 'person' | 'company';
   display_name: string;
   headline?: string;
-  tracking_frequency?: 'hourly' | 'daily' | 'weekly';
+  tracking_frequency?: 'hourly' | 'daily' | 'weekly' | 'auto';
   priority?: number;
   tags?: string[];
   notes?: string;
@@ -237,6 +254,7 @@ export interface TrackedPost {
   is_analyzed: boolean;
   first_seen_at: string;
   profile_name?: string;
+  duplicate_of: number | null;
 }
 
 export interface PostContentInsight {
@@ -310,6 +328,77 @@ async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T>
   return res.json();
 }
 
+export interface SpinParams {
+  post_id: number;
+  tone?: 'professional' | 'casual' | 'inspirational';
+  angle_preference?: string;
+  include_cta?: boolean;
+  force?: boolean;  // Ignore the cached variant and generate a new one
+}
+
+export interface SpinResponse {
+  success: boolean;
+  generated_post: GeneratedPost;
+  analysis: {
+    hook_type: string;
+    structure_type: string;
+    universal_theme: string;
+    core_message: string;
+    emotional_trigger: string;
+    engagement_drivers: string[];
+    success_factors: string[];
+    adaptability_score: number;
+  } | null;
+  selected_angle: string | null;
+  authenticity_score: number;
+  originality_score: number;
+  passed_ai_check: boolean;
+  passed_plagiarism_check: boolean;
+  originality_check: OriginalityCheck | null;
+  iterations: number;
+  cached: boolean;
+}
+
+// Local n-gram overlap check (no LLM call)
+export interface OriginalityCheck {
+  originality_score: number;
+  passed: boolean;
+  source_overlap: number;
+  copied_words: number;
+  total_words: number;
+  spans: { start: number; end: number; text: string; source: 'original' | 'tracked_post'; post_id: number | null }[];
+  corpus_matches: { post_id: number; shared_shingles: number; overlap: number }[];
+  elapsed_ms: number;
+}
+
+export interface SpinProgressEvent {
+  type: 'progress';
+  phase: string;
+  message: string;
+  data: Record<string, unknown> | null;
+  seq: number;
+}
+
+export interface SpinBatchItem {
+  post_id: number;
+  success: boolean;
+  generated_post_id?: number;
+  selected_angle?: string | null;
+  authenticity_score?: number;
+  cached?: boolean;
+  error?: string;
+}
+
+function spinQuery(params: SpinParams): URLSearchParams {
+  const query = new URLSearchParams();
+  query.set('post_id', String(params.post_id));
+  if (params.tone) query.set('tone', params.tone);
+  if (params.angle_preference) query.set('angle_preference', params.angle_preference);
+  if (params.include_cta !== undefined) query.set('include_cta', String(params.include_cta));
+  if (params.force) query.set('force', 'true');
+  return query;
+}
+
 export const api = {
   // Companies
   companies: {
@@ -356,6 +445,11 @@ export const api = {
       return fetchApi<Post[]>(`/api/posts?${query}`);
     },
     get: (id: number) => fetchApi<Post>(`/api/posts/${id}`),
+    // "More like this" - posts with the closest content
+    similar: (id: number, limit = 10) =>
+      fetchApi<(Post & { similarity: number })[]>(`/api/posts/${id}/similar?limit=${limit}`),
+    // Near-duplicate cluster (reposts), first collected post first
+    duplicates: (id: number) => fetchApi<Post[]>(`/api/posts/${id}/duplicates`),
     collect: (params?: { company_id?: number; max_posts?: number; classify?: boolean }) =>
       fetchApi<any>('/api/posts/collect', {
         method: 'POST',
@@ -426,7 +520,14 @@ export const api = {
     },
 
     extractThemes: () =>
-      fetchApi<{ themes: ExtractedTheme[]; total_posts_analyzed: number }>('/api/generator/extract-themes', {
+      fetchApi<{
+        job_id: string | null;
+        status: 'started' | 'up_to_date';
+        posts_to_analyze: number;
+        themes_created: number;
+        themes_to_name: number;
+        themes_total: number;
+      }>('/api/generator/extract-themes', {
         method: 'POST',
       }),
 
@@ -435,13 +536,32 @@ export const api = {
       if (params?.trending_only !== undefined) query.set('trending_only', String(params.trending_only));
       return fetchApi<ExtractedTheme[]>(`/api/generator/themes?${query}`);
     },
-
+    // Source posts of a theme, cursor-paged: pass next_after_id to get the next page
+    getThemePosts: (themeId: number, afterId = 0, limit = 20) =>
+      fetchApi<{ theme_id: number; total: number; items: Post[]; next_after_id: number | null }>(
+        `/api/generator/themes/${themeId}/posts?after_id=${afterId}&limit=${limit}`
+      ),
+    getPostThemes: (postId: number) => fetchApi<ExtractedTheme[]>(`/api/generator/posts/${postId}/themes`),
+
+    // Starts a job: the new drafts are in the job result, see waitForJob()
     generate: (params: { num_posts: number; category?: string; theme?: string; target_emotion?: string }) =>
-      fetchApi<{ generated_posts: GeneratedPost[]; themes_used: string[] }>('/api/generator/generate', {
+      fetchApi<{ job_id: string; status: string; job_url: string; themes_used: string[] }>('/api/generator/generate', {
         method: 'POST',
         body: JSON.stringify(params),
       }),
 
+    // Long-poll: answers as soon as the job finishes, or after `wait` seconds
+    getJob: <R = unknown>(jobId: string, wait = 0) =>
+      fetchApi<GeneratorJob<R>>(`/api/generator/jobs/${jobId}?wait=${wait}`),
+
+    waitForJob: async <R = unknown>(jobId: string): Promise<GeneratorJob<R>> => {
+      for (;;) {
+        const job = await api.generator.getJob<R>(jobId, 30);
+        if (job.status === 'completed') return job;
+        if (job.status === 'failed') throw new Error(job.error || 'Job failed');
+      }
+    },
+
     getDrafts: (params?: { status?: string }) => {
       const query = new URLSearchParams();
       if (params?.status) query.set('status', params.status);
@@ -475,38 +595,51 @@ export const api = {
     }>('/api/generator/inspiration-stats'),
 
     // Spin - Transform a tracked post into a new original post
-    spin: (params: {
-      post_id: number;
-      tone?: 'professional' | 'casual' | 'inspirational';
-      angle_preference?: string;
-      include_cta?: boolean;
-    }) => {
-      const query = new URLSearchParams();
-      query.set('post_id', String(params.post_id));
-      if (params.tone) query.set('tone', params.tone);
-      if (params.angle_preference) query.set('angle_preference', params.angle_preference);
-      if (params.include_cta !== undefined) query.set('include_cta', String(params.include_cta));
-      return fetchApi<{
-        success: boolean;
-        generated_post: GeneratedPost;
-        analysis: {
-          hook_type: string;
-          structure_type: string;
-          universal_theme: string;
-          core_message: string;
-          emotional_trigger: string;
-          engagement_drivers: string[];
-          success_factors: string[];
-          adaptability_score: number;
+    spin: (params: SpinParams) =>
+      fetchApi<SpinResponse>(`/api/generator/spin?${spinQuery(params)}`, { method: 'POST' }),
+
+    // Spin in background - follow progress with spinEvents()
+    startSpin: (params: SpinParams) =>
+      fetchApi<{ spin_id: string; status: string; events_url: string }>(
+        `/api/generator/spin/start?${spinQuery(params)}`,
+        { method: 'POST' }
+      ),
+
+    // Server-Sent Events: 'progress' events, then a final 'result' or 'error'
+    spinEvents: (spinId: string) =>
+      new EventSource(`${API_BASE}/api/generator/spin/${spinId}/events`),
+
+    // Batch spin - several posts in one run, drafts saved as each spin completes
+    spinBatch: (params: Omit<SpinParams, 'post_id'> & { post_ids: number[]; concurrency?: number }) =>
+      fetchApi<{ batch_id: string; status: string; total: number; status_url: string; events_url: string }>(
+        '/api/generator/spin/batch',
+        { method: 'POST', body: JSON.stringify(params) }
+      ),
+
+    checkOriginality: (params: { content: string; source_post_id?: number; source_text?: string }) =>
+      fetchApi<OriginalityCheck>('/api/generator/originality-check', {
+        method: 'POST',
+        body: JSON.stringify(params),
+      }),
+
+    getSpinBatch: (batchId: string) =>
+      fetchApi<{
+        id: string;
+        status: 'queued' | 'running' | 'completed' | 'failed';
+        events: number;
+        result: {
+          total: number;
+          completed: number;
+          failed: number;
+          cached: number;
+          items: SpinBatchItem[];
         } | null;
-        selected_angle: string | null;
-        authenticity_score: number;
-        originality_score: number;
-        passed_ai_check: boolean;
-        passed_plagiarism_check: boolean;
-        iterations: number;
-      }>(`/api/generator/spin?${query}`, { method: 'POST' });
-    },
+        error: string | null;
+      }>(`/api/generator/spin/batch/${batchId}`),
+
+    // 'progress' events (item_started, item_done, item_failed), then 'result'
+    spinBatchEvents: (batchId: string) =>
+      new EventSource(`${API_BASE}/api/generator/spin/batch/${batchId}/events`),
   },
 
   // Tracker
@@ -554,6 +687,9 @@ export const api = {
     },
 
     getPost: (id: number) => fetchApi<TrackedPostWithInsights>(`/api/tracker/posts/${id}`),
+    getSimilarPosts: (id: number, limit = 10) =>
+      fetchApi<(TrackedPost & { similarity: number })[]>(`/api/tracker/posts/${id}/similar?limit=${limit}`),
+    getDuplicatePosts: (id: number) => fetchApi<TrackedPost[]>(`/api/tracker/posts/${id}/duplicates`),
 
     // Scraping
     triggerScrape: (profileId: number, jobType: 'profile' | 'posts' | 'full' = 'full') =>
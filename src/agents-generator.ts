@@ -3,6 +3,7 @@ import {
   RelevanceScoreSchema,
   RelevanceAnalysisResultSchema,
   ThemeExtractionResultSchema,
+  ThemeNamingResultSchema,
   PostGenerationResultSchema
 } from "./schemas-generator.js";
 
@@ -116,6 +117,36 @@ Retourne des themes 100% ABSTRAITS et REUTILISABLES.`,
   outputType: ThemeExtractionResultSchema
 });
 
+/**
+ * Agent 2b: Theme Namer
+ * Nomme les clusters de posts formes localement par l'API
+ */
+export const themeNamerAgent = new Agent({
+  name: "Theme Namer",
+  instructions: `Tu nommes des groupes de posts LinkedIn deja regroupes par theme.
+
+CONTEXTE:
+Chaque cluster contient des posts de concurrents proches par leur contenu,
+avec leur categorie, leur theme universel et leurs scores.
+Le regroupement est deja fait: tu ne fusionnes et ne divises AUCUN cluster.
+
+POUR CHAQUE CLUSTER:
+- Reprends son theme_id tel quel
+- Donne un nom de theme ABSTRAIT et REUTILISABLE qui resume le groupe
+- Si current_name est fourni et decrit encore bien le groupe, garde-le
+- Decris le theme en 1-2 phrases
+- Propose 2 a 4 angles generiques pour l'aborder
+- is_trending: true si le groupe est grand et tres engageant par rapport aux autres
+
+REGLES CRITIQUES (comme pour l'extraction de themes):
+- JAMAIS de noms propres: entreprises, produits, evenements, personnes
+- "Partenariat avec Marketia" → "Collaboration strategique"
+
+Retourne exactement un theme par cluster recu.`,
+  model: "gpt-5-nano-2025-08-07",
+  outputType: ThemeNamingResultSchema
+});
+
 /**
  * Agent 3: Post Generator
  * Genere des posts LinkedIn originaux bases sur les themes et le profil
@@ -0,0 +1,61 @@
+import { writeSync } from "fs";
+
+/**
+ * Result channel - NDJSON frames from a workflow to the Python API
+ *
+ * Each frame is one JSON object on its own line of stdout, prefixed with
+ * FRAME_PREFIX so the API can tell it from console logs:
+ *   \u001eWF {"type": "progress", "phase": "analysis", "message": "...", "data": {...}}
+ *   \u001eWF {"type": "result", "data": {...}}
+ *
+ * stdout is the only channel that survives the launcher: `npx tsx` starts
+ * the workflow in a new node process, which does not inherit extra file
+ * descriptors. Frames are written synchronously to fd 1 so a
+ * process.exit() right after emitResult() cannot drop them; node may have
+ * left the pipe non-blocking, so short writes and EAGAIN are retried until
+ * the whole line is out.
+ */
+
+export const FRAME_PREFIX = "\u001eWF ";
+
+const pause = new Int32Array(new SharedArrayBuffer(4));
+
+function writeFrame(frame: Record<string, unknown>) {
+  const line = Buffer.from(FRAME_PREFIX + JSON.stringify(frame) + "\n", "utf-8");
+  let offset = 0;
+  while (offset < line.length) {
+    try {
+      offset += writeSync(1, line, offset);
+    } catch (error) {
+      if ((error as NodeJS.ErrnoException).code !== "EAGAIN") throw error;
+      // Le lecteur Python vide le pipe : on attend sans rendre la main a la boucle
+      Atomics.wait(pause, 0, 0, 5);
+    }
+  }
+}
+
+/**
+ * Signale l'avancement d'une phase du workflow
+ */
+export function emitProgress(phase: string, message: string, data?: Record<string, unknown>) {
+  writeFrame({ type: "progress", phase, message, data: data ?? null });
+}
+
+/**
+ * Envoie le resultat final du workflow (une seule fois, en dernier)
+ */
+export function emitResult(data: unknown) {
+  writeFrame({ type: "result", data });
+}
+
+/**
+ * Lit le payload JSON envoye sur stdin
+ */
+export async function readStdinJson<T>(): Promise<T> {
+  const chunks: Buffer[] = [];
+  for await (const chunk of process.stdin) {
+    chunks.push(typeof chunk === "string" ? Buffer.from(chunk) : chunk);
+  }
+  const text = Buffer.concat(chunks).toString("utf-8").trim();
+  return (text ? JSON.parse(text) : null) as T;
+}
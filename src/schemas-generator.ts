@@ -82,6 +82,35 @@ export const ThemeExtractionResultSchema = z.object({
   unique_themes_found: z.number()
 });
 
+// Clusters formes localement par l'API (services/theme_clustering.py), a nommer
+export const ThemeClusterSchema = z.object({
+  theme_id: z.number(),
+  current_name: z.string().nullable(),
+  occurrence_count: z.number(),
+  avg_engagement: z.number(),
+  top_universal_themes: z.array(z.string()),
+  posts: z.array(z.object({
+    post_id: z.number(),
+    category: z.string().nullable(),
+    universal_theme: z.string(),
+    relevance: z.number(),
+    engagement: z.number()
+  }))
+});
+
+export const ThemeNameSchema = z.object({
+  theme_id: z.number().describe("ID du cluster recu, inchange"),
+  theme_name: z.string().describe("Nom du theme identifie"),
+  theme_description: z.string().describe("Description detaillee du theme"),
+  category: z.string().nullable().describe("Categorie de post associee"),
+  example_angles: z.array(z.string()).describe("Angles possibles pour aborder ce theme"),
+  is_trending: z.boolean().describe("True si le theme est en tendance recente")
+});
+
+export const ThemeNamingResultSchema = z.object({
+  themes: z.array(ThemeNameSchema)
+});
+
 // ============ Post Generation Schemas ============
 
 export const GeneratedPostSchema = z.object({
@@ -138,6 +167,9 @@ export type RelevanceScore = z.infer<typeof RelevanceScoreSchema>;
 export type RelevanceAnalysisResult = z.infer<typeof RelevanceAnalysisResultSchema>;
 export type ExtractedTheme = z.infer<typeof ExtractedThemeSchema>;
 export type ThemeExtractionResult = z.infer<typeof ThemeExtractionResultSchema>;
+export type ThemeCluster = z.infer<typeof ThemeClusterSchema>;
+export type ThemeName = z.infer<typeof ThemeNameSchema>;
+export type ThemeNamingResult = z.infer<typeof ThemeNamingResultSchema>;
 export type GeneratedPost = z.infer<typeof GeneratedPostSchema>;
 export type PostGenerationResult = z.infer<typeof PostGenerationResultSchema>;
 export type AnalyzeWorkflowInput = z.infer<typeof AnalyzeWorkflowInputSchema>;
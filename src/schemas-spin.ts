@@ -29,7 +29,9 @@ export const SpinRequestSchema = z.object({
     tone: z.enum(["professional", "casual", "inspirational"]).default("professional"),
     angle_preference: z.string().nullable().describe("Optional specific angle to explore"),
     include_cta: z.boolean().default(true)
-  })
+  }),
+  // Analyse deja calculee pour ce contenu (cache cote API) : l'etape 1 est sautee
+  cached_analysis: z.lazy(() => PostAnalysisResultSchema).nullable().optional()
 });
 
 // ============ Spin Output Schemas ============
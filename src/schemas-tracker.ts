@@ -4,7 +4,7 @@ import { z } from "zod";
 
 export const ProfileTypeSchema = z.enum(["person", "company"]);
 
-export const TrackingFrequencySchema = z.enum(["hourly", "daily", "weekly"]);
+export const TrackingFrequencySchema = z.enum(["hourly", "daily", "weekly", "auto"]);
 
 export const TrackedProfileSchema = z.object({
   id: z.number(),
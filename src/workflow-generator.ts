@@ -3,6 +3,7 @@ import { Runner, AgentInputItem, withTrace } from "@openai/agents";
 import {
   relevanceScorerAgent,
   themeExtractorAgent,
+  themeNamerAgent,
   postGeneratorAgent
 } from "./agents-generator.js";
 import type {
@@ -13,9 +14,13 @@ import type {
   GeneratedPost,
   RelevanceAnalysisResult,
   ThemeExtractionResult,
+  ThemeCluster,
+  ThemeName,
+  ThemeNamingResult,
   PostGenerationResult
 } from "./schemas-generator.js";
 import Database from "better-sqlite3";
+import { emitProgress, emitResult, readStdinJson } from "./result-channel.js";
 import path from "path";
 import { fileURLToPath } from "url";
 
@@ -188,14 +193,19 @@ function saveThemes(
     INSERT INTO extracted_themes (
       profile_id, theme_name, theme_description, category,
       occurrence_count, avg_engagement, avg_relevance_score,
-      source_post_ids, example_angles, is_trending,
+      example_angles, is_trending,
       first_seen_at, last_seen_at
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+  `);
+  // Les ids inventes par le modele (aucun post) sont ignores
+  const insertSource = db.prepare(`
+    INSERT OR IGNORE INTO theme_posts (theme_id, post_id, added_at)
+    SELECT ?, id, datetime('now') FROM posts WHERE id = ?
   `);
 
   const transaction = db.transaction(() => {
     for (const theme of themes) {
-      insert.run(
+      const { lastInsertRowid } = insert.run(
         profileId,
         theme.theme_name,
         theme.theme_description,
@@ -203,10 +213,44 @@ function saveThemes(
         theme.occurrence_count,
         theme.avg_engagement,
         null, // avg_relevance_score calculer plus tard
-        JSON.stringify(theme.source_post_ids),
         JSON.stringify(theme.example_angles),
         theme.is_trending ? 1 : 0
       );
+      for (const postId of theme.source_post_ids) {
+        insertSource.run(lastInsertRowid, postId);
+      }
+    }
+  });
+
+  transaction();
+}
+
+/**
+ * Met a jour les themes nommes (clusters existants, pas de nouvelle ligne)
+ */
+function saveThemeNames(
+  db: Database.Database,
+  profileId: number,
+  names: ThemeName[]
+) {
+  const update = db.prepare(`
+    UPDATE extracted_themes
+    SET theme_name = ?, theme_description = ?, category = ?,
+        example_angles = ?, is_trending = ?, named_size = occurrence_count
+    WHERE id = ? AND profile_id = ?
+  `);
+
+  const transaction = db.transaction(() => {
+    for (const name of names) {
+      update.run(
+        name.theme_name,
+        name.theme_description,
+        name.category,
+        JSON.stringify(name.example_angles),
+        name.is_trending ? 1 : 0,
+        name.theme_id,
+        profileId
+      );
     }
   });
 
@@ -214,24 +258,29 @@ function saveThemes(
 }
 
 /**
- * Sauvegarde les posts generes
+ * Sauvegarde les posts generes, retourne leurs ids
  */
 function saveGeneratedPosts(
   db: Database.Database,
   profileId: number,
   posts: GeneratedPost[]
-) {
+): number[] {
   const insert = db.prepare(`
     INSERT INTO generated_posts (
       profile_id, content, hashtags, call_to_action,
-      theme, category, target_emotion, inspiration_post_ids,
+      theme, category, target_emotion,
       predicted_engagement, authenticity_score, status, generated_at
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'draft', datetime('now'))
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'draft', datetime('now'))
+  `);
+  const insertSource = db.prepare(`
+    INSERT OR IGNORE INTO generated_post_sources (generated_post_id, source_type, source_id)
+    SELECT ?, 'post', id FROM posts WHERE id = ?
   `);
 
+  const ids: number[] = [];
   const transaction = db.transaction(() => {
     for (const post of posts) {
-      insert.run(
+      const { lastInsertRowid } = insert.run(
         profileId,
         post.content,
         JSON.stringify(post.hashtags),
@@ -239,14 +288,18 @@ function saveGeneratedPosts(
         post.theme,
         post.category,
         post.target_emotion,
-        JSON.stringify(post.inspiration_sources),
         post.predicted_engagement,
         post.authenticity_score
       );
+      for (const sourceId of post.inspiration_sources) {
+        insertSource.run(lastInsertRowid, sourceId);
+      }
+      ids.push(Number(lastInsertRowid));
     }
   });
 
   transaction();
+  return ids;
 }
 
 /**
@@ -270,6 +323,7 @@ async function analyzeRelevance(
     }
 
     log(`Analyzing ${posts.length} posts for profile: ${profile.company_name}`);
+    emitProgress("analysis", `Analyzing ${posts.length} posts`, { posts: posts.length });
 
     return await withTrace("Relevance Analysis", async () => {
       const runner = new Runner({
@@ -361,6 +415,7 @@ async function extractThemes(
     }
 
     log(`Extracting themes from ${scoredPosts.length} relevant posts`);
+    emitProgress("themes", `Extracting themes from ${scoredPosts.length} posts`, { posts: scoredPosts.length });
 
     return await withTrace("Theme Extraction", async () => {
       const runner = new Runner({
@@ -414,6 +469,71 @@ Extrait les themes communs et propose des angles.`
   }
 }
 
+/**
+ * Phase 2b: Nommage des clusters de themes formes par l'API
+ * Seuls les clusters nouveaux ou qui ont grossi sont envoyes
+ */
+async function nameThemes(
+  profileId: number,
+  clusters: ThemeCluster[]
+): Promise<ThemeNamingResult> {
+  const db = getDb();
+
+  try {
+    const profile = loadProfile(db, profileId);
+    if (!profile) {
+      throw new Error(`Profile ${profileId} not found`);
+    }
+
+    if (clusters.length === 0) {
+      return { themes: [] };
+    }
+
+    log(`Naming ${clusters.length} theme clusters`);
+    emitProgress("themes", `Naming ${clusters.length} theme clusters`, { clusters: clusters.length });
+
+    return await withTrace("Theme Naming", async () => {
+      const runner = new Runner({
+        traceMetadata: {
+          __trace_source__: "generator",
+          workflow_id: `name-themes-${Date.now()}`
+        }
+      });
+
+      // Comme pour l'extraction : pas de contenu brut, seulement les themes abstraits
+      const query: AgentInputItem[] = [{
+        role: "user",
+        content: [{
+          type: "input_text",
+          text: `PROFIL ENTREPRISE:
+Nom: ${profile.company_name}
+Secteur: ${profile.industry}
+
+CLUSTERS A NOMMER:
+${JSON.stringify(clusters, null, 2)}
+
+Nomme chaque cluster et propose des angles.`
+        }]
+      }];
+
+      const result = await runner.run(themeNamerAgent, query);
+
+      if (result.finalOutput) {
+        // Ignorer les ids inventes : seuls les clusters envoyes sont mis a jour
+        const sent = new Set(clusters.map(c => c.theme_id));
+        const names = result.finalOutput.themes.filter(t => sent.has(t.theme_id));
+        saveThemeNames(db, profileId, names);
+        log(`Named ${names.length} themes`);
+        return { themes: names };
+      }
+
+      return { themes: [] };
+    });
+  } finally {
+    db.close();
+  }
+}
+
 /**
  * Phase 3: Generation de posts
  */
@@ -453,6 +573,7 @@ async function generatePosts(
     log(`Loaded ${trackerInsights.length} tracker insights for inspiration`);
 
     log(`Generating ${args.num_posts} posts with ${themes.length} themes`);
+    emitProgress("generation", `Generating ${args.num_posts} posts`, { num_posts: args.num_posts });
 
     return await withTrace("Post Generation", async () => {
       const runner = new Runner({
@@ -531,8 +652,10 @@ Genere ${args.num_posts} posts LinkedIn varies et originaux.`
       const result = await runner.run(postGeneratorAgent, query);
 
       if (result.finalOutput) {
-        saveGeneratedPosts(db, profileId, result.finalOutput.posts);
-        log(`Saved ${result.finalOutput.posts.length} generated posts`);
+        const ids = saveGeneratedPosts(db, profileId, result.finalOutput.posts);
+        log(`Saved ${ids.length} generated posts`);
+        // Le job Python se termine des cet evenement, sans attendre la fin du process
+        emitProgress("saved", `Saved ${ids.length} posts`, { generated_post_ids: ids });
         return result.finalOutput;
       }
 
@@ -553,37 +676,51 @@ async function main() {
   const args = process.argv.slice(2);
 
   if (args.length < 2) {
-    console.error("Usage: npx tsx workflow-generator.ts <command> <profile_id> [data]");
-    console.error("Commands: analyze, themes, generate");
+    console.error("Usage: npx tsx workflow-generator.ts <command> <profile_id> [data | --stdin]");
+    console.error("Commands: analyze, themes, name-themes, generate");
     process.exit(1);
   }
 
   const command = args[0];
   const profileId = parseInt(args[1]);
 
+  // Le payload arrive sur stdin (--stdin) ou, pour un appel manuel, en argument
+  const readPayload = async <T>(fallback: T): Promise<T> => {
+    if (args[2] === "--stdin") {
+      return (await readStdinJson<T>()) ?? fallback;
+    }
+    return args[2] ? JSON.parse(args[2]) : fallback;
+  };
+
   try {
     switch (command) {
       case "analyze": {
-        const postIds = JSON.parse(args[2] || "[]");
+        const postIds = await readPayload<number[]>([]);
         const result = await analyzeRelevance(profileId, postIds);
-        console.log(JSON.stringify(result, null, 2));
+        emitResult(result);
         break;
       }
       case "themes": {
-        const scoreIds = JSON.parse(args[2] || "[]");
+        const scoreIds = await readPayload<number[]>([]);
         const result = await extractThemes(profileId, scoreIds);
-        console.log(JSON.stringify(result, null, 2));
+        emitResult(result);
+        break;
+      }
+      case "name-themes": {
+        const clusters = await readPayload<ThemeCluster[]>([]);
+        const result = await nameThemes(profileId, clusters);
+        emitResult(result);
         break;
       }
       case "generate": {
-        const genArgs = JSON.parse(args[2] || "{}");
+        const genArgs = await readPayload<Record<string, any>>({});
         const result = await generatePosts(profileId, {
           num_posts: genArgs.num_posts || 3,
           category: genArgs.category,
           theme: genArgs.theme,
           target_emotion: genArgs.target_emotion
         });
-        console.log(JSON.stringify(result, null, 2));
+        emitResult(result);
         break;
       }
       default:
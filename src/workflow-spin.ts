@@ -1,5 +1,6 @@
 import { run, Runner } from "@openai/agents";
 import { readFileSync } from "fs";
+import { emitProgress, emitResult } from "./result-channel.js";
 import {
   postAnalyzerAgent,
   angleGeneratorAgent,
@@ -37,9 +38,17 @@ export async function spinPost(request: SpinRequest): Promise<SpinResult> {
 
   try {
     // ============ STEP 1: Deep Analysis ============
-    console.log("\n[STEP 1] Analyzing original post...");
+    let analysis: PostAnalysisResult;
 
-    const analysisPrompt = `Analyse ce post LinkedIn en profondeur:
+    if (request.cached_analysis) {
+      // Meme contenu deja analyse : l'API fournit l'analyse en cache
+      console.log("\n[STEP 1] Using cached analysis of original post");
+      analysis = request.cached_analysis;
+    } else {
+      console.log("\n[STEP 1] Analyzing original post...");
+      emitProgress("analysis", "Analyzing original post");
+
+      const analysisPrompt = `Analyse ce post LinkedIn en profondeur:
 
 POST ORIGINAL:
 """
@@ -53,17 +62,25 @@ METRIQUES:
 
 Fais une analyse COMPLETE: structure, hook, theme universel, ce qui fonctionne, et ce qu'il ne faut PAS copier.`;
 
-    const analysisResult = await run(postAnalyzerAgent, analysisPrompt);
-    const analysis = analysisResult.finalOutput as PostAnalysisResult;
+      const analysisResult = await run(postAnalyzerAgent, analysisPrompt);
+      analysis = analysisResult.finalOutput as PostAnalysisResult;
+    }
 
     console.log(`[OK] Analysis complete:`);
     console.log(`   - Hook type: ${analysis.hook_type}`);
     console.log(`   - Structure: ${analysis.structure_type}`);
     console.log(`   - Theme: ${analysis.universal_theme}`);
     console.log(`   - Adaptability: ${analysis.adaptability_score}/100`);
+    emitProgress("analysis_done", "Analysis complete", {
+      hook_type: analysis.hook_type,
+      universal_theme: analysis.universal_theme,
+      adaptability_score: analysis.adaptability_score,
+      cached: Boolean(request.cached_analysis)
+    });
 
     // ============ STEP 2: Generate Angles ============
     console.log("\n[STEP 2] Generating creative angles...");
+    emitProgress("angles", "Generating creative angles");
 
     const anglePrompt = `Genere des angles ORIGINAUX pour ce theme.
 
@@ -99,9 +116,14 @@ Genere 3 a 5 angles audacieux et originaux.`;
     console.log(`   - Selected: "${selectedAngle.angle_name}"`);
     console.log(`   - Originality: ${selectedAngle.originality_score}/100`);
     console.log(`   - Relevance: ${selectedAngle.relevance_to_company}/100`);
+    emitProgress("angles_done", `Selected angle: ${selectedAngle.angle_name}`, {
+      angles_generated: angles.angles.length,
+      selected_angle: selectedAngle.angle_name
+    });
 
     // ============ STEP 3: Write Post ============
     console.log("\n[STEP 3] Writing post...");
+    emitProgress("writing", "Writing post");
 
     const writePrompt = `Ecris un post LinkedIn ORIGINAL et HUMAIN.
 
@@ -160,12 +182,21 @@ Ecris le post maintenant.`;
 
     console.log(`   - needs_revision: ${draft.needs_revision}`);
     console.log(`   - passedAiCheck: ${passedAiCheck}`);
+    emitProgress("checks", passedAiCheck ? "AI check passed" : "AI patterns detected", {
+      iteration: iterationsCount,
+      authenticity_score: finalAuthenticityScore,
+      originality_score: finalOriginalityScore,
+      passed_ai_check: passedAiCheck
+    });
 
     while (
       (draft.needs_revision || finalAuthenticityScore < MIN_AUTHENTICITY_SCORE) &&
       iterationsCount < MAX_HUMANIZATION_ITERATIONS
     ) {
       console.log(`\n[STEP 4] Humanizing (iteration ${iterationsCount})...`);
+      emitProgress("humanizing", `Humanizing (iteration ${iterationsCount})`, {
+        iteration: iterationsCount
+      });
       console.log(`   - Reason: ${draft.needs_revision ? "AI patterns detected" : "Low authenticity score"}`);
 
       const humanizePrompt = `Humanise ce post LinkedIn pour eliminer TOUS les patterns AI.
@@ -201,6 +232,12 @@ Reecris le post en le rendant 100% humain.`;
       console.log(`   - Changes: ${revision.changes_made.length}`);
       console.log(`   - Authenticity: ${finalAuthenticityScore}/100`);
       console.log(`   - Ready to publish: ${passedAiCheck}`);
+      emitProgress("checks", passedAiCheck ? "AI check passed" : "AI patterns remain", {
+        iteration: iterationsCount,
+        authenticity_score: finalAuthenticityScore,
+        originality_score: finalOriginalityScore,
+        passed_ai_check: passedAiCheck
+      });
 
       if (passedAiCheck) break;
 
@@ -217,9 +254,12 @@ Reecris le post en le rendant 100% humain.`;
     }
 
     // ============ Final Result ============
+    // Provisional: the API replaces originality_score and passed_plagiarism_check
+    // with its local n-gram overlap check (api/services/originality.py)
     const passedPlagiarismCheck = finalOriginalityScore >= MIN_ORIGINALITY_SCORE;
 
     console.log("\n[DONE] Spin Workflow Complete!");
+    emitProgress("done", "Spin workflow complete", { iterations: iterationsCount });
     console.log(`   - Iterations: ${iterationsCount}`);
     console.log(`   - Passed AI check: ${passedAiCheck}`);
     console.log(`   - Passed plagiarism check: ${passedPlagiarismCheck}`);
@@ -299,7 +339,7 @@ if (import.meta.url === `file://${process.argv[1].replace(/\\/g, '/')}` ||
     try {
       const request: SpinRequest = JSON.parse(requestJson);
       const result = await spinPost(request);
-      console.log(JSON.stringify(result, null, 2));
+      emitResult(result);
     } catch (error) {
       console.error("Failed to parse request:", error);
       process.exit(1);
@@ -294,6 +294,19 @@ function createScrapeJob(
   return result.lastInsertRowid as number;
 }
 
+/**
+ * Job actif (pending ou running) d'un profil : un seul scrape a la fois par profil
+ */
+function findActiveScrapeJob(db: Database.Database, profileId: number): number | null {
+  const row = db.prepare(`
+    SELECT id FROM scrape_jobs
+    WHERE profile_id = ? AND status IN ('pending', 'running')
+    ORDER BY id LIMIT 1
+  `).get(profileId) as { id: number } | undefined;
+
+  return row ? row.id : null;
+}
+
 /**
  * Complete un job de scrape
  */
@@ -324,6 +337,34 @@ function completeScrapeJob(
   );
 }
 
+/**
+ * Enregistre le resultat d'un job gere par la file Python (api/services/job_queue.py).
+ * Le statut et le lease restent sous le controle du worker qui a reclame le job.
+ */
+function recordQueuedJobResult(
+  db: Database.Database,
+  jobId: number,
+  itemsScraped: number,
+  newItemsFound: number,
+  changesDetected: number,
+  error: string | null
+) {
+  db.prepare(`
+    UPDATE scrape_jobs SET
+      items_scraped = ?,
+      new_items_found = ?,
+      changes_detected = ?,
+      error_message = ?
+    WHERE id = ?
+  `).run(
+    itemsScraped,
+    newItemsFound,
+    changesDetected,
+    error,
+    jobId
+  );
+}
+
 // ============ Change Detection ============
 
 /**
@@ -507,10 +548,11 @@ async function scrapeAllPostsEngagement(profileId: number): Promise<number> {
 /**
  * Scrape un profil LinkedIn
  */
-async function scrapeProfile(profileId: number): Promise<ScrapeResult> {
+async function scrapeProfile(profileId: number, queuedJobId: number | null = null): Promise<ScrapeResult> {
   const db = getDb();
   const startTime = Date.now();
-  let jobId: number | null = null;
+  let jobId: number | null = queuedJobId;
+  const finishJob = queuedJobId ? recordQueuedJobResult : completeScrapeJob;
 
   try {
     const profile = loadProfile(db, profileId);
@@ -519,7 +561,13 @@ async function scrapeProfile(profileId: number): Promise<ScrapeResult> {
     }
 
     log(`Scraping profile: ${profile.display_name} (${profile.profile_type})`);
-    jobId = createScrapeJob(db, profileId, "full");
+    if (!jobId) {
+      const activeJobId = findActiveScrapeJob(db, profileId);
+      if (activeJobId) {
+        throw new Error(`Profile ${profileId} is already being scraped by job ${activeJobId}`);
+      }
+      jobId = createScrapeJob(db, profileId, "full");
+    }
 
     // Charger le dernier snapshot pour comparaison
     const lastSnapshot = loadLastSnapshot(db, profileId);
@@ -585,7 +633,7 @@ Utilise l'outil ${profile.profile_type === 'person'
         }
 
         // Completer le job
-        completeScrapeJob(db, jobId!, activity.length, newPosts, changes.length, null);
+        finishJob(db, jobId!, activity.length, newPosts, changes.length, null);
 
         log(`Scraped ${activity.length} posts, ${newPosts} new, ${changes.length} changes`);
 
@@ -607,7 +655,7 @@ Utilise l'outil ${profile.profile_type === 'person'
     const durationMs = Date.now() - startTime;
 
     if (jobId) {
-      completeScrapeJob(db, jobId, 0, 0, 0, error.message);
+      finishJob(db, jobId, 0, 0, 0, error.message);
     }
 
     log(`Error scraping profile ${profileId}: ${error.message}`);
@@ -779,7 +827,7 @@ async function main() {
   if (args.length < 1) {
     console.error("Usage: npx tsx workflow-tracker.ts <command> [args]");
     console.error("Commands:");
-    console.error("  scrape <profile_id>     - Scrape a single profile");
+    console.error("  scrape <profile_id> [--job <job_id>] - Scrape a single profile (optionally for a queued job)");
     console.error("  batch [profile_ids...]  - Batch scrape profiles (or all due)");
     console.error("  analyze [limit]         - Analyze unanalyzed posts");
     console.error("  engagement <profile_id> - Scrape engagement for all posts of a profile");
@@ -796,7 +844,9 @@ async function main() {
           console.error("Error: profile_id must be a number");
           process.exit(1);
         }
-        const result = await scrapeProfile(profileId);
+        const jobFlag = args.indexOf("--job");
+        const jobId = jobFlag >= 0 ? parseInt(args[jobFlag + 1]) : NaN;
+        const result = await scrapeProfile(profileId, isNaN(jobId) ? null : jobId);
         console.log(JSON.stringify(result, null, 2));
         break;
       }